@@ -0,0 +1,287 @@
+"""
+Headless monitoring daemon – no Tk, no PIL.
+Probes every provider on an asyncio loop, records history, optionally switches
+to a clearly faster provider (SLO-guarded, with backups) and hosts the local
+cache forwarder. SIGHUP reloads providers and settings. A JSON status snapshot
+is served on a Unix socket that the GUI attaches to instead of probing itself:
+/run/dns-changer/status.sock (world-connectable, read-only) when running as
+root from a system unit, the user's runtime dir otherwise. A root daemon keeps
+its history, stats and cache state in /var/lib/dns-changer (world-readable;
+/root/.config is not), and its snapshot tells the GUI where ("state_dir").
+
+    python daemon.py             # run in the foreground (e.g. from a systemd unit)
+    python daemon.py status      # print the running daemon's snapshot
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Optional
+
+SYSTEM_STATE_HOME = "/var/lib"
+if __name__ == "__main__" and os.geteuid() == 0 and "XDG_CONFIG_HOME" not in os.environ:
+    # before logic is imported: every module derives its paths from CONFIG_DIR
+    os.environ["XDG_CONFIG_HOME"] = SYSTEM_STATE_HOME
+
+import logic
+import resolved_stats
+
+SYSTEM_SOCKET_PATH = "/run/dns-changer/status.sock"
+USER_SOCKET_PATH = os.path.join(os.getenv("XDG_RUNTIME_DIR") or logic.CONFIG_DIR, "dns-changer.sock")
+# where this process would serve; clients try both (see fetch_status)
+SOCKET_PATH = SYSTEM_SOCKET_PATH if os.geteuid() == 0 else USER_SOCKET_PATH
+
+SWITCH_MARGIN = 1.5            # candidate must beat current by this factor…
+SWITCH_MIN_GAIN_MS = 10.0      # …and by at least this many ms
+SWITCH_AFTER_ROUNDS = 3        # …for this many consecutive rounds
+DOT_INTERVAL = 600.0           # TLS handshakes to every DoT provider: far less often than pings
+LEARN_INTERVAL = 600.0         # how often cached names feed the warm-up list
+
+
+def fetch_status(path: Optional[str] = None, timeout: float = 0.5) -> Optional[dict]:
+    """
+    Client side: the daemon's latest snapshot, or None if it is not running.
+    Without `path`, the system daemon's socket is tried before the user's.
+    """
+    if path is None:
+        for candidate in (SYSTEM_SOCKET_PATH, USER_SOCKET_PATH):
+            snap = fetch_status(candidate, timeout)
+            if snap is not None:
+                return snap
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(path)
+            buf = b""
+            while chunk := s.recv(65536):
+                buf += chunk
+        return json.loads(buf)
+    except (OSError, ValueError):
+        return None
+
+
+class Daemon:
+    def __init__(self, interval: Optional[float] = None, socket_path: str = SOCKET_PATH):
+        self._fixed_interval = interval  # --interval beats settings.json
+        self.interval = interval or logic.DEFAULT_SETTINGS["daemon_interval"]
+        self.socket_path = socket_path
+        self.settings: dict = {}
+        self.latencies: dict[str, Optional[float]] = {}
+        self.dot_scores: dict[str, Optional[float]] = {}
+        self.last_dot = 0.0
+        self.last_learn = time.time()  # a cache just after boot says little
+        self.connected: Optional[bool] = None
+        self.current = "Unknown"
+        self.last_probe = 0.0
+        self.last_switch: Optional[dict] = None
+        self.streak: tuple[Optional[str], int] = (None, 0)
+        self.forwarder = None
+        self.forwarder_upstream: Optional[str] = None
+        self.resolved_stats = resolved_stats.StatsTracker(resolved_stats.resolvectl_source, preferred=True)
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+
+    # ---------------------------------------------------------- state
+    def reload(self) -> None:
+        logic.load_dns_configs()
+        self.settings = logic.load_settings()
+        self.interval = self._fixed_interval or float(self.settings["daemon_interval"])
+        self._wake.set()
+
+    def snapshot(self) -> dict:
+        snap = {
+            "pid": os.getpid(),
+            "state_dir": logic.CONFIG_DIR,
+            "updated": self.last_probe,
+            "interval": self.interval,
+            "current": self.current,
+            "connected": self.connected,
+            "latencies": self.latencies,
+            "dot_scores": self.dot_scores,
+            "last_switch": self.last_switch,
+        }
+        snap["resolved_stats"] = self.resolved_stats.summary()
+        if self.forwarder is not None:
+            snap["forwarder"] = {**self.forwarder.stats(), "upstream_name": self.forwarder_upstream}
+        return snap
+
+    # ---------------------------------------------------------- probing
+    async def probe_round(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.latencies = await loop.run_in_executor(None, logic.benchmark_providers)
+        self.connected = await loop.run_in_executor(None, logic.check_dns_connectivity)
+        dot_due = time.time() - self.last_dot >= max(DOT_INTERVAL, self.interval)
+        if dot_due:
+            self.dot_scores = await loop.run_in_executor(None, logic.benchmark_dot)
+            self.last_dot = time.time()
+        self.current = logic.get_current_dns()
+        self.last_probe = time.time()
+        try:
+            await loop.run_in_executor(None, self.resolved_stats.sample)
+        except RuntimeError:
+            pass  # no resolvectl here
+        try:
+            import tsdb
+
+            for name, ms in self.latencies.items():
+                tsdb.record(name, ms, self.last_probe)
+            if dot_due:
+                import dot_probe
+
+                for name, ms in self.dot_scores.items():
+                    tsdb.record(dot_probe.series(name), ms, self.last_dot)
+        except OSError:
+            pass
+        if time.time() - self.last_learn >= LEARN_INTERVAL:
+            await loop.run_in_executor(None, self.learn_names)
+            self.last_learn = time.time()
+        await self.ensure_forwarder()
+        if self.settings.get("daemon_auto_switch"):
+            await self.maybe_switch()
+
+    def learn_names(self) -> None:
+        """Feed the warm-up list from resolved's cache (root only) and the local cache."""
+        import warmup
+
+        names = warmup.resolved_cache_names()
+        if self.forwarder is not None:
+            names += self.forwarder.cache.names()
+        try:
+            warmup.learn(dict.fromkeys(names))
+        except OSError:
+            pass
+
+    def _candidate(self) -> Optional[str]:
+        """Provider clearly faster than the current one, if any."""
+        reachable = {n: ms for n, ms in self.latencies.items() if ms is not None}
+        if not reachable:
+            return None
+        best = min(reachable, key=reachable.get)
+        cur_ms = reachable.get(self.current)
+        if best == self.current or self.current in ("NextDNS", logic.LOCAL_CACHE_NAME):
+            return None  # never silently leave a profile-bound or local setup
+        if cur_ms is None or (cur_ms > reachable[best] * SWITCH_MARGIN
+                              and cur_ms - reachable[best] >= SWITCH_MIN_GAIN_MS):
+            return best
+        return None
+
+    async def maybe_switch(self) -> None:
+        cand = self._candidate()
+        name, count = self.streak
+        self.streak = (cand, count + 1 if cand and cand == name else (1 if cand else 0))
+        if not cand or self.streak[1] < SWITCH_AFTER_ROUNDS:
+            return
+        import slo_guard
+
+        loop = asyncio.get_running_loop()
+        cfg = logic.DNS_CONFIGS[cand]["config"]
+        try:
+            report = await loop.run_in_executor(None, slo_guard.guarded_switch, cand, cfg)
+            self.last_switch = {"to": cand, "at": time.time(), "ok": report.ok,
+                                "rolled_back": report.rolled_back, "report": str(report)}
+        except Exception as e:
+            self.last_switch = {"to": cand, "at": time.time(), "ok": False, "error": str(e)}
+        self.streak = (None, 0)
+        self.current = logic.get_current_dns()
+
+    async def ensure_forwarder(self) -> None:
+        """
+        Host the local cache here while resolved points at it, follow the
+        upstream the GUI asked for (forwarder.request_upstream) and stop once
+        resolved has been pointed elsewhere.
+        """
+        import forwarder
+
+        if self.current != logic.LOCAL_CACHE_NAME:
+            if self.forwarder is not None:
+                await self.forwarder.stop()
+                self.forwarder = self.forwarder_upstream = None
+            return
+        name = forwarder.default_upstream()
+        if name is None:
+            return
+        if self.forwarder is not None:
+            if name != self.forwarder_upstream:
+                self.forwarder.set_upstream(forwarder.upstream_for(name, self.latencies))
+                self.forwarder_upstream = name
+            return
+        fwd = forwarder.CachingForwarder(forwarder.upstream_for(name, self.latencies))
+        try:
+            await fwd.start()
+            self.forwarder, self.forwarder_upstream = fwd, name
+        except OSError:
+            pass  # the GUI already hosts it
+
+    # ---------------------------------------------------------- status socket
+    async def _serve_status(self, reader, writer) -> None:
+        try:
+            writer.write(json.dumps(self.snapshot()).encode())
+            await writer.drain()
+        finally:
+            writer.close()
+
+    # ---------------------------------------------------------- main loop
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, self.reload)
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stop.set)
+        self.reload()
+        try:
+            logic.ensure_initial_backup()
+        except OSError:
+            pass
+
+        os.makedirs(os.path.dirname(self.socket_path), mode=0o755, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self._serve_status, path=self.socket_path)
+        # the snapshot is read-only status; a system daemon serves every user's GUI
+        os.chmod(self.socket_path, 0o666 if self.socket_path == SYSTEM_SOCKET_PATH else 0o600)
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                await self.probe_round()
+                sleeper = asyncio.ensure_future(self._wake.wait())
+                stopper = asyncio.ensure_future(self._stop.wait())
+                await asyncio.wait({sleeper, stopper}, timeout=self.interval,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                sleeper.cancel()
+                stopper.cancel()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if self.forwarder is not None:
+                await self.forwarder.stop()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def main(argv: list[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="DNS Changer background daemon.")
+    parser.add_argument("command", nargs="?", choices=["run", "status"], default="run")
+    parser.add_argument("--interval", type=float, help="seconds between probe rounds")
+    parser.add_argument("--socket", help=f"socket path (serve: {SOCKET_PATH})")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        snap = fetch_status(args.socket)
+        if snap is None:
+            print("daemon is not running", file=sys.stderr)
+            return 1
+        print(json.dumps(snap, indent=4))
+        return 0
+
+    asyncio.run(Daemon(args.interval, args.socket or SOCKET_PATH).run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
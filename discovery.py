@@ -0,0 +1,268 @@
+"""
+Endpoint discovery for hostname-identified providers (NextDNS, DoT configs
+with a #sni suffix). Resolves the SNI hostname and its known alternate
+endpoint names through a configurable resolver, probes every returned address
+at once and offers to rewrite the stored config with the fastest endpoints,
+keeping the #sni suffix so DoT still authenticates the same name.
+DoT configs are probed over TLS with that SNI (dot_probe), so an address that
+answers plain DNS but cannot serve the name on port 853 is never picked.
+Results are cached in ~/.config/dns-changer/discovery.json for CACHE_TTL.
+
+The resolver comes from the `discovery_resolver` setting ("ADDR[:PORT]"),
+so a local stand-in can answer instead of the system stub.
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import dns_client
+import dns_wire
+import logic
+
+DISCOVERY_PATH = os.path.join(logic.CONFIG_DIR, "discovery.json")
+CACHE_TTL = 24 * 3600     # anycast addresses are stable; re-probe daily
+PROBE_ROUNDS = 2          # best of N queries per candidate
+KEEP_PER_FAMILY = 2       # endpoints written per address family
+
+# names that front the same service as an SNI (matched by suffix)
+KNOWN_ALTERNATES = {
+    "dns.nextdns.io": ["dns.nextdns.io", "dns1.nextdns.io", "dns2.nextdns.io"],
+    "cloudflare-dns.com": ["cloudflare-dns.com", "one.one.one.one"],
+    "dns.google": ["dns.google"],
+    "dns.quad9.net": ["dns.quad9.net", "dns9.quad9.net"],
+    "dns.adguard-dns.com": ["dns.adguard-dns.com"],
+}
+
+
+@dataclass
+class Discovery:
+    provider: str
+    names: list[str]
+    candidates: dict[str, Optional[float]] = field(default_factory=dict)  # address -> ms
+    ts: float = 0.0
+
+    def fresh(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) - self.ts < CACHE_TTL
+
+    def best(self, keep: int = KEEP_PER_FAMILY) -> list[str]:
+        """Fastest reachable addresses, `keep` per family, IPv4 first."""
+        ranked = sorted((ms, a) for a, ms in self.candidates.items() if ms is not None)
+        v4 = [a for _, a in ranked if ":" not in a][:keep]
+        v6 = [a for _, a in ranked if ":" in a][:keep]
+        return v4 + v6
+
+    def best_ms(self, addresses: list[str]) -> Optional[float]:
+        ok = [self.candidates[a] for a in addresses if self.candidates.get(a) is not None]
+        return min(ok) if ok else None
+
+
+# ------------------------------------------------------------------#
+#  Inputs                                                            #
+# ------------------------------------------------------------------#
+def config_for(provider: str) -> str:
+    if provider == "NextDNS":
+        return logic.promo_nextdns_block()
+    return logic.DNS_CONFIGS.get(provider, {}).get("config", "")
+
+
+def candidate_names(cfg: str, extra: Optional[dict] = None) -> list[str]:
+    """SNI hostnames of `cfg` plus the alternates known for them."""
+    alternates = {**KNOWN_ALTERNATES, **(extra or {})}
+    names = []
+    for s in logic.parse_dns_servers(cfg):
+        if not s.sni:
+            continue
+        names.append(s.sni)
+        for suffix, alts in alternates.items():
+            if s.sni == suffix or s.sni.endswith("." + suffix):
+                names += alts
+    return list(dict.fromkeys(n.lower().rstrip(".") for n in names))
+
+
+def resolver_from_settings(settings: Optional[dict] = None) -> tuple[str, int]:
+    settings = logic.load_settings() if settings is None else settings
+    servers = logic.parse_dns_servers("DNS=" + settings.get("discovery_resolver", "127.0.0.53"))
+    if not servers:
+        return "127.0.0.53", dns_client.DNS_PORT
+    return servers[0].address, servers[0].port or dns_client.DNS_PORT
+
+
+def can_apply(provider: str) -> bool:
+    """Only stored configs can be rewritten; built-in providers ship fixed addresses."""
+    return provider == "NextDNS" or bool(logic.DNS_CONFIGS.get(provider, {}).get("custom"))
+
+
+# ------------------------------------------------------------------#
+#  Resolve + probe                                                   #
+# ------------------------------------------------------------------#
+async def _resolve(names: list[str], resolver: tuple[str, int], timeout: float) -> list[str]:
+    jobs = [dns_client.lookup(resolver[0], n, t, resolver[1], timeout)
+            for n in names for t in (dns_wire.TYPE_A, dns_wire.TYPE_AAAA)]
+    found = []
+    for records in await asyncio.gather(*jobs):
+        found += [addr for addr, _ in records]
+    return list(dict.fromkeys(found))
+
+
+async def _probe(addresses: list[str], timeout: float) -> dict[str, Optional[float]]:
+    async def one(addr: str) -> Optional[float]:
+        best = None
+        for _ in range(PROBE_ROUNDS):
+            ms, rc = await dns_client.timed_query(addr, logic.VERIFY_NAME, timeout=timeout)
+            if ms is not None and rc in (dns_wire.RCODE_NOERROR, dns_wire.RCODE_NXDOMAIN):
+                best = ms if best is None else min(best, ms)
+        return best
+
+    results = await asyncio.gather(*(one(a) for a in addresses))
+    return dict(zip(addresses, results))
+
+
+async def _probe_dot(addresses: list[str], cfg: str, timeout: float,
+                     context=None) -> dict[str, Optional[float]]:
+    """DotResult.score per address, with the config's port and SNI."""
+    import dot_probe
+
+    servers = logic.parse_dns_servers(cfg)
+    port, sni = servers[0].port or dot_probe.DOT_PORT, servers[0].sni
+    loop = asyncio.get_running_loop()
+    jobs = [loop.run_in_executor(None, lambda a=a: dot_probe.probe_server(
+                a, sni, port, context=context, timeout=timeout, queries=PROBE_ROUNDS))
+            for a in addresses]
+    results = await asyncio.gather(*jobs)
+    return {a: (r.score if r.ok else None) for a, r in zip(addresses, results)}
+
+
+async def discover_async(provider: str, cfg: str, resolver: tuple[str, int],
+                         extra: Optional[dict] = None,
+                         timeout: float = dns_client.DEFAULT_TIMEOUT,
+                         dot_context=None) -> Discovery:
+    """`dot_context` (an ssl.SSLContext) overrides certificate checks for DoT probes."""
+    names = candidate_names(cfg, extra)
+    found = await _resolve(names, resolver, timeout) if names else []
+    current = logic.provider_addresses(cfg)  # probed too, as the baseline
+    addresses = list(dict.fromkeys(current + found))
+    if logic.uses_dns_over_tls(cfg):
+        candidates = await _probe_dot(addresses, cfg, timeout, dot_context)
+    else:
+        candidates = await _probe(addresses, timeout)
+    return Discovery(provider, names, candidates, time.time())
+
+
+# ------------------------------------------------------------------#
+#  Cache                                                             #
+# ------------------------------------------------------------------#
+def _load_cache() -> dict:
+    try:
+        with open(DISCOVERY_PATH, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_cache(cache: dict) -> None:
+    with open(DISCOVERY_PATH, "w") as f:
+        json.dump(cache, f, indent=4)
+
+
+def cached(provider: str) -> Optional[Discovery]:
+    entry = _load_cache().get(provider)
+    try:
+        return Discovery(**entry) if entry else None
+    except TypeError:
+        return None
+
+
+def discover(provider: str, force: bool = False, resolver: Optional[tuple[str, int]] = None,
+             timeout: float = dns_client.DEFAULT_TIMEOUT) -> Discovery:
+    """Blocking: cached result while fresh (and for the same names), else a new run."""
+    cfg = config_for(provider)
+    settings = logic.load_settings()
+    extra = settings.get("discovery_alternates") or {}
+    hit = cached(provider)
+    if hit and not force and hit.fresh() and hit.names == candidate_names(cfg, extra):
+        return hit
+    result = asyncio.run(discover_async(provider, cfg, resolver or resolver_from_settings(settings),
+                                        extra, timeout))
+    cache = _load_cache()
+    cache[provider] = asdict(result)
+    _save_cache(cache)
+    return result
+
+
+# ------------------------------------------------------------------#
+#  Rewrite                                                           #
+# ------------------------------------------------------------------#
+def rewrite_config(cfg: str, endpoints: list[str]) -> str:
+    """
+    Replace the DNS= addresses of `cfg` with `endpoints`, keeping the first
+    server's port and #sni. One DNS= line per address if the original used
+    that layout (as NextDNS blocks do), otherwise a single line.
+    """
+    servers = logic.parse_dns_servers(cfg)
+    if not servers or not endpoints:
+        return cfg
+    port, sni = servers[0].port, servers[0].sni
+
+    def entry(addr: str) -> str:
+        host = f"[{addr}]" if ":" in addr and port else addr
+        return host + (f":{port}" if port else "") + (f"#{sni}" if sni else "")
+
+    lines = cfg.splitlines()
+    is_dns = [ln.strip().partition("=")[0].strip() == "DNS" for ln in lines]
+    if sum(is_dns) > 1:
+        new = [f"DNS={entry(a)}" for a in endpoints]
+    else:
+        new = ["DNS=" + " ".join(entry(a) for a in endpoints)]
+    out, placed = [], False
+    for ln, dns in zip(lines, is_dns):
+        if not dns:
+            out.append(ln)
+        elif not placed:
+            out += new
+            placed = True
+    return "\n".join(out) + ("\n" if cfg.endswith("\n") else "")
+
+
+def apply(provider: str, disc: Discovery) -> str:
+    """Store the rewritten config for `provider`; returns it."""
+    if not can_apply(provider):
+        raise ValueError(f"{provider} is built in; its addresses cannot be rewritten.")
+    cfg = config_for(provider)
+    endpoints = disc.best()
+    if not endpoints:
+        raise RuntimeError("No reachable endpoint was found.")
+    new_cfg = rewrite_config(cfg, endpoints)
+    if provider == "NextDNS":
+        promo = logic.load_promo_nextdns_config()
+        promo["resolve"] = new_cfg.strip()
+        logic.save_promo_nextdns_config(promo)
+    else:
+        logic.DNS_CONFIGS[provider].update(config=new_cfg, ip=endpoints[0])
+        logic.save_dns_configs()
+    return new_cfg
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find the fastest endpoints of a provider.")
+    parser.add_argument("provider")
+    parser.add_argument("--resolver", help="ADDR[:PORT] to resolve the endpoint names with")
+    parser.add_argument("--force", action="store_true", help="ignore the cache")
+    parser.add_argument("--apply", action="store_true", help="rewrite the stored config")
+    args = parser.parse_args()
+
+    logic.load_dns_configs()
+    resolver = None
+    if args.resolver:
+        resolver = resolver_from_settings({"discovery_resolver": args.resolver})
+    disc = discover(args.provider, args.force, resolver)
+    for addr, ms in sorted(disc.candidates.items(), key=lambda kv: (kv[1] is None, kv[1] or 0.0)):
+        print(f"{addr:<40} {'–' if ms is None else f'{ms:.1f} ms'}")
+    if args.apply:
+        print(apply(args.provider, disc))
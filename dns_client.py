@@ -0,0 +1,127 @@
+"""
+Tiny asyncio DNS client: one query to one server over UDP (TCP on truncation),
+or over TLS for DNS-over-TLS upstreams. Used by the local forwarder and the latency probes; no system resolver involved.
+"""
+
+import asyncio
+import socket
+import ssl
+import struct
+import time
+from typing import Optional
+
+import dns_wire
+
+DNS_PORT = 53
+DOT_PORT = 853
+DEFAULT_TIMEOUT = 2.0
+
+
+class _UDPReply(asyncio.DatagramProtocol):
+    def __init__(self, query: bytes, fut: asyncio.Future):
+        self.query = query
+        self.fut = fut
+
+    def datagram_received(self, data, addr):
+        if not self.fut.done() and dns_wire.matches(self.query, data):
+            self.fut.set_result(data)
+
+    def error_received(self, exc):
+        if not self.fut.done():
+            self.fut.set_exception(exc)
+
+
+def _family(address: str) -> int:
+    return socket.AF_INET6 if ":" in address else socket.AF_INET
+
+
+async def udp_query(address: str, query: bytes, port: int = DNS_PORT,
+                    timeout: float = DEFAULT_TIMEOUT) -> bytes:
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _UDPReply(query, fut),
+        remote_addr=(address, port),
+        family=_family(address),
+    )
+    try:
+        transport.sendto(query)
+        return await asyncio.wait_for(fut, timeout)
+    finally:
+        transport.close()
+
+
+async def tcp_query(address: str, query: bytes, port: int = DNS_PORT,
+                    timeout: float = DEFAULT_TIMEOUT) -> bytes:
+    return await _stream_query(query, timeout, address, port)
+
+
+async def tls_query(address: str, query: bytes, port: int = DOT_PORT, sni: Optional[str] = None,
+                    timeout: float = DEFAULT_TIMEOUT, context: Optional[ssl.SSLContext] = None) -> bytes:
+    """
+    DNS-over-TLS (RFC 7858) on a fresh connection. The certificate is always
+    verified, against `sni` or else the address itself.
+    """
+    return await _stream_query(query, timeout, address, port,
+                               ssl=context or ssl.create_default_context(),
+                               server_hostname=sni or address)
+
+
+async def _stream_query(query: bytes, timeout: float, address: str, port: int, **conn) -> bytes:
+    """Length-prefixed exchange shared by TCP and TLS."""
+    async def _exchange() -> bytes:
+        reader, writer = await asyncio.open_connection(address, port, **conn)
+        try:
+            writer.write(struct.pack("!H", len(query)) + query)
+            await writer.drain()
+            (length,) = struct.unpack("!H", await reader.readexactly(2))
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
+
+    reply = await asyncio.wait_for(_exchange(), timeout)
+    if not dns_wire.matches(query, reply):
+        raise dns_wire.DNSWireError("Reply does not match query.")
+    return reply
+
+
+async def query(address: str, wire: bytes, port: int = DNS_PORT,
+                timeout: float = DEFAULT_TIMEOUT) -> bytes:
+    """Ask `address` once; retry over TCP if the UDP answer was truncated."""
+    reply = await udp_query(address, wire, port, timeout)
+    if dns_wire.is_truncated(reply):
+        reply = await tcp_query(address, wire, port, timeout)
+    return reply
+
+
+async def timed_query(address: str, name: str, qtype: int = dns_wire.TYPE_A,
+                      port: int = DNS_PORT, timeout: float = DEFAULT_TIMEOUT
+                      ) -> tuple[Optional[float], Optional[int]]:
+    """
+    Return (RTT in ms, rcode) for one lookup, or (None, None) on timeout / error.
+    Any answer counts as reachable, including NXDOMAIN.
+    """
+    wire = dns_wire.build_query(name, qtype)
+    t0 = time.perf_counter()
+    try:
+        reply = await query(address, wire, port, timeout)
+    except (OSError, asyncio.TimeoutError, dns_wire.DNSWireError, asyncio.IncompleteReadError):
+        return None, None
+    return (time.perf_counter() - t0) * 1000.0, dns_wire.rcode(reply)
+
+
+async def lookup(address: str, name: str, qtype: int = dns_wire.TYPE_A,
+                 port: int = DNS_PORT, timeout: float = DEFAULT_TIMEOUT) -> list[tuple[str, int]]:
+    """(address, TTL) records for `name` as answered by `address`; [] on failure."""
+    try:
+        reply = await query(address, dns_wire.build_query(name, qtype), port, timeout)
+        return dns_wire.addresses(reply) if dns_wire.rcode(reply) == dns_wire.RCODE_NOERROR else []
+    except (OSError, asyncio.TimeoutError, dns_wire.DNSWireError, asyncio.IncompleteReadError, struct.error):
+        return []
+
+
+def resolve_once(address: str, name: str, qtype: int = dns_wire.TYPE_A,
+                 port: int = DNS_PORT, timeout: float = DEFAULT_TIMEOUT
+                 ) -> tuple[Optional[float], Optional[int]]:
+    """Blocking wrapper around `timed_query` for threads without a loop."""
+    return asyncio.run(timed_query(address, name, qtype, port, timeout))
@@ -0,0 +1,195 @@
+"""
+Minimal DNS wire-format helpers shared by the probes and the local forwarder.
+Only what the app needs: build a query, read the header, skip over names.
+"""
+
+import random
+import socket
+import struct
+
+TYPE_A = 1
+TYPE_NS = 2
+TYPE_CNAME = 5
+TYPE_SOA = 6
+TYPE_AAAA = 28
+TYPE_OPT = 41
+CLASS_IN = 1
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+
+_HEADER = struct.Struct("!HHHHHH")
+
+
+class DNSWireError(ValueError):
+    """Raised when a message cannot be parsed."""
+
+
+def encode_name(name: str) -> bytes:
+    out = bytearray()
+    for label in name.rstrip(".").split("."):
+        if not label:
+            continue
+        raw = label.encode("idna")
+        if len(raw) > 63:
+            raise DNSWireError(f"Label too long: {label!r}")
+        out.append(len(raw))
+        out += raw
+    out.append(0)
+    return bytes(out)
+
+
+def build_query(name: str, qtype: int = TYPE_A, qid: int | None = None, rd: bool = True) -> bytes:
+    """Return a wire-format query for `name` (random ID unless given)."""
+    if qid is None:
+        qid = random.getrandbits(16)
+    flags = 0x0100 if rd else 0
+    return _HEADER.pack(qid, flags, 1, 0, 0, 0) + encode_name(name) + struct.pack("!HH", qtype, CLASS_IN)
+
+
+def query_id(msg: bytes) -> int:
+    if len(msg) < 2:
+        raise DNSWireError("Message too short.")
+    return struct.unpack_from("!H", msg)[0]
+
+
+def with_id(msg: bytes, qid: int) -> bytes:
+    """Return `msg` with its transaction ID replaced."""
+    return struct.pack("!H", qid) + msg[2:]
+
+
+def rcode(msg: bytes) -> int:
+    if len(msg) < _HEADER.size:
+        raise DNSWireError("Message too short.")
+    return msg[3] & 0x0F
+
+
+def is_response(msg: bytes) -> bool:
+    return len(msg) >= _HEADER.size and bool(msg[2] & 0x80)
+
+
+def is_truncated(msg: bytes) -> bool:
+    return len(msg) >= _HEADER.size and bool(msg[2] & 0x02)
+
+
+def skip_name(msg: bytes, off: int) -> int:
+    """Return the offset just past the (possibly compressed) name at `off`."""
+    while True:
+        if off >= len(msg):
+            raise DNSWireError("Name runs past end of message.")
+        ln = msg[off]
+        if ln == 0:
+            return off + 1
+        if ln & 0xC0 == 0xC0:
+            return off + 2
+        off += 1 + ln
+
+
+def read_name(msg: bytes, off: int) -> str:
+    labels, hops = [], 0
+    while True:
+        if off >= len(msg) or hops > 64:
+            raise DNSWireError("Bad name.")
+        ln = msg[off]
+        if ln == 0:
+            break
+        if ln & 0xC0 == 0xC0:
+            off = struct.unpack_from("!H", msg, off)[0] & 0x3FFF
+            hops += 1
+            continue
+        labels.append(msg[off + 1 : off + 1 + ln].decode("ascii", "replace"))
+        off += 1 + ln
+    return ".".join(labels)
+
+
+def question(msg: bytes) -> tuple[str, int, int]:
+    """Return (qname, qtype, qclass) of the first question."""
+    if len(msg) < _HEADER.size or _HEADER.unpack_from(msg)[2] < 1:
+        raise DNSWireError("Message has no question.")
+    end = skip_name(msg, _HEADER.size)
+    qtype, qclass = struct.unpack_from("!HH", msg, end)
+    return read_name(msg, _HEADER.size).lower(), qtype, qclass
+
+
+def matches(query: bytes, response: bytes) -> bool:
+    """True if `response` answers `query` (same ID and question)."""
+    try:
+        return (
+            is_response(response)
+            and query_id(query) == query_id(response)
+            and question(query) == question(response)
+        )
+    except (DNSWireError, struct.error):
+        return False
+
+
+def _record_ttl_offsets(msg: bytes) -> tuple[list[int], list[tuple[int, int]]]:
+    """
+    Walk every resource record after the question section.
+    Returns (TTL offsets of non-OPT records, (section, type) per record).
+    """
+    _, _, qd, an, ns, ar = _HEADER.unpack_from(msg)
+    off = _HEADER.size
+    for _ in range(qd):
+        off = skip_name(msg, off) + 4
+    offsets, kinds = [], []
+    for section, count in ((0, an), (1, ns), (2, ar)):
+        for _ in range(count):
+            off = skip_name(msg, off)
+            rtype, _, _, rdlen = struct.unpack_from("!HHIH", msg, off)
+            if rtype != TYPE_OPT:
+                offsets.append(off + 4)
+                kinds.append((section, rtype))
+            off += 10 + rdlen
+            if off > len(msg):
+                raise DNSWireError("Record runs past end of message.")
+    return offsets, kinds
+
+
+def addresses(msg: bytes) -> list[tuple[str, int]]:
+    """(address, TTL) of every A / AAAA record in the answer section."""
+    offsets, kinds = _record_ttl_offsets(msg)
+    out = []
+    for o, (sec, rtype) in zip(offsets, kinds):
+        if sec != 0 or rtype not in (TYPE_A, TYPE_AAAA):
+            continue
+        ttl, rdlen = struct.unpack_from("!IH", msg, o)
+        family = socket.AF_INET if rtype == TYPE_A else socket.AF_INET6
+        out.append((socket.inet_ntop(family, msg[o + 6 : o + 6 + rdlen]), ttl))
+    return out
+
+
+def cache_ttl(msg: bytes) -> int | None:
+    """
+    How long a response may be cached, in seconds, or None if it must not be.
+    Positive answers use the smallest answer TTL; NXDOMAIN / NODATA use the
+    SOA in the authority section (min of its TTL and MINIMUM, RFC 2308).
+    """
+    try:
+        code = rcode(msg)
+        if code not in (RCODE_NOERROR, RCODE_NXDOMAIN) or is_truncated(msg):
+            return None
+        offsets, kinds = _record_ttl_offsets(msg)
+        answers = [o for o, (sec, _) in zip(offsets, kinds) if sec == 0]
+        if code == RCODE_NOERROR and answers:
+            return min(struct.unpack_from("!I", msg, o)[0] for o in answers)
+        for o, (sec, rtype) in zip(offsets, kinds):
+            if sec == 1 and rtype == TYPE_SOA:
+                ttl = struct.unpack_from("!I", msg, o)[0]
+                rdlen = struct.unpack_from("!H", msg, o + 4)[0]
+                minimum = struct.unpack_from("!I", msg, o + 6 + rdlen - 4)[0]
+                return min(ttl, minimum)
+    except (DNSWireError, struct.error):
+        pass
+    return None
+
+
+def age_ttls(msg: bytes, elapsed: int) -> bytes:
+    """Return `msg` with every TTL reduced by `elapsed` seconds (floored at 0)."""
+    out = bytearray(msg)
+    offsets, _ = _record_ttl_offsets(msg)
+    for o in offsets:
+        ttl = struct.unpack_from("!I", out, o)[0]
+        struct.pack_into("!I", out, o, max(0, ttl - elapsed))
+    return bytes(out)
@@ -0,0 +1,196 @@
+"""
+DNS-over-TLS probing: what systemd-resolved pays on port 853.
+Measures TCP connect, TLS handshake (full and resumed) and query RTT over an
+already established connection, per server of a provider's [Resolve] block.
+logic.benchmark_dot scores DoT providers with `rank_providers`; the daemon
+keeps those scores in their own history series (see `series`), apart from
+the ping RTTs.
+
+    python dot_probe.py              # rank every DoT provider
+    python dot_probe.py Quad9 -v     # one provider, per server
+"""
+
+import socket
+import ssl
+import statistics
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import dns_wire
+import logic
+
+DOT_PORT = 853
+DEFAULT_TIMEOUT = 3.0
+PROBE_NAME = "example.com"
+
+
+@dataclass
+class DotResult:
+    address: str
+    sni: Optional[str]
+    port: int = DOT_PORT
+    connect_ms: Optional[float] = None
+    handshake_ms: Optional[float] = None
+    resumed_handshake_ms: Optional[float] = None
+    session_reused: bool = False
+    query_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.query_ms is not None
+
+    @property
+    def score(self) -> float:
+        """
+        Cost of what resolved sees after an idle period: reconnect, resume
+        the TLS session (full handshake if resumption failed), ask once.
+        """
+        if not self.ok:
+            return float("inf")
+        hs = self.resumed_handshake_ms if self.session_reused else self.handshake_ms
+        return (self.connect_ms or 0.0) + (hs or 0.0) + self.query_ms
+
+
+def series(name: str) -> str:
+    """tsdb key for the DoT scores of provider `name`."""
+    return f"{name} (DoT)"
+
+
+def _ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000.0
+
+
+def _recv_exact(sock: ssl.SSLSocket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Connection closed by server.")
+        buf += chunk
+    return buf
+
+
+def _exchange(sock: ssl.SSLSocket, name: str) -> float:
+    """Send one length-prefixed query and return its RTT in ms."""
+    query = dns_wire.build_query(name)
+    t0 = time.perf_counter()
+    sock.sendall(struct.pack("!H", len(query)) + query)
+    (length,) = struct.unpack("!H", _recv_exact(sock, 2))
+    reply = _recv_exact(sock, length)
+    elapsed = _ms(t0)
+    if not dns_wire.matches(query, reply):
+        raise dns_wire.DNSWireError("Reply does not match query.")
+    return elapsed
+
+
+def _connect(address: str, port: int, sni: Optional[str], ctx: ssl.SSLContext,
+             timeout: float, session: Optional[ssl.SSLSession] = None):
+    t0 = time.perf_counter()
+    raw = socket.create_connection((address, port), timeout=timeout)
+    connect_ms = _ms(t0)
+    try:
+        tls = ctx.wrap_socket(
+            raw,
+            server_hostname=sni or address,
+            do_handshake_on_connect=False,
+            session=session,
+        )
+        t0 = time.perf_counter()
+        tls.do_handshake()
+        return tls, connect_ms, _ms(t0)
+    except Exception:
+        raw.close()
+        raise
+
+
+def make_context(cafile: Optional[str] = None, verify: bool = True) -> ssl.SSLContext:
+    """Client context; `cafile` lets a self-signed stand-in server be trusted."""
+    ctx = ssl.create_default_context(cafile=cafile)
+    if not verify:
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+def probe_server(address: str, sni: Optional[str] = None, port: int = DOT_PORT, *,
+                 context: Optional[ssl.SSLContext] = None, timeout: float = DEFAULT_TIMEOUT,
+                 queries: int = 3, resume: bool = True, name: str = PROBE_NAME) -> DotResult:
+    """
+    Probe one DoT server. Query RTT is the median of `queries` exchanges on
+    the first connection; a second connection measures session resumption.
+    Never raises – failures land in `DotResult.error`.
+    """
+    ctx = context or make_context()
+    res = DotResult(address=address, sni=sni, port=port)
+    try:
+        tls, res.connect_ms, res.handshake_ms = _connect(address, port, sni, ctx, timeout)
+        with tls:
+            rtts = [_exchange(tls, name) for _ in range(max(1, queries))]
+            res.query_ms = statistics.median(rtts)
+            # TLS 1.3 tickets arrive after the handshake, so read the session last
+            session = tls.session
+        if resume and session is not None:
+            tls, _, res.resumed_handshake_ms = _connect(address, port, sni, ctx, timeout, session)
+            with tls:
+                res.session_reused = tls.session_reused
+    except (OSError, ssl.SSLError, ValueError, struct.error) as e:
+        res.error = str(e) or e.__class__.__name__
+    return res
+
+
+def probe_config(cfg: str, **kwargs) -> list[DotResult]:
+    """Probe every server listed in a [Resolve] block in parallel."""
+    servers = logic.parse_dns_servers(cfg)
+    if not servers:
+        return []
+    with ThreadPoolExecutor(max_workers=len(servers)) as pool:
+        futures = [
+            pool.submit(probe_server, s.address, s.sni, s.port or DOT_PORT, **kwargs)
+            for s in servers
+        ]
+        return [f.result() for f in futures]
+
+
+def rank_providers(configs: Optional[dict] = None, max_workers: int = 8,
+                   **kwargs) -> list[tuple[str, float, list[DotResult]]]:
+    """
+    Probe every DoT-enabled provider and return (name, best score, results)
+    sorted fastest first. Providers without a reachable server sort last.
+    """
+    configs = logic.DNS_CONFIGS if configs is None else configs
+    dot = {n: d["config"] for n, d in configs.items() if logic.uses_dns_over_tls(d.get("config", ""))}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {n: pool.submit(probe_config, cfg, **kwargs) for n, cfg in dot.items()}
+        ranked = []
+        for n, fut in futures.items():
+            results = fut.result()
+            ranked.append((n, min((r.score for r in results), default=float("inf")), results))
+    ranked.sort(key=lambda item: item[1])
+    return ranked
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rank DNS-over-TLS providers by handshake + query cost.")
+    parser.add_argument("providers", nargs="*", help="only these providers (default: all DoT ones)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("-v", "--verbose", action="store_true", help="show every server")
+    args = parser.parse_args()
+
+    logic.load_dns_configs()
+    configs = logic.DNS_CONFIGS
+    if args.providers:
+        configs = {n: d for n, d in configs.items() if n in args.providers}
+    for name, score, results in rank_providers(configs, timeout=args.timeout):
+        print(f"{name:<24} {'unreachable' if score == float('inf') else f'{score:.1f} ms'}")
+        if args.verbose:
+            for r in results:
+                hs = r.resumed_handshake_ms if r.session_reused else r.handshake_ms
+                detail = r.error or (f"connect {r.connect_ms:.1f} + handshake {hs:.1f}"
+                                     f"{' (resumed)' if r.session_reused else ''} + query {r.query_ms:.1f} ms")
+                print(f"    {r.address}{f'#{r.sni}' if r.sni else ''}: {detail}")
@@ -0,0 +1,429 @@
+"""
+Local caching DNS forwarder that systemd-resolved can point at.
+Listens on a loopback UDP/TCP port, answers from a bounded LRU+TTL cache and
+forwards misses upstream. Switching upstream is an in-process swap, so neither
+resolved nor the cache has to restart.
+"""
+
+import asyncio
+import json
+import os
+import ssl
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Protocol
+
+import dns_client
+import dns_wire
+import logic
+
+LISTEN_HOST = "127.0.0.1"
+LISTEN_PORT = 5399
+STATE_PATH = os.path.join(logic.CONFIG_DIR, "forwarder.json")
+
+MAX_ENTRIES = 10_000
+MAX_TTL = 86_400
+MAX_NEGATIVE_TTL = 900
+
+
+# ------------------------------------------------------------------#
+#  Cache                                                             #
+# ------------------------------------------------------------------#
+class DnsCache:
+    """
+    Bounded LRU keyed by (qname, qtype, qclass). Entries expire after the
+    response's own TTL; NXDOMAIN / NODATA are cached from the SOA (RFC 2308).
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_ttl: int = MAX_TTL,
+                 max_negative_ttl: int = MAX_NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.max_negative_ttl = max_negative_ttl
+        self._entries: OrderedDict[tuple, tuple[bytes, float, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple, now: Optional[float] = None) -> Optional[bytes]:
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        reply, stored, expires = entry
+        if now >= expires:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dns_wire.age_ttls(reply, int(now - stored))
+
+    def put(self, key: tuple, reply: bytes, now: Optional[float] = None) -> bool:
+        ttl = dns_wire.cache_ttl(reply)
+        if not ttl:
+            return False
+        negative = dns_wire.rcode(reply) == dns_wire.RCODE_NXDOMAIN or not _has_answers(reply)
+        ttl = min(ttl, self.max_negative_ttl if negative else self.max_ttl)
+        now = time.monotonic() if now is None else now
+        self._entries[key] = (reply, now, now + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def names(self) -> list[str]:
+        """Cached A/AAAA names, most recently used last."""
+        return [k[0] for k in self._entries if k[1] in (dns_wire.TYPE_A, dns_wire.TYPE_AAAA)]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _has_answers(reply: bytes) -> bool:
+    return struct.unpack_from("!H", reply, 6)[0] > 0
+
+
+# ------------------------------------------------------------------#
+#  Upstreams                                                         #
+# ------------------------------------------------------------------#
+class Upstream(Protocol):
+    async def resolve(self, query: bytes) -> bytes: ...
+
+
+class PlainUpstream:
+    """Plain DNS to a list of servers, tried in order until one answers."""
+
+    def __init__(self, servers: list[tuple[str, int]], timeout: float = dns_client.DEFAULT_TIMEOUT):
+        if not servers:
+            raise ValueError("At least one upstream server is required.")
+        self.servers = servers
+        self.timeout = timeout
+
+    async def _query(self, server: tuple, query: bytes) -> bytes:
+        addr, port = server
+        return await dns_client.query(addr, query, port, self.timeout)
+
+    async def resolve(self, query: bytes) -> bytes:
+        last: Exception = TimeoutError("No upstream answered.")
+        for server in self.servers:
+            try:
+                return await self._query(server, query)
+            except (OSError, asyncio.TimeoutError, dns_wire.DNSWireError,
+                    asyncio.IncompleteReadError) as e:
+                last = e
+        raise last
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.servers!r})"
+
+
+class TlsUpstream(PlainUpstream):
+    """DNS-over-TLS to (address, port, sni) servers, so a DoT provider stays encrypted behind the cache."""
+
+    def __init__(self, servers: list[tuple[str, int, Optional[str]]],
+                 timeout: float = dns_client.DEFAULT_TIMEOUT, context: Optional[ssl.SSLContext] = None):
+        super().__init__(servers, timeout)
+        self.context = context
+
+    async def _query(self, server: tuple, query: bytes) -> bytes:
+        addr, port, sni = server
+        return await dns_client.tls_query(addr, query, port, sni, self.timeout, self.context)
+
+
+def servers_for(cfg: str) -> list[tuple[str, int]]:
+    """Plain-DNS (address, port) pairs of a [Resolve] block."""
+    return [(s.address, s.port or dns_client.DNS_PORT) for s in logic.parse_dns_servers(cfg)]
+
+
+def tls_servers_for(cfg: str) -> list[tuple[str, int, Optional[str]]]:
+    """DoT (address, port, sni) triples of a [Resolve] block."""
+    return [(s.address, s.port or dns_client.DOT_PORT, s.sni) for s in logic.parse_dns_servers(cfg)]
+
+
+def upstream_of(cfg: str) -> Upstream:
+    """Forward the way the provider's own config would: over TLS when it sets DNSOverTLS."""
+    if logic.uses_dns_over_tls(cfg):
+        return TlsUpstream(tls_servers_for(cfg))
+    return PlainUpstream(servers_for(cfg))
+
+
+# ------------------------------------------------------------------#
+#  Server                                                            #
+# ------------------------------------------------------------------#
+def _servfail(query: bytes) -> bytes:
+    """Echo the question back with SERVFAIL set."""
+    end = dns_wire.skip_name(query, 12) + 4
+    flags = 0x8000 | (query[2] & 0x01) << 8 | 0x0080 | dns_wire.RCODE_SERVFAIL
+    return query[:2] + struct.pack("!HHHHH", flags, 1, 0, 0, 0) + query[12:end]
+
+
+class _UDPServer(asyncio.DatagramProtocol):
+    def __init__(self, fwd: "CachingForwarder"):
+        self.fwd = fwd
+        self.transport = None
+        self._tasks: set[asyncio.Task] = set()  # the loop only keeps weak references
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        task = asyncio.ensure_future(self._answer(data, addr))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _answer(self, data, addr):
+        reply = await self.fwd.handle(data)
+        if reply and self.transport is not None:
+            self.transport.sendto(reply, addr)
+
+
+class CachingForwarder:
+    def __init__(self, upstream: Upstream, host: str = LISTEN_HOST, port: int = LISTEN_PORT,
+                 cache: Optional[DnsCache] = None):
+        self.upstream = upstream
+        self.host = host
+        self.port = port
+        self.cache = cache or DnsCache()
+        self.upstream_errors = 0
+        self._udp = None
+        self._tcp = None
+
+    def set_upstream(self, upstream: Upstream) -> None:
+        """Swap upstream in place; the cache stays hot."""
+        self.upstream = upstream
+
+    async def handle(self, query: bytes) -> Optional[bytes]:
+        try:
+            key = dns_wire.question(query)
+        except (dns_wire.DNSWireError, struct.error):
+            return None
+        qid = dns_wire.query_id(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dns_wire.with_id(cached, qid)
+        try:
+            reply = await self.upstream.resolve(query)
+        except Exception:
+            self.upstream_errors += 1
+            return _servfail(query)
+        self.cache.put(key, reply)
+        return dns_wire.with_id(reply, qid)
+
+    async def _tcp_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (length,) = struct.unpack("!H", await reader.readexactly(2))
+                reply = await self.handle(await reader.readexactly(length))
+                if reply is None:
+                    break
+                writer.write(struct.pack("!H", len(reply)) + reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._udp, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPServer(self), local_addr=(self.host, self.port)
+        )
+        # port 0 lets tests bind anywhere; TCP then follows the UDP port
+        self.port = self._udp.get_extra_info("sockname")[1]
+        self._tcp = await asyncio.start_server(self._tcp_client, self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._udp is not None:
+            self._udp.close()
+            self._udp = None
+        if self._tcp is not None:
+            self._tcp.close()
+            await self._tcp.wait_closed()
+            self._tcp = None
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "upstream_errors": self.upstream_errors,
+                "upstream": repr(self.upstream)}
+
+
+# ------------------------------------------------------------------#
+#  Background thread used by the GUI                                 #
+# ------------------------------------------------------------------#
+class ForwarderThread:
+    """Run a CachingForwarder on its own event loop beside Tk's main loop."""
+
+    def __init__(self, fwd: CachingForwarder):
+        self.fwd = fwd
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="dns-forwarder", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.fwd.start(), self.loop).result(timeout=5)
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.fwd.stop(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+    def set_upstream(self, upstream: Upstream) -> None:
+        self.loop.call_soon_threadsafe(self.fwd.set_upstream, upstream)
+
+
+_instance: Optional[ForwarderThread] = None
+_upstream_name: Optional[str] = None
+_restore_point: Optional[str] = None  # backup of resolved.conf from before the cache
+
+
+def _load_state(path: str = STATE_PATH) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state() -> None:
+    with open(STATE_PATH, "w") as f:
+        json.dump({"upstream": _upstream_name, "restore": _restore_point}, f, indent=4)
+
+
+def is_running() -> bool:
+    return _instance is not None
+
+
+def upstream_name() -> Optional[str]:
+    """Upstream of the cache hosted here, else the one last saved (by the daemon or a request)."""
+    return _upstream_name or _load_state().get("upstream")
+
+
+def request_upstream(name: str, state_dir: Optional[str] = None) -> None:
+    """
+    Ask the process hosting the cache elsewhere (the daemon) to forward to
+    `name`; it picks the saved upstream up on its next probe round. A system
+    daemon's `state_dir` belongs to root, so the file is written with sudo.
+    """
+    if name not in logic.DNS_CONFIGS:
+        raise RuntimeError(f"Unknown provider {name!r}.")
+    path = STATE_PATH if state_dir is None else os.path.join(state_dir, os.path.basename(STATE_PATH))
+    state = _load_state(path)
+    state["upstream"] = name
+    if state_dir is None:
+        with open(path, "w") as f:
+            json.dump(state, f, indent=4)
+    else:
+        logic.install_config(json.dumps(state, indent=4), path)
+
+
+def set_restore_point(fname: Optional[str]) -> None:
+    """Remember the backup to go back to when leaving the cache."""
+    global _restore_point
+    _restore_point = fname
+    _save_state()
+
+
+def restore_point() -> Optional[str]:
+    """The backup taken before resolved was pointed at the cache, if it is still usable."""
+    fname = _restore_point or _load_state().get("restore")
+    if not fname:
+        return None
+    try:
+        with open(os.path.join(logic.BACKUPS_DIR, fname), "r") as f:
+            if logic.LOCAL_CACHE_ADDR in f.read():
+                return None  # taken while already on the cache
+    except OSError:
+        return None
+    return fname
+
+
+def default_upstream() -> Optional[str]:
+    """Last upstream used, else the first real provider in DNS_CONFIGS."""
+    saved = _load_state().get("upstream")
+    if saved in logic.DNS_CONFIGS:
+        return saved
+    return next((n for n, d in logic.DNS_CONFIGS.items() if not d.get("local")), None)
+
+
+def upstream_for(name: str, latencies: Optional[dict[str, Optional[float]]] = None) -> Upstream:
+    """
+    Plain forwarding to `name`, or – with race_upstreams >= 2 in settings –
+    a race between `name` and the next best providers by `latencies` (the
+    last benchmark of this network when not given).
+    """
+    settings = logic.load_settings()
+    k = int(settings.get("race_upstreams") or 0)
+    if k >= 2:
+        import racing
+
+        if latencies is None:
+            import netwatch
+
+            latencies = netwatch.cached_results(netwatch.fingerprint())
+        picks = [p for p in racing.pick_upstreams(k=k + 1, latencies=latencies) if p[0] != name]
+        own = racing.pick_upstreams({name: logic.DNS_CONFIGS[name]}, k=1)
+        return racing.RacingUpstream((own + picks)[:k], hedge=bool(settings.get("race_hedge")))
+    return upstream_of(logic.DNS_CONFIGS[name]["config"])
+
+
+def start(upstream: Optional[str] = None,
+          latencies: Optional[dict[str, Optional[float]]] = None) -> None:
+    """
+    Start the shared forwarder (no-op if running) forwarding to `upstream`;
+    `latencies` ranks the other racers (see upstream_for).
+    """
+    global _instance, _upstream_name, _restore_point
+    name = upstream or default_upstream()
+    if name is None or name not in logic.DNS_CONFIGS:
+        raise RuntimeError("No upstream DNS available for the local cache.")
+    if _instance is None:
+        inst = ForwarderThread(CachingForwarder(upstream_for(name, latencies)))
+        inst.start()
+        _instance = inst
+    else:
+        _instance.set_upstream(upstream_for(name, latencies))
+    _upstream_name = name
+    _restore_point = _restore_point or _load_state().get("restore")
+    _save_state()
+
+
+def switch_upstream(name: str, latencies: Optional[dict[str, Optional[float]]] = None) -> None:
+    """Point the running forwarder at another provider; no systemd restart."""
+    if _instance is None:
+        raise RuntimeError("Local cache is not running.")
+    start(name, latencies)
+
+
+def stop() -> None:
+    global _instance
+    if _instance is not None:
+        _instance.stop()
+        _instance = None
+
+
+def cached_names() -> list[str]:
+    return _instance.fwd.cache.names() if _instance else []
+
+
+def stats() -> dict:
+    if _instance is None:
+        return {}
+    out = _instance.fwd.stats()
+    summary = getattr(_instance.fwd.upstream, "summary", None)
+    if summary:
+        out["race"] = summary()
+    return out
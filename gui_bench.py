@@ -0,0 +1,250 @@
+"""
+Headless GUI benchmark: start the real app on a virtual X display (Xvfb)
+against a throw-away config with 10, 100 and 1000 providers, and measure
+startup to first idle, refresh frame times, widget count and memory growth.
+Privileged and network commands (sudo, systemctl, dig, ping, resolvectl) are
+replaced by PATH shims and resolved.conf is redirected to a temp file, so
+nothing on the machine changes. Half of the providers are built-in rows on the
+DNS tab (create_provider_row) and half are custom rows in the Add panel.
+
+    python gui_bench.py                      # JSON on stdout
+    python gui_bench.py --sizes 10 100 --cycles 100 -o bench.json
+
+Each size runs in its own child process (`--child N`), so imports and Tk
+start cold every time.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_CYCLES = 50
+CHILD_TIMEOUT = 600  # seconds
+GUI_MODULES = ("tkinter", "sv_ttk", "PIL", "tkfontawesome")  # what main.py needs to start
+
+SHIMS = {
+    "sudo": "exit 0",
+    "pkexec": "exit 0",
+    "systemctl": "exit 0",
+    "dig": "echo 93.184.215.14",
+    "ping": 'for a; do :; done; echo "64 bytes from $a: icmp_seq=1 ttl=64 time=0.050 ms"',
+    "resolvectl": "printf 'Transactions\\nCurrent Transactions: 0\\n  Total Transactions: 0\\n"
+                  "Cache\\n  Current Cache Size: 0\\n          Cache Hits: 0\\n        Cache Misses: 0\\n'",
+}
+
+
+# ------------------------------------------------------------------#
+#  Parent: environment                                               #
+# ------------------------------------------------------------------#
+def _provider(i: int) -> dict:
+    # loopback addresses: pings and probes answer (or fail) instantly
+    a, b = divmod(i, 250)
+    return {"config": f"[Resolve]\nDNS=127.1.{a}.{b + 1} 127.2.{a}.{b + 1}\nDNSOverTLS=no\n",
+            "ip": f"127.1.{a}.{b + 1}"}
+
+
+def make_config(base: str, n: int) -> dict:
+    """Write a config tree for `n` providers under `base`; returns env overrides."""
+    conf = os.path.join(base, "config", "dns-changer")
+    shims = os.path.join(base, "bin")
+    runtime = os.path.join(base, "run")
+    for d in (conf, shims, runtime):
+        os.makedirs(d, exist_ok=True)
+
+    builtin = {f"Bench {i:04d}": {**_provider(i), "custom": False} for i in range(n // 2)}
+    custom = {f"Custom {i:04d}": {**_provider(n + i), "custom": True} for i in range(n - n // 2)}
+    with open(os.path.join(conf, "dns_configs.json"), "w") as f:
+        json.dump(builtin, f)
+    with open(os.path.join(conf, "custom_dns.json"), "w") as f:
+        json.dump(custom, f)
+    with open(os.path.join(conf, "settings.json"), "w") as f:
+        json.dump({"dbus_backend": False, "warmup": False, "network_auto_switch": False,
+                   "slo_guard": False}, f)
+    first = next(iter(builtin.values()), None) or next(iter(custom.values()))
+    with open(os.path.join(base, "resolved.conf"), "w") as f:
+        f.write(first["config"])
+
+    for name, body in SHIMS.items():
+        path = os.path.join(shims, name)
+        with open(path, "w") as f:
+            f.write(f"#!/bin/sh\n{body}\n")
+        os.chmod(path, 0o755)
+
+    return {
+        "XDG_CONFIG_HOME": os.path.join(base, "config"),
+        "XDG_RUNTIME_DIR": runtime,  # no real daemon socket to attach to
+        "PATH": shims + os.pathsep + os.environ.get("PATH", ""),
+        "BENCH_RESOLVED_CONF": os.path.join(base, "resolved.conf"),
+    }
+
+
+def check_requirements() -> None:
+    """Fail before starting anything if the app could not even import."""
+    import importlib.util
+
+    missing = [m for m in GUI_MODULES if importlib.util.find_spec(m) is None]
+    if missing:
+        raise RuntimeError(f"Missing GUI modules: {', '.join(missing)} (pip install -r requirements.txt).")
+
+
+def start_xvfb() -> tuple[subprocess.Popen, str]:
+    """Xvfb on the first free display; returns (process, ":N")."""
+    r, w = os.pipe()
+    try:
+        proc = subprocess.Popen(
+            ["Xvfb", "-displayfd", str(w), "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+            pass_fds=(w,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    except FileNotFoundError:
+        raise RuntimeError("Xvfb is not installed (apt install xvfb).")
+    os.close(w)
+    with os.fdopen(r) as f:
+        display = f.readline().strip()
+    if not display:
+        proc.kill()
+        raise RuntimeError("Xvfb did not start.")
+    return proc, f":{display}"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(sizes=DEFAULT_SIZES, cycles: int = DEFAULT_CYCLES, display: str = "") -> dict:
+    check_requirements()
+    xvfb = None
+    if not display:
+        xvfb, display = start_xvfb()
+    results = []
+    try:
+        for n in sizes:
+            with tempfile.TemporaryDirectory(prefix="dns-changer-bench-") as base:
+                env = {**os.environ, **make_config(base, n), "DISPLAY": display}
+                proc = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", str(n), "--cycles", str(cycles)],
+                    cwd=HERE, env=env, capture_output=True, text=True, timeout=CHILD_TIMEOUT,
+                )
+                try:
+                    results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+                except (IndexError, ValueError):
+                    results.append({"providers": n, "error": proc.stderr.strip()[-2000:] or "no output"})
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cycles": cycles,
+        "results": results,
+    }
+
+
+# ------------------------------------------------------------------#
+#  Child: measure one size                                           #
+# ------------------------------------------------------------------#
+def _rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _count_widgets(w) -> int:
+    return 1 + sum(_count_widgets(c) for c in w.winfo_children())
+
+
+def _timings(samples: list[float]) -> dict:
+    from stats import percentile
+
+    return {"p50_ms": percentile(samples, 0.5), "p95_ms": percentile(samples, 0.95),
+            "max_ms": max(samples, default=None)}
+
+
+def child(n: int, cycles: int) -> dict:
+    t0 = time.perf_counter()
+    import tkinter
+
+    import logic
+
+    logic.RESOLVED_CONF_PATH = os.environ["BENCH_RESOLVED_CONF"]
+    import daemon
+
+    daemon.SYSTEM_SOCKET_PATH = daemon.USER_SOCKET_PATH  # never attach to a real daemon
+    marks = {}
+
+    def fake_mainloop(self, n=0):
+        marks["mainloop"] = time.perf_counter()  # module-level setup finished
+
+    tkinter.Tk.mainloop = fake_mainloop
+    import main  # builds the whole UI, then calls the patched mainloop
+
+    root = main.root
+    root.update()
+    first_idle = time.perf_counter()
+    main.scheduler.stop()  # measure our refreshes only, not background jobs
+    root.update()
+
+    widgets_before, rss_before = _count_widgets(root), _rss_kb()
+    names = list(logic.DNS_CONFIGS)
+
+    def timed(fn) -> float:
+        t = time.perf_counter()
+        fn()
+        root.update_idletasks()
+        return (time.perf_counter() - t) * 1000.0
+
+    info, switch, add = [], [], []
+    for i in range(cycles):
+        info.append(timed(lambda: main.update_dns_info(skip_connectivity=True)))
+        switch.append(timed(lambda: (main.vm.set("provider", names[i % len(names)]), main.vm.flush())))
+        add.append(timed(main.add_list_refresh))
+        root.update()
+
+    return {
+        "providers": n,
+        "startup_ms": (marks["mainloop"] - t0) * 1000.0,
+        "first_idle_ms": (first_idle - t0) * 1000.0,
+        "widgets": widgets_before,
+        "widgets_after": _count_widgets(root),
+        "rss_kb": rss_before,
+        "rss_growth_kb": _rss_kb() - rss_before,
+        "update_dns_info": _timings(info),
+        "provider_switch": _timings(switch),
+        "add_panel_refresh": _timings(add),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the DNS Changer UI under Xvfb.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES)
+    parser.add_argument("--display", default="", help="use this X display instead of starting Xvfb")
+    parser.add_argument("-o", "--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(child(args.child, args.cycles)))
+        sys.exit(0)
+
+    try:
+        report = json.dumps(run(args.sizes, args.cycles, args.display), indent=4)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
@@ -0,0 +1,138 @@
+"""
+In-process ICMP echo over Linux unprivileged ping sockets
+(SOCK_DGRAM + IPPROTO_ICMP, allowed by net.ipv4.ping_group_range).
+Many targets and sequence numbers share one socket per address family and
+one receive loop, so probing a long provider list costs no fork per sample.
+"""
+
+import ipaddress
+import itertools
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Iterable, Optional
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _packet(kind: int, seq: int) -> bytes:
+    payload = struct.pack("!d", time.time()) + b"dns-changer"
+    header = struct.pack("!BBHHH", kind, 0, 0, 0, seq)
+    # the kernel rewrites the ID (and the ICMPv6 checksum) for ping sockets
+    return struct.pack("!BBHHH", kind, 0, _checksum(header + payload), 0, seq) + payload
+
+
+class IcmpPinger:
+    """
+    Raises OSError from the constructor when ping sockets are not permitted;
+    callers then fall back to the `ping` subprocess.
+    """
+
+    def __init__(self):
+        self._sock4 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        self._sock4.setblocking(False)
+        self._sock6: Optional[socket.socket] = None
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _socket6(self) -> Optional[socket.socket]:
+        if self._sock6 is None:
+            try:
+                self._sock6 = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM, socket.IPPROTO_ICMPV6)
+                self._sock6.setblocking(False)
+            except OSError:
+                return None
+        return self._sock6
+
+    def close(self) -> None:
+        for s in (self._sock4, self._sock6):
+            if s is not None:
+                s.close()
+
+    def ping_many(self, addrs: Iterable[str], timeout: float = 1.0) -> dict[str, Optional[float]]:
+        """One echo to each address; RTT in ms, None on timeout or bad address."""
+        addrs = list(dict.fromkeys(addrs))
+        results: dict[str, Optional[float]] = {a: None for a in addrs}
+        with self._lock:
+            # (family, normalized address, seq) -> (original address, send time)
+            inflight: dict[tuple, tuple[str, float]] = {}
+            for addr in addrs:
+                try:
+                    ip = ipaddress.ip_address(addr.split("%")[0])
+                except ValueError:
+                    continue
+                v6 = ip.version == 6
+                sock = self._socket6() if v6 else self._sock4
+                if sock is None:
+                    continue
+                seq = next(self._seq) & 0xFFFF
+                kind = ICMP6_ECHO_REQUEST if v6 else ICMP_ECHO_REQUEST
+                try:
+                    sock.sendto(_packet(kind, seq), (str(ip), 0))
+                except OSError:
+                    continue
+                inflight[(v6, str(ip), seq)] = (addr, time.perf_counter())
+
+            # every echo gets its own deadline, counted from its own send time
+            socks = [s for s in (self._sock4, self._sock6) if s is not None]
+            while inflight:
+                now = time.perf_counter()
+                for key in [k for k, (_, sent) in inflight.items() if now - sent >= timeout]:
+                    del inflight[key]  # timed out: stays None
+                if not inflight:
+                    break
+                left = min(sent for _, sent in inflight.values()) + timeout - now
+                ready, _, _ = select.select(socks, [], [], max(left, 0.0))
+                for sock in ready:
+                    v6 = sock is self._sock6
+                    while True:
+                        try:
+                            data, src = sock.recvfrom(2048)
+                        except OSError:  # BlockingIOError: drained
+                            break
+                        now = time.perf_counter()
+                        if len(data) < 8:
+                            continue
+                        kind, _, _, _, seq = struct.unpack_from("!BBHHH", data)
+                        if kind != (ICMP6_ECHO_REPLY if v6 else ICMP_ECHO_REPLY):
+                            continue
+                        src_ip = str(ipaddress.ip_address(src[0].split("%")[0]))
+                        hit = inflight.pop((v6, src_ip, seq), None)
+                        if hit is not None and now - hit[1] < timeout:
+                            results[hit[0]] = (now - hit[1]) * 1000.0
+        return results
+
+
+_pinger: Optional[IcmpPinger] = None
+_unavailable = False
+
+
+def get_pinger() -> Optional[IcmpPinger]:
+    """Shared pinger, or None if ping sockets are not permitted here."""
+    global _pinger, _unavailable
+    if _pinger is None and not _unavailable:
+        try:
+            _pinger = IcmpPinger()
+        except OSError:
+            _unavailable = True
+    return _pinger
+
+
+def ping_many(addrs: Iterable[str], timeout: float = 1.0) -> Optional[dict[str, Optional[float]]]:
+    """Batched echo through the shared socket; None means "use the fallback"."""
+    pinger = get_pinger()
+    return pinger.ping_many(addrs, timeout) if pinger else None
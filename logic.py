@@ -5,12 +5,20 @@ Stores JSON data and backups in ~/.config/dns-changer/ (XDG‑compliant).
 
 import json
 import os
+import re
 import shutil
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Callable, NamedTuple, Optional
 from subprocess import TimeoutExpired
 
+import dns_client
+import dns_wire
+import dot_probe
+import icmp
+
 # ------------------------------------------------------------------#
 #  Config directory handling                                         #
 # ------------------------------------------------------------------#
@@ -52,13 +60,20 @@ def _migrate_legacy_json(file_name: str) -> None:
 DEFAULT_DNS_FILE = "dns_configs.json"  # (legacy; rarely used now)
 CUSTOM_DNS_FILE = "custom_dns.json"
 PROMO_NEXTDNS_FILE = "promo_nextdns.json"
+SETTINGS_FILE = "settings.json"
 
 DEFAULT_DNS_PATH = os.path.join(CONFIG_DIR, DEFAULT_DNS_FILE)
 CUSTOM_DNS_PATH = os.path.join(CONFIG_DIR, CUSTOM_DNS_FILE)
 PROMO_NEXTDNS_PATH = os.path.join(CONFIG_DIR, PROMO_NEXTDNS_FILE)
+SETTINGS_PATH = os.path.join(CONFIG_DIR, SETTINGS_FILE)
 
 # systemd paths
 RESOLVED_CONF_PATH = "/etc/systemd/resolved.conf"
+RELOAD_RESOLVED_CMD = ["systemctl", "restart", "systemd-resolved"]
+
+# local caching forwarder (forwarder.py) listens here
+LOCAL_CACHE_NAME = "Local Cache"
+LOCAL_CACHE_ADDR = "127.0.0.1:5399"
 
 # ------------------------------------------------------------------#
 #  In‑memory DNS config cache                                        #
@@ -85,12 +100,21 @@ DEFAULT_DNS_CONFIGS = {
         "config": "[Resolve]\nDNS=94.140.14.14 94.140.15.15\nDNSOverTLS=yes\n",
         "ip": "94.140.14.14",
         "custom": False,
-    }
+    },
+
+    LOCAL_CACHE_NAME: {
+        "config": f"[Resolve]\nDNS={LOCAL_CACHE_ADDR}\nDNSOverTLS=no\n",
+        "ip": LOCAL_CACHE_ADDR,
+        "custom": False,
+        "local": True,
+    },
 }
 
 DNS_CONFIGS: dict[str, dict] = {}
 _sudo_password: Optional[str] = None
 _root = None  # set by main.py
+_post_switch_hooks: list[Callable[[], None]] = []
+_current_dns_source: Optional[Callable[[], Optional[str]]] = None
 
 # ------------------------------------------------------------------#
 #  Setup / migration                                                 #
@@ -107,6 +131,28 @@ def set_root(root):  # called once from main.py
     _root = root
 
 
+def set_current_dns_source(fn: Optional[Callable[[], Optional[str]]]) -> None:
+    """
+    Let `get_current_dns` ask a live source (e.g. resolved over D-Bus) first.
+    The source returns a provider name, or None to fall back to resolved.conf.
+    """
+    global _current_dns_source
+    _current_dns_source = fn
+
+
+def add_post_switch_hook(fn: Callable[[], None]) -> None:
+    """Run `fn` after every successful resolved.conf write + restart."""
+    _post_switch_hooks.append(fn)
+
+
+def _run_post_switch_hooks() -> None:
+    for fn in _post_switch_hooks:
+        try:
+            fn()
+        except Exception:
+            pass
+
+
 def load_dns_configs():
     global DNS_CONFIGS
     DNS_CONFIGS = DEFAULT_DNS_CONFIGS.copy()
@@ -165,11 +211,61 @@ def load_promo_nextdns_config() -> dict:
     return {}
 
 
+def promo_nextdns_block() -> str:
+    """Stored NextDNS block as a full [Resolve] config, or "" if none saved."""
+    promo = load_promo_nextdns_config().get("resolve", "").strip()
+    if not promo:
+        return ""
+    if promo.lstrip().lower().startswith("[resolve]"):
+        return promo
+    return f"[Resolve]\nDNS={promo}\nDNSOverTLS=yes\n"
+
+
 def save_promo_nextdns_config(data: dict) -> None:
     with open(PROMO_NEXTDNS_PATH, "w") as f:
         json.dump(data, f, indent=4)
 
 
+# ------------------------------------------------------------------#
+#  Settings                                                          #
+# ------------------------------------------------------------------#
+DEFAULT_SETTINGS = {
+    "race_upstreams": 0,       # local cache: race the top K providers (0/1 = off)
+    "race_hedge": False,       # stagger raced queries by each upstream's p90
+    "warmup": True,            # prime resolved's cache after every switch
+    "warmup_budget": 3.0,      # seconds
+    "warmup_concurrency": 8,
+    "slo_guard": True,         # probe after a switch, roll back if too slow
+    "slo_p95_ms": 300.0,
+    "slo_max_failure_rate": 0.1,
+    "slo_window": 3.0,         # seconds
+    "reorder_by_latency": False,  # rewrite DNS= fastest-first on every switch
+    "network_auto_switch": False,  # apply the provider remembered for a network without asking
+    "dbus_backend": True,      # read the effective resolver from resolve1 (needs jeepney)
+    "daemon_interval": 30.0,   # seconds between daemon probe rounds
+    "daemon_auto_switch": False,  # daemon moves to a clearly faster provider on its own
+    "discovery_resolver": "127.0.0.53",  # ADDR[:PORT] used to resolve endpoint names
+    "discovery_alternates": {},  # extra {sni suffix: [endpoint names]}
+}
+
+
+def load_settings() -> dict:
+    """Defaults overlaid with ~/.config/dns-changer/settings.json."""
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(SETTINGS_PATH):
+        try:
+            with open(SETTINGS_PATH, "r") as f:
+                settings.update(json.load(f))
+        except json.JSONDecodeError:
+            pass
+    return settings
+
+
+def save_settings(settings: dict) -> None:
+    with open(SETTINGS_PATH, "w") as f:
+        json.dump(settings, f, indent=4)
+
+
 # ------------------------------------------------------------------#
 #  Sudo helpers                                                      #
 # ------------------------------------------------------------------#
@@ -188,29 +284,90 @@ def _ask_sudo_password():
     return _sudo_password
 
 
+def _run_headless(cmd: list[str]):
+    """No Tk (daemon mode): run directly as root, else rely on `sudo -n`."""
+    run_privileged(cmd)
+
+
+def run_privileged(cmd: list[str], password: Optional[str] = None,
+                   check: bool = True) -> subprocess.CompletedProcess:
+    """
+    Run `cmd` as root with a password captured earlier (None: as root already,
+    else `sudo -n`). Never prompts and never touches the cached password, so
+    worker threads may call it. A wrong password always raises.
+    """
+    if password is not None:
+        full, stdin = ["sudo", "-S"] + cmd, f"{password}\n"
+    else:
+        full, stdin = (cmd if os.geteuid() == 0 else ["sudo", "-n"] + cmd), None
+    result = subprocess.run(full, input=stdin, text=True, capture_output=True)
+    if result.returncode != 0 and "incorrect password" in result.stderr.lower():
+        raise RuntimeError("Wrong password! Please try again.")
+    if check and result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"{cmd[0]} failed.")
+    return result
+
+
+def has_privileges() -> bool:
+    """True when a privileged command would run without prompting: root, or sudo granted earlier."""
+    return os.geteuid() == 0 or _sudo_password is not None
+
+
 def _run_sudo(cmd: list[str]):
     global _sudo_password
+    if _root is None and _sudo_password is None:
+        return _run_headless(cmd)
     pwd = _ask_sudo_password()
     if not pwd:
         raise RuntimeError("Sudo password not provided.")
-    result = subprocess.run(
-        ["sudo", "-S"] + cmd, input=f"{pwd}\n", text=True, capture_output=True
-    )
-    if result.returncode != 0:
+    try:
+        run_privileged(cmd, pwd)
+    except RuntimeError:
         _sudo_password = None
-        if "incorrect password" in result.stderr.lower():
-            raise RuntimeError("Wrong password! Please try again.")
-        raise RuntimeError(result.stderr.strip())
+        raise
 
 
 # ------------------------------------------------------------------#
 #  Core DNS / backup operations                                      #
 # ------------------------------------------------------------------#
+def ensure_sudo() -> Optional[str]:
+    """
+    Ask for the password now, on the Tk thread, and return it for worker
+    threads to pass to run_privileged (None when headless).
+    """
+    if _root is None:
+        return _sudo_password  # headless: _run_sudo never prompts
+    pwd = _ask_sudo_password()
+    if not pwd:
+        raise RuntimeError("Sudo password not provided.")
+    return pwd
+
+
+def install_config(cfg: str, path: str, reload_cmd: Optional[list[str]] = None,
+                   password: Optional[str] = None) -> None:
+    """
+    Copy `cfg` to `path` with sudo, then run `reload_cmd` (if any). With
+    `password` (from ensure_sudo) nothing prompts, so worker threads may call it.
+    """
+    run = _run_sudo if password is None else (lambda cmd: run_privileged(cmd, password))
+
+    fd, tmp_path = tempfile.mkstemp(prefix="resolved-", suffix=".conf")
+    try:
+        with os.fdopen(fd, "w") as tmp:
+            tmp.write(cfg)
+        os.chmod(tmp_path, 0o644)
+        run(["cp", tmp_path, path])
+    finally:
+        os.remove(tmp_path)
+    if reload_cmd:
+        run(reload_cmd)
+
+
 def write_config(cfg: str):
-    with open("/tmp/resolved.conf", "w") as tmp:
-        tmp.write(cfg)
-    _run_sudo(["cp", "/tmp/resolved.conf", RESOLVED_CONF_PATH])
-    _run_sudo(["systemctl", "restart", "systemd-resolved"])
+    if load_settings().get("reorder_by_latency"):
+        cfg = reorder_dns_line(cfg, probe_addresses(provider_addresses(cfg)))
+    install_config(cfg, RESOLVED_CONF_PATH, RELOAD_RESOLVED_CMD)
+    _run_post_switch_hooks()
 
 
 def check_dns_connectivity() -> bool:
@@ -231,19 +388,20 @@ def check_dns_connectivity() -> bool:
 
 
 def get_current_dns() -> str:
+    if _current_dns_source is not None:
+        try:
+            name = _current_dns_source()
+            if name:
+                return name
+        except Exception:
+            pass
     try:
         with open(RESOLVED_CONF_PATH) as f:
             content = f.read()
 
-        promo = load_promo_nextdns_config().get("resolve", "").strip()
-        if promo:
-            block = (
-                promo
-                if promo.lstrip().lower().startswith("[resolve]")
-                else f"[Resolve]\nDNS={promo}\nDNSOverTLS=yes\n"
-            )
-            if block.strip() in content:
-                return "NextDNS"
+        block = promo_nextdns_block()
+        if block and (block.strip() in content or same_servers(block, content)):
+            return "NextDNS"
 
         for n, d in DNS_CONFIGS.items():
             if d["ip"] and d["ip"] in content:
@@ -252,16 +410,201 @@ def get_current_dns() -> str:
         pass
     return "Unknown"
 
-def get_ping_time(addr: str) -> str:
+class DnsServer(NamedTuple):
+    address: str
+    port: Optional[int] = None
+    sni: Optional[str] = None
+
+
+def parse_dns_servers(cfg: str) -> list[DnsServer]:
+    """
+    Split every DNS= line of a [Resolve] block into its servers.
+    Accepts resolved's ADDRESS[:PORT][%IFACE][#SNI] syntax, IPv6 in brackets.
+    """
+    servers: list[DnsServer] = []
+    for line in cfg.splitlines():
+        key, _, value = line.strip().partition("=")
+        if key.strip() != "DNS":
+            continue
+        for item in value.split():
+            item, _, sni = item.partition("#")
+            port = None
+            if item.startswith("["):
+                addr, _, rest = item[1:].partition("]")
+                if rest.startswith(":") and rest[1:].split("%")[0].isdigit():
+                    port = int(rest[1:].split("%")[0])
+            elif item.count(":") == 1:
+                addr, _, p = item.partition(":")
+                p = p.split("%")[0]
+                port = int(p) if p.isdigit() else None
+            else:
+                addr = item
+            addr = addr.split("%")[0]
+            if addr:
+                servers.append(DnsServer(addr, port, sni or None))
+    return servers
+
+
+def uses_dns_over_tls(cfg: str) -> bool:
+    """True if the block asks resolved for DNSOverTLS=yes / opportunistic."""
+    m = re.search(r"^\s*DNSOverTLS\s*=\s*(\S+)", cfg, re.I | re.M)
+    return bool(m) and m.group(1).lower() in ("yes", "true", "1", "opportunistic")
+
+
+def ping_ms(addr: str) -> Optional[float]:
+    """One ICMP echo to `addr`; round-trip in ms or None if unreachable."""
     if not addr or addr == "N/A":
-        return "N/A"
-    res = subprocess.run(
-        ["ping", "-c", "1", "-W", "1", addr], capture_output=True, text=True
-    )
+        return None
+    batched = icmp.ping_many([addr])
+    if batched is not None:
+        return batched.get(addr)
+    return _ping_subprocess(addr)
+
+
+def _ping_subprocess(addr: str) -> Optional[float]:
+    """Fallback when unprivileged ping sockets are not permitted."""
+    try:
+        res = subprocess.run(
+            ["ping", "-c", "1", "-W", "1", addr], capture_output=True, text=True
+        )
+    except (FileNotFoundError, OSError):
+        return None
     for line in res.stdout.splitlines():
         if "time=" in line:
-            return line.split("time=")[1].split()[0] + " ms"
-    return "N/A"
+            try:
+                return float(line.split("time=")[1].split()[0])
+            except ValueError:
+                return None
+    return None
+
+
+def get_ping_time(addr: str) -> str:
+    ms = ping_ms(addr)
+    return "N/A" if ms is None else f"{ms:.1f} ms"
+
+
+def provider_addresses(cfg: str) -> list[str]:
+    """Every distinct address on the DNS= line(s), in config order."""
+    return list(dict.fromkeys(s.address for s in parse_dns_servers(cfg)))
+
+
+def same_servers(a: str, b: str) -> bool:
+    """Same DNS= servers (address, port, SNI) in any order or line layout."""
+    servers = set(parse_dns_servers(a))
+    return bool(servers) and servers == set(parse_dns_servers(b))
+
+
+def probe_addresses(addrs: list[str]) -> dict[str, Optional[float]]:
+    """Ping all `addrs` in parallel; None marks an unreachable address."""
+    if not addrs:
+        return {}
+    batched = icmp.ping_many(addrs)
+    if batched is not None:
+        return batched
+    with ThreadPoolExecutor(max_workers=min(16, len(addrs))) as pool:
+        return dict(zip(addrs, pool.map(_ping_subprocess, addrs)))
+
+
+SLOW_SERVER_MS = 500.0  # custom servers slower than this are not saved
+VERIFY_NAME = "example.com"
+
+
+class ServerCheck(NamedTuple):
+    server: DnsServer
+    ms: Optional[float]
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.ms is not None and self.ms <= SLOW_SERVER_MS
+
+
+def _check_server(server: DnsServer, dot: bool, timeout: float) -> ServerCheck:
+    if dot:
+        # certificate checked against the #name, else against the address (as resolved does)
+        r = dot_probe.probe_server(server.address, server.sni, server.port or dot_probe.DOT_PORT,
+                                   timeout=timeout, queries=1, resume=False, name=VERIFY_NAME)
+        return ServerCheck(server, r.score if r.ok else None, r.error)
+    ms, rc = dns_client.resolve_once(server.address, VERIFY_NAME, port=server.port or dns_client.DNS_PORT,
+                                     timeout=timeout)
+    if ms is None:
+        return ServerCheck(server, None, "no answer")
+    if rc not in (dns_wire.RCODE_NOERROR, dns_wire.RCODE_NXDOMAIN):
+        return ServerCheck(server, None, f"rcode {rc}")
+    return ServerCheck(server, ms)
+
+
+def verify_servers(cfg: str, timeout: float = 2.0) -> list[ServerCheck]:
+    """
+    Ask every server of a [Resolve] block one query at the same time – over
+    DoT when the block enables it – without touching resolved. Never raises.
+    """
+    servers = parse_dns_servers(cfg)
+    if not servers:
+        return []
+    dot = uses_dns_over_tls(cfg)
+
+    def one(s: DnsServer) -> ServerCheck:
+        try:
+            return _check_server(s, dot, timeout)
+        except Exception as e:
+            return ServerCheck(s, None, str(e) or e.__class__.__name__)
+
+    with ThreadPoolExecutor(max_workers=len(servers)) as pool:
+        return list(pool.map(one, servers))
+
+
+def benchmark_providers(configs: Optional[dict] = None) -> dict[str, Optional[float]]:
+    """Best RTT per provider over all of its addresses, from one batched probe."""
+    configs = DNS_CONFIGS if configs is None else configs
+    addrs = {n: provider_addresses(d.get("config", "")) for n, d in configs.items() if not d.get("local")}
+    results = probe_addresses(list(dict.fromkeys(a for lst in addrs.values() for a in lst)))
+    best = {}
+    for name, lst in addrs.items():
+        ok = [results[a] for a in lst if results.get(a) is not None]
+        best[name] = min(ok) if ok else None
+    return best
+
+
+def benchmark_dot(configs: Optional[dict] = None) -> dict[str, Optional[float]]:
+    """
+    DotResult.score (connect + handshake + query on port 853, certificate
+    verified) of every DoT provider. A different metric from the ping RTTs of
+    benchmark_providers, so it is kept apart from them.
+    """
+    configs = DNS_CONFIGS if configs is None else configs
+    return {name: (score if score != float("inf") else None)
+            for name, score, _ in dot_probe.rank_providers(configs)}
+
+
+def reorder_dns_line(cfg: str, latencies: dict[str, Optional[float]]) -> str:
+    """
+    Merge the DNS= line(s) into one, fastest address first and unreachable
+    ones last, so resolved tries the quickest endpoint before failing over.
+    """
+    entries = []
+    for line in cfg.splitlines():
+        key, _, value = line.strip().partition("=")
+        if key.strip() == "DNS":
+            entries += value.split()
+    if len(entries) < 2:
+        return cfg
+    servers = parse_dns_servers("DNS=" + " ".join(entries))
+
+    def rank(i: int):
+        ms = latencies.get(servers[i].address)
+        return (ms is None, ms if ms is not None else 0.0, i)
+
+    ordered = [entries[i] for i in sorted(range(len(entries)), key=rank)]
+    out, placed = [], False
+    for line in cfg.splitlines():
+        if line.strip().partition("=")[0].strip() == "DNS":
+            if not placed:
+                out.append("DNS=" + " ".join(ordered))
+                placed = True
+            continue
+        out.append(line)
+    return "\n".join(out) + ("\n" if cfg.endswith("\n") else "")
 
 
 # --------------------------- Backups ---------------------------------#
@@ -294,7 +637,8 @@ def restore_backup(fname: str):
             RESOLVED_CONF_PATH,
         ]
     )
-    _run_sudo(["systemctl", "restart", "systemd-resolved"])
+    _run_sudo(RELOAD_RESOLVED_CMD)
+    _run_post_switch_hooks()
 
 
 def restore_latest():
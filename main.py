@@ -7,9 +7,21 @@ Split modules:
 """
 
 import sys
+import os
 import re
+import time
 import logic
 import sv_ttk
+import warmup
+import slo_guard
+import netwatch
+import tsdb
+import resolved_dbus
+import forwarder
+import resolved_stats
+import discovery
+import snapshot
+import daemon
 import platform
 import ipaddress
 import tkinter as tk
@@ -17,8 +29,11 @@ import next_dns_promo
 from pathlib import Path
 from typing import Callable, Optional
 from widgets import create_provider_row
+from scheduler import Scheduler
+from viewmodel import ViewModel
+from stats import LatencyWindow
 from tkinter import ttk, PhotoImage, messagebox
-from panels import add as add_panel, backup_restore as backup_panel
+from panels import add as add_panel, backup_restore as backup_panel, history as history_panel
 from ui import center_window, show_error, show_success, create_circle_image, fa_icon
 
 # -- Root window & theme ------------------------------------------------
@@ -30,16 +45,19 @@ BASE_DIR = Path(__file__).resolve().parent
 root = tk.Tk()
 root.iconphoto(False, PhotoImage(file=BASE_DIR / "logo" / "logo40.png"))
 root.title("DNS Changer")
-root.geometry("410x570")
+root.geometry("410x640")
 root.resizable(False, False)
 root.attributes("-alpha", 0.9)
 sv_ttk.set_theme("dark")
 logic.set_root(root)
+scheduler = Scheduler(root)
+vm = ViewModel(root)
 
 # -- Icons & styles -----------------------------------------------------
 icon_dns    = fa_icon("earth-americas", size=16)
 icon_add    = fa_icon("plus",            size=16)
 icon_backup = fa_icon("box-archive",     size=16)
+icon_history= fa_icon("chart-line",      size=16)
 
 style = ttk.Style()
 style.configure("Card.TFrame",     background="#333333", relief="ridge", borderwidth=2)
@@ -56,60 +74,82 @@ add_list_refresh: Optional[Callable[[], None]] = None
 def custom_dns_names() -> list[str]:
     return [n for n, d in logic.DNS_CONFIGS.items() if d.get("custom")]
 
+def cache_upstream() -> Optional[str]:
+    """Upstream of the local cache, whether this window or the daemon hosts it."""
+    if not forwarder.is_running() and daemon_hosts_cache():
+        return daemon_status["forwarder"].get("upstream_name")
+    return forwarder.upstream_name()
+
+def ping_target_for(name: str) -> Optional[str]:
+    """Address to ping for a provider; the local cache reports its upstream."""
+    if name == "NextDNS":
+        addrs = logic.provider_addresses(logic.promo_nextdns_block())
+        return addrs[0] if addrs else None
+    if name == logic.LOCAL_CACHE_NAME:
+        name = cache_upstream() or ""
+    d = logic.DNS_CONFIGS.get(name)
+    return d["ip"] if d else None
+
+def config_for(name: str) -> str:
+    """[Resolve] block behind a provider name (NextDNS, local cache upstream…)."""
+    if name == "NextDNS":
+        return logic.promo_nextdns_block()
+    if name == logic.LOCAL_CACHE_NAME:
+        name = cache_upstream() or ""
+    return logic.DNS_CONFIGS.get(name, {}).get("config", "")
+
+def ping_name_for(name: str) -> str:
+    """History key for a ping sample: the local cache is charged to its upstream."""
+    if name == logic.LOCAL_CACHE_NAME:
+        return cache_upstream() or name
+    return name
+
 def update_dns_info(skip_connectivity: bool = False) -> None:
+    """Push the current state into the view model; widgets update themselves."""
     cur = logic.get_current_dns()
 
-    if cur == "NextDNS":
-        name_value.config(text="NextDNS")
-        promo = logic.load_promo_nextdns_config().get("resolve", "").strip()
-        m = re.search(r"DNS=([0-9]+\.[0-9]+\.[0-9]+\.[0-9]+)#", promo)
-        ip_addr = m.group(1) if m else "N/A"
-        address_value.config(text=ip_addr)
-    elif cur in logic.DNS_CONFIGS:
-        name_value.config(text=cur)
-        address_value.config(text=logic.DNS_CONFIGS[cur]["ip"])
+    if cur == logic.LOCAL_CACHE_NAME and cache_upstream():
+        display = f"Cache → {cache_upstream()}"
+    elif cur == "NextDNS" or cur in logic.DNS_CONFIGS:
+        display = cur
     else:
-        name_value.config(text="Unknown")
-        address_value.config(text="N/A")
-
-    ok = True if skip_connectivity else logic.check_dns_connectivity()
-    status_value.config(
-        text="CONNECTED" if ok else "DISCONNECTED",
-        foreground="#66f859" if ok else "#ff5555",
-    )
-
-    # Update ping
+        display = "Unknown"
     if cur == "NextDNS":
-        ping_target = ip_addr
+        address = ping_target_for(cur) or "N/A"
     elif cur in logic.DNS_CONFIGS:
-        ping_target = logic.DNS_CONFIGS[cur]["ip"]
+        address = logic.DNS_CONFIGS[cur]["ip"]
     else:
-        ping_target = None
-
-    ping_value.config(
-        text=logic.get_ping_time(ping_target) if ping_target else "N/A"
+        address = "N/A"
+
+    vm.update(provider=cur, display_name=display, address=address)
+    vm.set("connected", True if skip_connectivity else logic.check_dns_connectivity())
+    scheduler.run_soon("ping")
+
+# -- View-model subscribers ---------------------------------------------
+_dot_cache: dict[str, object] = {}
+
+def status_dot(color: str):
+    if color not in _dot_cache:
+        _dot_cache[color] = create_circle_image(20, color)
+    return _dot_cache[color]
+
+def set_row_active(w: dict, active: bool, leavable: bool = False) -> None:
+    w["circle"].config(image=status_dot("#66f859" if active else "#615382"))
+    w["button"].config(
+        text=("Leave Cache" if leavable else "Connected") if active else "Connect",
+        state="disabled" if active and not leavable else "normal",
+        style="Connected.TButton" if active else "TButton",
     )
 
-    # Update status dots and buttons for built-ins
-    for name, w in provider_widgets.items():
-        active = (name == cur)
-        color = "#66f859" if active else "#615382"
-        dot = create_circle_image(20, color)
-        w["circle"].config(image=dot)
-        w["circle"].image = dot
-        w["button"].config(
-            text="Connected" if active else "Connect",
-            state="disabled" if active else "normal",
-            style="Connected.TButton" if active else "TButton",
-        )
+def on_provider_changed(cur: str, prev: Optional[str]) -> None:
+    # only the rows that gained or lost the active state are touched
+    for name in {cur, prev} - {None}:
+        if name in provider_widgets:
+            set_row_active(provider_widgets[name], name == cur,
+                           leavable=bool(logic.DNS_CONFIGS.get(name, {}).get("local")))
 
-    # Update promo row
     if promo_circle_label:
-        color = "#66f859" if cur == "NextDNS" else "#615382"
-        dot = create_circle_image(20, color)
-        promo_circle_label.config(image=dot)
-        promo_circle_label.image = dot
-
+        promo_circle_label.config(image=status_dot("#66f859" if cur == "NextDNS" else "#615382"))
     if promo_connect_btn:
         is_next = (cur == "NextDNS")
         promo_connect_btn.config(
@@ -117,40 +157,376 @@ def update_dns_info(skip_connectivity: bool = False) -> None:
             state="disabled" if is_next else "normal",
         )
 
-    # Refresh the ADD-tab list if open
+    # the ADD-tab list marks the active custom provider too
     if add_list_refresh:
         add_list_refresh()
 
+def on_connected_changed(ok: Optional[bool], _prev) -> None:
+    if ok is None:
+        status_value.config(text="CHECKING…", foreground="#a0a0a0")
+        return
+    if vm.get("stale"):
+        status_value.config(text=f"{'CONNECTED' if ok else 'DISCONNECTED'} (last run)", foreground="#a0a0a0")
+        return
+    status_value.config(
+        text="CONNECTED" if ok else "DISCONNECTED",
+        foreground="#66f859" if ok else "#ff5555",
+    )
+
+def on_stale_changed(stale: bool, _prev) -> None:
+    """Snapshot values are greyed out until the first fresh probe lands."""
+    for lbl in (name_value, address_value, ping_value):
+        lbl.config(foreground="#a0a0a0" if stale else "")
+    on_connected_changed(vm.get("connected"), None)
 
+def on_endpoints_changed(value: tuple, _prev) -> None:
+    text, any_dead = value
+    endpoints_value.config(text=text, foreground="#ff5555" if any_dead else "")
 
-def update_ping() -> None:
+def bind_latency_label(name: str, label: ttk.Label) -> None:
+    vm.subscribe(
+        f"latency:{name}",
+        lambda ms, _prev: label.config(text="" if ms is None else f"{ms:.0f} ms"),
+    )
+
+
+
+_last_ping_state: tuple = ()
+
+def probe_ping() -> tuple:
+    """Background half of the ping job: (provider, ms, pinged here)."""
     cur = logic.get_current_dns()
+    ping_target = ping_target_for(cur)
+    status = daemon_status if daemon_fresh() else None
+    if status is not None and ping_name_for(cur) in status["latencies"]:
+        return cur, status["latencies"][ping_name_for(cur)], False  # already recorded by the daemon
+    ms = logic.ping_ms(ping_target) if ping_target else None
+    if ping_target:
+        tsdb.record(ping_name_for(cur), ms)
+    return cur, ms, bool(ping_target)
+
+def update_ping(result: tuple) -> bool:
+    """Tk half of the ping job; returns True when provider or reachability changed."""
+    global _last_ping_state
+    cur, ms, pinged = result
+    vm.set("ping", "N/A" if ms is None else f"{ms:.1f} ms")
+    if pinged:
+        vm.set(f"latency:{ping_name_for(cur)}", ms)
+    state = (cur, ms is not None)
+    changed, _last_ping_state = state != _last_ping_state, state
+    return changed
+
+_connectivity_future = None
+
+def check_connectivity() -> bool:
+    """Scheduler job: dig runs in the background; a changed verdict resets the interval."""
+    global _connectivity_future
+    if daemon_fresh():
+        before = vm.get("connected")
+        update_dns_info(skip_connectivity=True)  # check_daemon carries the daemon's verdict
+        return vm.get("connected") != before
+    if _connectivity_future is not None:
+        return False  # the previous check is still running
+
+    def done(connected, error):
+        global _connectivity_future
+        _connectivity_future = None
+        before = vm.get("connected")
+        update_dns_info(skip_connectivity=True)
+        vm.set("connected", bool(connected) and error is None)
+        if vm.get("connected") != before:
+            scheduler.reset("connectivity")
+
+    _connectivity_future = scheduler.run_in_background(logic.check_dns_connectivity, done)
+    return False
+
+_conf_stat: tuple = ()
+
+def check_conf_file() -> bool:
+    """Pick up resolved.conf edits made outside the app."""
+    global _conf_stat
+    try:
+        st = os.stat(logic.RESOLVED_CONF_PATH)
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        key = ()
+    if key == _conf_stat:
+        return False
+    first, _conf_stat = not _conf_stat, key
+    if not first:
+        update_dns_info(skip_connectivity=True)
+        scheduler.boost()
+    return True
+
+endpoint_stats: dict[str, LatencyWindow] = {}
+
+def probe_endpoints() -> tuple[list[str], dict[str, Optional[float]]]:
+    """Background half of the endpoints job: every address of the active provider, probed."""
+    addrs = logic.provider_addresses(config_for(logic.get_current_dns()))
+    return addrs, logic.probe_addresses(addrs)
+
+def update_endpoints(result: tuple[list[str], dict[str, Optional[float]]]) -> bool:
+    """Tk half of the endpoints job; flags unreachable addresses."""
+    addrs, results = result
+    parts = []
+    for addr in addrs:
+        win = endpoint_stats.setdefault(addr, LatencyWindow(size=30))
+        win.add(results.get(addr))
+        ms = results.get(addr)
+        part = f"{addr} {ms:.0f} ms" if ms is not None else f"✗ {addr}"
+        if 0 < win.loss < 1:
+            part += f" ({win.loss:.0%} loss)"
+        parts.append(part)
+    return vm.set("endpoints", (" · ".join(parts) or "N/A", None in results.values()))
+
+net_watcher = netwatch.NetworkWatcher()
+_bench_future = None
+
+def benchmark_network(force: bool = False) -> bool:
+    """Scheduler job: re-benchmark the current network in the background when stale."""
+    global _bench_future
+    fp = net_watcher.current
+    if daemon_fresh():
+        return False  # the daemon benchmarks for us
+    if _bench_future is not None or not (force or netwatch.needs_benchmark(fp)):
+        return False
 
-    if cur == "NextDNS":
-        promo = logic.load_promo_nextdns_config().get("resolve", "").strip()
-        m = re.search(r"DNS=([0-9]+\.[0-9]+\.[0-9]+\.[0-9]+)#", promo)
-        ping_target = m.group(1) if m else None
-    elif cur in logic.DNS_CONFIGS:
-        ping_target = logic.DNS_CONFIGS[cur]["ip"]
+    def done(results, error):
+        global _bench_future
+        _bench_future = None
+        if error is not None:
+            return
+        netwatch.record(fp, results)
+        for name, ms in results.items():
+            if name != logic.get_current_dns():  # already sampled by the ping job
+                tsdb.record(name, ms)
+                vm.set(f"latency:{name}", ms)
+
+    _bench_future = scheduler.run_in_background(logic.benchmark_providers, done)
+    return True
+
+def check_network() -> bool:
+    """
+    Scheduler job: on a network change, offer the provider remembered for it.
+    It is only applied unasked with network_auto_switch on and no password
+    prompt needed (root, or sudo already granted this session).
+    """
+    fp = net_watcher.poll()
+    if fp is None:
+        return False
+    choice = netwatch.cached_choice(fp)
+    if not choice or choice == logic.get_current_dns():
+        vm.set("network_suggestion", None)
+    elif logic.load_settings().get("network_auto_switch") and logic.has_privileges():
+        vm.set("network_suggestion", None)
+        connect_provider(choice)
     else:
-        ping_target = None
+        vm.set("network_suggestion", choice)
+    benchmark_network()
+    return True
+
+def accept_network_suggestion() -> None:
+    choice = vm.get("network_suggestion")
+    vm.set("network_suggestion", None)
+    if choice:
+        connect_provider(choice)
+
+def on_network_suggestion(choice: Optional[str], _prev) -> None:
+    if choice:
+        network_btn.config(text=f"Use {choice} (used on this network before)")
+        network_btn.grid()
+    else:
+        network_btn.grid_remove()
+
+# -- Daemon attach -----------------------------------------------------
+daemon_status: Optional[dict] = None
 
-    ping_value.config(
-        text=logic.get_ping_time(ping_target) if ping_target else "N/A"
+def daemon_fresh() -> bool:
+    """True while a running daemon has probed within the last few rounds."""
+    if daemon_status is None:
+        return False
+    return time.time() - daemon_status.get("updated", 0) < 3 * daemon_status.get("interval", 30)
+
+def daemon_state_dir() -> Optional[str]:
+    """A system daemon's state directory (history, cache state), when it is not ours."""
+    state_dir = (daemon_status or {}).get("state_dir")
+    return state_dir if state_dir and state_dir != logic.CONFIG_DIR else None
+
+def daemon_hosts_cache() -> bool:
+    """True while the daemon, not this window, runs the local cache's forwarder."""
+    return daemon_fresh() and "forwarder" in daemon_status
+
+def check_daemon() -> bool:
+    """Scheduler job: read the daemon's snapshot instead of probing ourselves."""
+    global daemon_status
+    snap = daemon.fetch_status()
+    attached_changed = (snap is None) != (daemon_status is None)
+    daemon_status = snap
+    state_dir = daemon_state_dir()
+    tsdb.read_from(os.path.join(state_dir, "history") if state_dir else None)
+    if snap is not None:
+        for name, ms in snap.get("latencies", {}).items():
+            vm.set(f"latency:{name}", ms)
+        if snap.get("connected") is not None:
+            vm.set("connected", snap["connected"])
+    return attached_changed
+
+# -- Warm start ---------------------------------------------------------
+def apply_snapshot(snap: dict) -> None:
+    """Paint the last run's state right away; fresh probes replace it."""
+    vm.update(
+        stale=True,
+        provider=snap.get("provider", "Unknown"),
+        display_name=snap.get("display_name", "Unknown"),
+        address=snap.get("address", "N/A"),
+        ping=snap.get("ping", "N/A"),
+        connected=snap.get("connected", False),
     )
-    root.after(1000, update_ping)
+    for name, ms in snap.get("latencies", {}).items():
+        vm.set(f"latency:{name}", ms)
 
+def known_latencies() -> dict[str, Optional[float]]:
+    """Latest latency per provider, from our own probes or the daemon's."""
+    return {k.split(":", 1)[1]: v for k, v in vm.fields("latency:").items()}
 
+def save_snapshot() -> bool:
+    """Scheduler job, and once more on exit."""
+    if vm.get("stale"):
+        return False  # nothing fresh to keep yet
+    try:
+        snapshot.save({
+            "provider": vm.get("provider"),
+            "display_name": vm.get("display_name"),
+            "address": vm.get("address"),
+            "ping": vm.get("ping"),
+            "connected": bool(vm.get("connected")),
+            "latencies": known_latencies(),
+        })
+    except OSError:
+        pass
+    return False
+
+def refresh_in_background() -> None:
+    """First fresh state after launch, with dig off the Tk thread."""
+    def done(connected, error):
+        update_dns_info(skip_connectivity=True)
+        vm.update(connected=bool(connected), stale=False)
+
+    scheduler.run_in_background(logic.check_dns_connectivity, done)
+
+guard_running = False  # an SLO guard is sampling the new provider
+
+def warm_up_after_switch() -> None:
+    """Post-switch hook: prime resolved's fresh cache in the background."""
+    settings = logic.load_settings()
+    if not settings.get("warmup") or guard_running:
+        return  # switch_to warms up itself once the guard has its samples
+    if forwarder.is_running():
+        warmup.learn(forwarder.cached_names())
+    vm.set("warmup", "running…")
+    budget = float(settings.get("warmup_budget", warmup.DEFAULT_BUDGET))
+    concurrency = int(settings.get("warmup_concurrency", warmup.DEFAULT_CONCURRENCY))
+    names = warmup.domains(shared_dir=daemon_state_dir())
+    scheduler.run_in_background(
+        lambda: warmup.warm_up(names, budget=budget, concurrency=concurrency),
+        lambda report, error: vm.set("warmup", "failed" if error else str(report)),
+    )
 
 # -- DNS operations ----------------------------------------------------
+def leave_cache() -> None:
+    """
+    Point resolved away from the local cache, then stop the forwarder; a
+    daemon-hosted one stops itself once it sees resolved has moved on.
+    """
+    backup = forwarder.restore_point()
+    if backup:
+        logic.restore_backup(backup)  # the setup from before the cache
+    else:
+        name = cache_upstream() or forwarder.default_upstream()
+        if name is None:
+            raise RuntimeError("No provider to go back to.")
+        logic.write_config(logic.DNS_CONFIGS[name]["config"])  # the cache's upstream, directly
+    warmup.learn(forwarder.cached_names())
+    forwarder.stop()
+    forwarder.set_restore_point(None)
+
 def connect_provider(name: str) -> None:
     try:
-        logic.write_config(logic.DNS_CONFIGS[name]["config"])
-        update_dns_info()
-        show_success(root, f"Switched to {name}.")
+        cur = logic.get_current_dns()
+        if logic.DNS_CONFIGS[name].get("local") and cur == name:
+            leave_cache()
+            scheduler.boost()
+            update_dns_info()
+            show_success(root, f"Left the local cache, now on {logic.get_current_dns()}.")
+            return
+        if logic.DNS_CONFIGS[name].get("local"):
+            backup = logic.backup_resolved()
+            forwarder.start(cur if cur in logic.DNS_CONFIGS else None, known_latencies())
+            forwarder.set_restore_point(backup)
+        elif cur == logic.LOCAL_CACHE_NAME and forwarder.is_running():
+            # resolved already points at the cache: swap upstream in-process
+            forwarder.switch_upstream(name, known_latencies())
+            scheduler.boost()
+            update_dns_info()
+            show_success(root, f"Local cache now forwards to {name}.")
+            return
+        elif cur == logic.LOCAL_CACHE_NAME and daemon_hosts_cache():
+            forwarder.request_upstream(name, daemon_state_dir())  # the daemon swaps on its next round
+            update_dns_info()
+            show_success(root, f"The daemon's local cache will forward to {name} "
+                               f"within {int(daemon_status.get('interval', 30))} s.")
+            return
+        switch_to(name, logic.DNS_CONFIGS[name]["config"])
     except Exception as e:
         show_error(root, str(e))
 
+def switch_to(name: str, cfg: str) -> None:
+    """
+    Write `cfg` and, with the SLO guard enabled, probe the new provider in the
+    background and restore the pre-switch backup if it is too slow or failing.
+    """
+    settings = logic.load_settings()
+    scheduler.boost()
+    if not settings.get("slo_guard"):
+        logic.write_config(cfg)
+        update_dns_info()
+        show_success(root, f"Switched to {name}.")
+        return
+
+    global guard_running
+    slo = slo_guard.Slo.from_settings(settings)
+    backup = logic.backup_resolved()
+    guard_running = True  # warm-up traffic would land in the guard's samples
+    try:
+        logic.write_config(cfg)
+    except Exception:
+        guard_running = False
+        raise
+    update_dns_info(skip_connectivity=True)
+    vm.set("connected", None)  # shown as CHECKING… until the guard reports
+
+    def done(samples, error):
+        global guard_running
+        guard_running = False
+        if error is not None:
+            show_error(root, str(error))
+            return
+        try:
+            report = slo_guard.evaluate(name, samples, slo, backup)
+            if report.ok:
+                update_dns_info()
+                warm_up_after_switch()
+                show_success(root, f"Switched to {name}.\n{report}")
+                return
+            logic.restore_backup(backup)
+            report.rolled_back = True
+            update_dns_info()
+            show_error(root, f"{name} missed the latency SLO, rolled back.\n{report}")
+        except Exception as e:
+            show_error(root, str(e))
+
+    scheduler.run_in_background(lambda: slo_guard.probe_after_switch(slo), done)
+
 def remove_custom_dns(name: str) -> None:
     if logic.DNS_CONFIGS.get(name, {}).get("custom"):
         logic.DNS_CONFIGS.pop(name)
@@ -160,6 +536,37 @@ def remove_custom_dns(name: str) -> None:
             add_list_refresh()
         update_dns_info()
 
+def discover_endpoints() -> None:
+    """Look for faster endpoints of the active provider and offer to use them."""
+    name = logic.get_current_dns()
+    if not discovery.candidate_names(discovery.config_for(name)):
+        show_error(root, f"{name} has no hostname (#sni) to discover endpoints for.")
+        return
+    discover_btn.config(state="disabled", text="Searching…")
+
+    def done(disc, error):
+        discover_btn.config(state="normal", text="Find closer")
+        if error is not None:
+            show_error(root, str(error))
+            return
+        cur_ms = disc.best_ms(logic.provider_addresses(discovery.config_for(name)))
+        new_ms = disc.best_ms(disc.best())
+        if new_ms is None or (cur_ms is not None and new_ms >= cur_ms * 0.9):
+            show_success(root, f"{name} already uses its fastest endpoints.")
+            return
+        if not discovery.can_apply(name):
+            show_success(root, f"Faster endpoints for {name}: {', '.join(disc.best())} ({new_ms:.0f} ms).")
+            return
+        was = "unreachable" if cur_ms is None else f"{cur_ms:.0f} ms"
+        if messagebox.askyesno("Faster endpoints",
+                               f"{', '.join(disc.best())}\n{was} → {new_ms:.0f} ms\n\nRewrite {name} to use them?"):
+            try:
+                switch_to(name, discovery.apply(name, disc))
+            except Exception as e:
+                show_error(root, str(e))
+
+    scheduler.run_in_background(lambda: discovery.discover(name), done)
+
 # -- Validators --------------------------------------------------------
 def _valid_name(txt: str) -> bool:
     return bool(re.fullmatch(r"[A-Za-z0-9 _-]{1,40}", txt))
@@ -213,15 +620,33 @@ def show_add_dns_popup() -> None:
     row = len(fields) + 1
     ttk.Label(frm, text="DNS-over-TLS:", font=("Satoshi", 10)).grid(row=row, column=0, sticky="e", padx=5, pady=4)
     ttk.Checkbutton(frm, variable=tls_var).grid(row=row, column=1, sticky="w")
-    ttk.Separator(frm).grid(row=row+1, column=0, columnspan=3, sticky="ew", pady=10)
+    verify_var = tk.BooleanVar(value=True)
+    ttk.Label(frm, text="Verify on save:", font=("Satoshi", 10)).grid(row=row+1, column=0, sticky="e", padx=5, pady=4)
+    ttk.Checkbutton(frm, variable=verify_var).grid(row=row+1, column=1, sticky="w")
+    results_lbl = ttk.Label(frm, text="", font=("Satoshi", 9), justify="left", wraplength=400)
+    results_lbl.grid(row=row+2, column=0, columnspan=3, sticky="w", padx=5, pady=(4, 0))
+    ttk.Separator(frm).grid(row=row+3, column=0, columnspan=3, sticky="ew", pady=10)
 
     btns = ttk.Frame(frm)
-    btns.grid(row=row+2, column=0, columnspan=3, sticky="e")
-    btns.columnconfigure((0, 1), weight=1)
+    btns.grid(row=row+4, column=0, columnspan=3, sticky="e")
+    btns.columnconfigure((0, 1, 2), weight=1)
 
+    test_btn = ttk.Button(btns, text="Test", width=10, state="disabled")
+    test_btn.grid(row=0, column=0, sticky="e", padx=(0, 5))
     save_btn = ttk.Button(btns, text="Save", width=12, state="disabled")
-    save_btn.grid(row=0, column=0, sticky="e", padx=(0, 5))
-    ttk.Button(btns, text="Cancel", command=popup.destroy, width=12).grid(row=0, column=1, sticky="w")
+    save_btn.grid(row=0, column=1, sticky="e", padx=(0, 5))
+    ttk.Button(btns, text="Cancel", command=popup.destroy, width=12).grid(row=0, column=2, sticky="w")
+
+    # last verification: (cfg it was run for, results); None while untested or edited since
+    checked: dict[str, Optional[tuple]] = {"last": None}
+    running = {"future": None}
+
+    def current_cfg() -> str:
+        p1 = vars_["primary"].get().strip()
+        p2 = vars_["secondary"].get().strip()
+        p6 = vars_["ipv6"].get().strip()
+        line = p1 + (f" {p2}" if p2 else "") + (f" {p6}" if p6 else "")
+        return f"[Resolve]\nDNS={line}\nDNSOverTLS={'yes' if tls_var.get() else 'no'}\n"
 
     def validate(*_):
         ok_all = True
@@ -230,31 +655,73 @@ def show_add_dns_popup() -> None:
             set_status(lbl, ok, req)
             if req and not ok:
                 ok_all = False
-        save_btn.config(state="normal" if ok_all else "disabled")
-
-    for v in vars_.values():
+        idle = running["future"] is None
+        save_btn.config(state="normal" if ok_all and idle else "disabled")
+        test_btn.config(state="normal" if ok_all and idle else "disabled")
+        if checked["last"] and checked["last"][0] != current_cfg():
+            checked["last"] = None
+            results_lbl.config(text="")
+
+    for v in (*vars_.values(), tls_var):
         v.trace_add("write", validate)
     validate()
 
-    def save():
+    def show_results(results) -> bool:
+        lines = []
+        for r in results:
+            addr = r.server.address + (f"#{r.server.sni}" if r.server.sni else "")
+            if r.ms is None:
+                lines.append(f"✗ {addr} – {r.error or 'unreachable'}")
+            else:
+                lines.append(f"{'✓' if r.ok else '✗'} {addr} – {r.ms:.0f} ms" + ("" if r.ok else " (too slow)"))
+        all_ok = bool(results) and all(r.ok for r in results)
+        results_lbl.config(text="\n".join(lines), foreground="#66f859" if all_ok else "#ff5555")
+        return all_ok
+
+    def run_test(then: Optional[Callable[[], None]] = None):
+        cfg = current_cfg()
+        results_lbl.config(text="Testing…", foreground="#a0a0a0")
+
+        def done(results, error):
+            running["future"] = None
+            if error is not None:
+                results_lbl.config(text=str(error), foreground="#ff5555")
+                validate()
+                return
+            checked["last"] = (cfg, results)
+            validate()
+            if show_results(results) and then:
+                then()
+
+        running["future"] = scheduler.run_in_background(lambda: logic.verify_servers(cfg), done, widget=popup)
+        validate()
+
+    def do_save():
         nm = vars_["name"].get().strip()
-        p1 = vars_["primary"].get().strip()
-        p2 = vars_["secondary"].get().strip()
-        p6 = vars_["ipv6"].get().strip()
-        if nm in logic.DNS_CONFIGS:
-            show_error(root, "A DNS with that name already exists.")
-            return
-        line = p1 + (f" {p2}" if p2 else "") + (f" {p6}" if p6 else "")
-        cfg = f"[Resolve]\nDNS={line}\nDNSOverTLS={'yes' if tls_var.get() else 'no'}\n"
-        logic.DNS_CONFIGS[nm] = {"config": cfg, "ip": p1, "custom": True}
+        logic.DNS_CONFIGS[nm] = {"config": current_cfg(), "ip": vars_["primary"].get().strip(), "custom": True}
         logic.save_dns_configs()
         show_success(root, "Custom DNS added.")
         if add_list_refresh:
             add_list_refresh()
         popup.destroy()
 
+    def save():
+        nm = vars_["name"].get().strip()
+        if nm in logic.DNS_CONFIGS:
+            show_error(root, "A DNS with that name already exists.")
+            return
+        last = checked["last"]
+        if last and not all(r.ok for r in last[1]):
+            show_error(root, "Some servers are unreachable or too slow – fix them or test again.")
+            return
+        if verify_var.get() and not last:
+            run_test(then=do_save)
+            return
+        do_save()
+
+    test_btn.config(command=run_test)
     save_btn.config(command=save)
-    center_window(root, popup, 480, 330)
+    center_window(root, popup, 480, 440)
     popup.wait_window()
 
 # -- Notebook & tabs ---------------------------------------------------
@@ -267,10 +734,12 @@ notebook.pack(fill="both", expand=True)
 dns_tab = ttk.Frame(notebook)
 add_tab = ttk.Frame(notebook)
 backup_tab = ttk.Frame(notebook)
+history_tab = ttk.Frame(notebook)
 
 notebook.add(dns_tab,    image=icon_dns,    text="DNS",            compound="left")
 notebook.add(add_tab,    image=icon_add,    text="ADD",            compound="left")
 notebook.add(backup_tab, image=icon_backup, text="Backup", compound="left")
+notebook.add(history_tab, image=icon_history, text="History", compound="left")
 
 # -- DNS tab – header & promo -----------------------------------------
 dns_content = ttk.Frame(dns_tab, padding=5)
@@ -296,6 +765,23 @@ ttk.Label(card, text="Status:",  font=lbl_f).grid(row=1, column=2, sticky="e", p
 status_value  = ttk.Label(card, text="DISCONNECTED", font=val_f, foreground="#615382")
 status_value.grid(row=1, column=3, sticky="w", padx=10, pady=5)
 
+ttk.Label(card, text="Endpoints:", font=lbl_f).grid(row=3, column=0, sticky="ne", padx=10, pady=5)
+endpoints_value = ttk.Label(card, text="N/A", font=("Satoshi", 9), wraplength=270, justify="left")
+endpoints_value.grid(row=3, column=1, columnspan=3, sticky="w", padx=10, pady=5)
+discover_btn = ttk.Button(card, text="Find closer", command=discover_endpoints)
+discover_btn.grid(row=5, column=3, sticky="e", padx=10, pady=5)
+network_btn = ttk.Button(card, command=accept_network_suggestion)
+network_btn.grid(row=5, column=0, columnspan=3, sticky="w", padx=10, pady=5)
+network_btn.grid_remove()
+
+ttk.Label(card, text="Warm-up:", font=lbl_f).grid(row=2, column=0, sticky="e", padx=10, pady=5)
+warmup_value  = ttk.Label(card, text="–", font=val_f)
+warmup_value.grid(row=2, column=1, columnspan=3, sticky="w", padx=10, pady=5)
+
+ttk.Label(card, text="Resolved:", font=lbl_f).grid(row=4, column=0, sticky="e", padx=10, pady=5)
+resolved_stats_value = ttk.Label(card, text="–", font=val_f)
+resolved_stats_value.grid(row=4, column=1, columnspan=3, sticky="w", padx=10, pady=5)
+
 promo_card = ttk.Frame(dns_content, padding=10, style="PromoCard.TFrame")
 promo_card.pack(fill="x", pady=(0,5))
 
@@ -324,10 +810,9 @@ ttk.Button(btns, text="Edit",
 promo_connect_btn = ttk.Button(
     btns,
     text="Connect",
-    command=lambda: [
-        next_dns_promo.connect_promo_nextdns(root, logic, show_success, show_error, update_dns_info),
-        update_ping()
-    ]
+    command=lambda: next_dns_promo.connect_promo_nextdns(
+        root, logic, show_success, show_error, update_dns_info, apply=switch_to
+    ),
 )
 promo_connect_btn.grid(row=0, column=1, sticky="ew", padx=(5,0))
 
@@ -357,8 +842,18 @@ backup_panel.build(
     show_success=show_success,
     show_error=show_error,
     update_dns_info=update_dns_info,
+    run_in_background=scheduler.run_in_background,
 )
 
+history_redraw = history_panel.build(history_tab)
+
+def refresh_history() -> bool:
+    if notebook.select() == str(history_tab):
+        history_redraw()
+    return False
+
+notebook.bind("<<NotebookTabChanged>>", lambda e: refresh_history())
+
 for name, data in logic.DNS_CONFIGS.items():
     if not data.get("custom"):
         provider_widgets[name] = create_provider_row(
@@ -368,10 +863,115 @@ for name, data in logic.DNS_CONFIGS.items():
             remove_callback=None,
             is_custom=False,
         )
+        bind_latency_label(name, provider_widgets[name]["latency"])
+
+vm.subscribe("display_name", lambda v, _: name_value.config(text=v))
+vm.subscribe("address",      lambda v, _: address_value.config(text=v))
+vm.subscribe("ping",         lambda v, _: ping_value.config(text=v))
+vm.subscribe("warmup",       lambda v, _: warmup_value.config(text=v))
+vm.subscribe("resolved_stats", lambda v, _: resolved_stats_value.config(text=v))
+vm.subscribe("connected",    on_connected_changed)
+vm.subscribe("stale",        on_stale_changed)
+vm.subscribe("endpoints",    on_endpoints_changed)
+vm.subscribe("network_suggestion", on_network_suggestion)
+vm.subscribe("provider",     on_provider_changed)
 
 # -- Kick-off ---------------------------------------------------------
-update_dns_info(skip_connectivity=True)
-update_ping()
-root.after(200, update_dns_info)
+resolved_bus = None
+if logic.load_settings().get("dbus_backend") and resolved_dbus.available():
+    try:
+        resolved_bus = resolved_dbus.ResolvedDBus()
+        logic.set_current_dns_source(resolved_bus.current_provider)
+    except Exception:
+        resolved_bus = None  # no system bus / resolved: stay on the file parser
+
+def check_resolved_bus() -> bool:
+    """Scheduler job: drain resolve1 signals; refresh the tab only on a change."""
+    try:
+        changed = resolved_bus.poll()
+    except Exception:
+        logic.set_current_dns_source(None)
+        scheduler.cancel("resolved-bus")
+        return False
+    if changed:
+        update_dns_info(skip_connectivity=True)
+    return changed
+
+stats_tracker = resolved_stats.StatsTracker(resolved_stats.default_source(resolved_bus))
+
+def probe_resolved_stats() -> Optional[str]:
+    """
+    Background half of the resolved-stats job. The counters are system-wide:
+    while the daemon samples them, show its figures and keep no baseline here.
+    """
+    cur = logic.get_current_dns()
+    status = daemon_status if daemon_fresh() else None
+    if status is not None and "resolved_stats" in status:
+        stats_tracker.forget()
+        return resolved_stats.describe(status["resolved_stats"], cur)
+    try:
+        stats_tracker.sample()
+    except Exception:
+        stats_tracker.source = resolved_stats.resolvectl_source  # bus gone: fall back
+        return None
+    return resolved_stats.describe(stats_tracker.summary(), cur)
+
+def update_resolved_stats(text: Optional[str]) -> bool:
+    return text is not None and vm.set("resolved_stats", text)
+
+logic.add_post_switch_hook(warm_up_after_switch)
+check_daemon()
+if logic.get_current_dns() == logic.LOCAL_CACHE_NAME and not daemon_hosts_cache():
+    # on_close leaves the cache, so this is a crashed or killed session:
+    # go back to the setup saved in forwarder.json rather than silently re-host
+    try:
+        leave_cache()
+        show_success(root, f"The last session left DNS on the local cache; restored {logic.get_current_dns()}.")
+    except Exception as e:
+        msg = f"Could not leave the local cache from the last session: {e}"
+        try:
+            forwarder.start()  # keep resolution working at least
+        except Exception as e2:
+            msg += f"\nThe cache could not be restarted either: {e2}"
+        show_error(root, msg)
+warm_snapshot = snapshot.load()
+if warm_snapshot:
+    apply_snapshot(warm_snapshot)
+else:
+    update_dns_info(skip_connectivity=True)
+scheduler.every("ping",         probe_ping,         interval=1,  max_interval=5,  run_now=True,
+                apply=update_ping)
+scheduler.every("connectivity", check_connectivity, interval=15, max_interval=60)
+scheduler.every("conf-file",    check_conf_file,    interval=2,  max_interval=10, run_now=True)
+scheduler.every("endpoints",    probe_endpoints,    interval=10, max_interval=60, run_now=True,
+                apply=update_endpoints)
+scheduler.every("network",      check_network,      interval=2,  max_interval=10)
+scheduler.every("benchmark",    benchmark_network,  interval=60, max_interval=600, run_now=True)
+scheduler.every("history",      refresh_history,    interval=5,  max_interval=5)
+scheduler.every("daemon",       check_daemon,       interval=5,  max_interval=30)
+scheduler.every("resolved-stats", probe_resolved_stats, interval=30, max_interval=120, run_now=True,
+                apply=update_resolved_stats)
+scheduler.every("snapshot",     save_snapshot,      interval=60, max_interval=60)
+if resolved_bus is not None:
+    scheduler.every("resolved-bus", check_resolved_bus, interval=1,  max_interval=1)
+    scheduler.cancel("conf-file")  # property-change signals replace the stat() poll
+root.after(200, refresh_in_background)
 root.after(400, lambda: logic.ensure_initial_backup())
+
+def on_close() -> None:
+    """Never leave resolved pointing at a cache that dies with this window."""
+    if forwarder.is_running() and logic.get_current_dns() == logic.LOCAL_CACHE_NAME:
+        try:
+            leave_cache()
+        except Exception as e:
+            if not messagebox.askyesno(
+                "Local cache",
+                f"DNS could not be switched away from the local cache ({e}).\n"
+                "Resolution stops working once this window closes. Close anyway?",
+            ):
+                return
+    save_snapshot()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
 root.mainloop()
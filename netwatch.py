@@ -0,0 +1,202 @@
+"""
+Network-change detection and per-network provider memory.
+Listens for rtnetlink link/address/route events (polls /proc when netlink is
+unavailable), fingerprints the network from the default route and gateway,
+and keeps benchmark results plus the preferred provider for each network in
+~/.config/dns-changer/networks.json.
+"""
+
+import json
+import os
+import socket
+import struct
+import time
+from typing import Optional
+
+import logic
+
+NETWORKS_PATH = os.path.join(logic.CONFIG_DIR, "networks.json")
+CACHE_TTL = 6 * 3600  # re-benchmark a known network after this many seconds
+
+RTMGRP_LINK = 0x1
+RTMGRP_NEIGH = 0x4         # ARP entries: the gateway's MAC completing
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+
+# ------------------------------------------------------------------#
+#  Fingerprint                                                       #
+# ------------------------------------------------------------------#
+def _default_route() -> Optional[tuple[str, str]]:
+    """(interface, gateway IP) of the lowest-metric IPv4 default route."""
+    best = None
+    try:
+        with open("/proc/net/route") as f:
+            next(f, None)
+            for line in f:
+                cols = line.split()
+                if len(cols) < 7 or cols[1] != "00000000" or not int(cols[3], 16) & 0x2:
+                    continue
+                gw = socket.inet_ntoa(struct.pack("<I", int(cols[2], 16)))
+                metric = int(cols[6])
+                if best is None or metric < best[0]:
+                    best = (metric, cols[0], gw)
+    except (OSError, ValueError):
+        return None
+    return (best[1], best[2]) if best else None
+
+
+ATF_COM = 0x2              # /proc/net/arp flag: entry is complete
+NO_MAC = "00:00:00:00:00:00"
+
+
+def _gateway_mac(gw: str) -> str:
+    """The gateway's MAC from a complete ARP entry, "" while unresolved."""
+    try:
+        with open("/proc/net/arp") as f:
+            for line in f:
+                cols = line.split()
+                if cols and cols[0] == gw and len(cols) > 3:
+                    if int(cols[2], 16) & ATF_COM and cols[3] != NO_MAC:
+                        return cols[3]
+                    return ""
+    except (OSError, ValueError):
+        pass
+    return ""
+
+
+def _nudge_arp(gw: str) -> None:
+    """One empty datagram to the gateway makes the kernel resolve its MAC."""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b"", (gw, 9))  # discard port
+    except OSError:
+        pass
+
+
+def fingerprint() -> Optional[str]:
+    """
+    "iface|gateway|gateway-mac" for the current network; None if offline or
+    the gateway's ARP entry is not complete yet (the watcher hears it complete).
+    """
+    route = _default_route()
+    if route is None:
+        return None
+    iface, gw = route
+    mac = _gateway_mac(gw)
+    if not mac:
+        _nudge_arp(gw)
+        return None
+    return f"{iface}|{gw}|{mac}"
+
+
+def _complete(fp: Optional[str]) -> bool:
+    return bool(fp) and fp.rsplit("|", 1)[-1] not in ("", NO_MAC)
+
+
+# ------------------------------------------------------------------#
+#  Watcher                                                           #
+# ------------------------------------------------------------------#
+class NetworkWatcher:
+    """
+    Call `poll()` periodically; it returns the new fingerprint when the
+    network changed and None otherwise. Netlink events make the check cheap:
+    /proc is only re-read after the kernel reported a link/address/route or
+    neighbour change (the latter catches the gateway's ARP entry completing).
+    """
+
+    def __init__(self, use_netlink: bool = True):
+        self.sock: Optional[socket.socket] = None
+        if use_netlink:
+            try:
+                self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+                self.sock.bind((0, RTMGRP_LINK | RTMGRP_NEIGH | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE
+                                | RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE))
+                self.sock.setblocking(False)
+            except (OSError, AttributeError):
+                self.sock = None
+        self.current = fingerprint()
+
+    @property
+    def uses_netlink(self) -> bool:
+        return self.sock is not None
+
+    def _drain(self) -> bool:
+        seen = False
+        while True:
+            try:
+                if not self.sock.recv(65536):
+                    break
+                seen = True
+            except BlockingIOError:
+                break
+            except OSError:
+                seen = True  # e.g. ENOBUFS after a burst: re-check to be safe
+                break
+        return seen
+
+    def poll(self) -> Optional[str]:
+        if self.sock is not None and not self._drain():
+            return None
+        fp = fingerprint()
+        if fp == self.current:
+            return None
+        self.current = fp
+        return fp
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+# ------------------------------------------------------------------#
+#  Per-network cache                                                 #
+# ------------------------------------------------------------------#
+def load_networks() -> dict:
+    try:
+        with open(NETWORKS_PATH, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_networks(data: dict) -> None:
+    with open(NETWORKS_PATH, "w") as f:
+        json.dump(data, f, indent=4)
+
+
+def cached_choice(fp: Optional[str]) -> Optional[str]:
+    """Preferred provider remembered for `fp`, if it still exists."""
+    entry = load_networks().get(fp or "")
+    name = entry.get("preferred") if entry else None
+    return name if name in logic.DNS_CONFIGS else None
+
+
+def cached_results(fp: Optional[str]) -> dict[str, Optional[float]]:
+    """Latencies (ms per provider) from the last benchmark of `fp`, {} if none."""
+    entry = load_networks().get(fp or "")
+    return dict(entry.get("results") or {}) if entry else {}
+
+
+def needs_benchmark(fp: Optional[str], ttl: float = CACHE_TTL) -> bool:
+    entry = load_networks().get(fp or "")
+    return not entry or time.time() - entry.get("updated", 0) > ttl
+
+
+def record(fp: Optional[str], results: dict[str, Optional[float]]) -> Optional[str]:
+    """
+    Store benchmark `results` for `fp`; returns the provider now preferred.
+    Keys without the gateway MAC would match any network on that subnet, so
+    they are never stored (and old ones are dropped).
+    """
+    if not _complete(fp):
+        return None
+    reachable = {n: ms for n, ms in results.items() if ms is not None}
+    preferred = min(reachable, key=reachable.get) if reachable else None
+    data = {k: v for k, v in load_networks().items() if _complete(k)}
+    data[fp] = {"preferred": preferred, "results": results, "updated": time.time()}
+    save_networks(data)
+    return preferred
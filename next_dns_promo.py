@@ -71,18 +71,20 @@ def edit_promo_nextdns(root: tk.Tk, logic, show_success, center_window):
     pop.wait_window()
 
 
-def connect_promo_nextdns(root: tk.Tk, logic, show_success, show_error, update_dns_info):
+def connect_promo_nextdns(root: tk.Tk, logic, show_success, show_error, update_dns_info, apply=None):
     """
     Apply stored NextDNS block, or open signup URL if none exists.
+    `apply(name, block)` replaces the plain write (e.g. the SLO-guarded switch).
     """
-    raw = logic.load_promo_nextdns_config().get("resolve", "").strip()
-    if not raw:
+    block = logic.promo_nextdns_block()
+    if not block:
         webbrowser.open("https://nextdns.io/?from=unf5m96x")
         return
 
-    block = raw if raw.lstrip().lower().startswith("[resolve]") else f"[Resolve]\nDNS={raw}\nDNSOverTLS=yes\n"
-
     try:
+        if apply is not None:
+            apply("NextDNS", block)
+            return
         logic.write_config(block)
         update_dns_info()
         show_success(root, "Connected to NextDNS.")
@@ -2,8 +2,10 @@ import os
 import tkinter as tk
 from tkinter import ttk
 from ui import fa_icon
+import targets as targets_mod
 
-def build(parent: tk.Frame, *, root, logic, show_success, show_error, update_dns_info):
+def build(parent: tk.Frame, *, root, logic, show_success, show_error, update_dns_info,
+          run_in_background):
     """
     Build the Backup/Restore tab: create, list, restore, and delete DNS backups.
     """
@@ -13,6 +15,7 @@ def build(parent: tk.Frame, *, root, logic, show_success, show_error, update_dns
     icon_refresh = fa_icon("arrows-rotate",    size=14)
     icon_restore = fa_icon("arrow-rotate-left",size=14)
     icon_delete  = fa_icon("trash-can",        size=14)
+    icon_targets = fa_icon("server",           size=14)
 
     # callbacks
     def create_backup():
@@ -63,6 +66,47 @@ def build(parent: tk.Frame, *, root, logic, show_success, show_error, update_dns
         except Exception as e:
             show_error(root, str(e))
 
+    def target_providers():
+        # the local cache listens on this host's loopback: meaningless inside a container
+        return [n for n, d in logic.DNS_CONFIGS.items() if not d.get("local")]
+
+    def refresh_providers():
+        names = target_providers()
+        provider_box.config(values=names)
+        if provider_var.get() not in names:
+            cur = logic.get_current_dns()
+            provider_var.set(cur if cur in names else (names[0] if names else ""))
+
+    def apply_to_targets():
+        targets = targets_mod.load_targets()
+        if not targets:
+            show_error(root, f"No targets configured.\nAdd them to {targets_mod.TARGETS_PATH}.")
+            return
+        name = provider_var.get()
+        if name not in target_providers():
+            show_error(root, "Pick a provider to apply first.")
+            return
+        cfg = logic.DNS_CONFIGS[name]["config"]
+        try:
+            password = logic.ensure_sudo()
+        except Exception as e:
+            show_error(root, str(e))
+            return
+        targets_btn.config(state="disabled", text=f"Applying to {len(targets)}…")
+
+        def done(results, error):
+            targets_btn.config(state="normal", text="Apply to Targets")
+            if error is not None:
+                show_error(root, str(error))
+                return
+            text = targets_mod.report(results)
+            if all(r.ok for r in results):
+                show_success(root, text.splitlines()[0])
+            else:
+                show_error(root, text)
+
+        run_in_background(lambda: targets_mod.apply_to_targets(cfg, targets, password=password), done)
+
     # layout
     frame = ttk.Frame(parent, padding=10)
     frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -94,4 +138,15 @@ def build(parent: tk.Frame, *, root, logic, show_success, show_error, update_dns
     ttk.Button(footer, text="Delete Selected", image=icon_delete,
                compound="left", command=delete_selected).pack(side="left", expand=True, fill="x", padx=(5,0))
 
+    targets_row = ttk.Frame(frame)
+    targets_row.pack(fill="x", pady=(10,0))
+    provider_var = tk.StringVar()
+    provider_box = ttk.Combobox(targets_row, textvariable=provider_var, state="readonly",
+                                width=18, postcommand=refresh_providers)
+    provider_box.pack(side="left", padx=(0,5))
+    targets_btn = ttk.Button(targets_row, text="Apply to Targets", image=icon_targets,
+                             compound="left", command=apply_to_targets)
+    targets_btn.pack(side="left", expand=True, fill="x", padx=(5,0))
+
     refresh_list()
+    refresh_providers()
@@ -0,0 +1,87 @@
+import time
+import tkinter as tk
+from tkinter import ttk
+import logic
+import tsdb
+
+RANGES = {
+    # label: (tier, seconds back)
+    "1 hour": ("raw", 3600),
+    "1 day": ("1m", 86400),
+    "1 week": ("1m", 7 * 86400),
+    "1 month": ("1h", 30 * 86400),
+}
+
+
+def build(parent):
+    """
+    Build the History tab: per-provider latency over time from the tsdb
+    rings (p50 line, p95 band edge, red ticks for lost probes).
+    Returns a redraw function.
+    """
+    frame = ttk.Frame(parent, padding=10)
+    frame.pack(fill="both", expand=True, padx=5, pady=10)
+
+    controls = ttk.Frame(frame)
+    controls.pack(fill="x", pady=(0, 8))
+    provider_var = tk.StringVar()
+    range_var = tk.StringVar(value="1 hour")
+    provider_box = ttk.Combobox(controls, textvariable=provider_var, state="readonly", width=16)
+    provider_box.pack(side="left")
+    ttk.Combobox(controls, textvariable=range_var, values=list(RANGES), state="readonly",
+                 width=8).pack(side="left", padx=(8, 0))
+
+    canvas = tk.Canvas(frame, height=260, background="#1c1c1c", highlightthickness=0)
+    canvas.pack(fill="both", expand=True)
+    summary = ttk.Label(frame, font=("Satoshi", 9), foreground="#a0a0a0")
+    summary.pack(anchor="w", pady=(6, 0))
+
+    def points(name: str):
+        tier, back = RANGES[range_var.get()]
+        hist = tsdb.reader(name)
+        rows = hist.query(tier, time.time() - back) if hist else []
+        if tier == "raw":
+            return [(ts, ms, ms, ms is None) for ts, ms in rows]
+        return [(r.ts, None if r.samples == r.lost else r.p50,
+                 None if r.samples == r.lost else r.p95, r.lost > 0) for r in rows]
+
+    def redraw(*_):
+        names = [n for n, d in logic.DNS_CONFIGS.items() if not d.get("local")] + ["NextDNS"]
+        provider_box.config(values=names)
+        if provider_var.get() not in names and names:
+            provider_var.set(logic.get_current_dns() if logic.get_current_dns() in names else names[0])
+        canvas.delete("all")
+        pts = points(provider_var.get()) if provider_var.get() else []
+        ok = [p for p in pts if p[1] is not None]
+        if not ok:
+            summary.config(text="No samples yet.")
+            return
+
+        canvas.update_idletasks()
+        w, h, pad = canvas.winfo_width(), canvas.winfo_height(), 24
+        t0, t1 = pts[0][0], max(pts[-1][0], pts[0][0] + 1)
+        top = max(p[2] for p in ok) * 1.1 or 1.0
+
+        def xy(ts, ms):
+            return (pad + (ts - t0) / (t1 - t0) * (w - 2 * pad),
+                    h - pad - ms / top * (h - 2 * pad))
+
+        for idx, color in ((2, "#615382"), (1, "#66f859")):
+            line = [c for p in ok for c in xy(p[0], p[idx])]
+            if len(line) >= 4:
+                canvas.create_line(*line, fill=color, width=1 if idx == 2 else 2)
+        for p in pts:
+            if p[3]:
+                x, _ = xy(p[0], 0)
+                canvas.create_line(x, h - pad, x, h - pad + 6, fill="#ff5555")
+        canvas.create_text(pad, pad - 12, text=f"{top:.0f} ms", fill="#a0a0a0", anchor="w")
+        canvas.create_text(pad, h - pad + 12, text="0", fill="#a0a0a0", anchor="w")
+
+        lost = sum(1 for p in pts if p[3])
+        med = sorted(p[1] for p in ok)[len(ok) // 2]
+        summary.config(text=f"{len(pts)} points · median {med:.1f} ms · {lost} with loss")
+
+    provider_box.bind("<<ComboboxSelected>>", redraw)
+    range_var.trace_add("write", redraw)
+    redraw()
+    return redraw
@@ -0,0 +1,173 @@
+"""
+Racing upstream for the local forwarder: ask the top K providers at once and
+keep the first valid answer. With hedging on, the next upstream is only asked
+once the previous one has been slower than its own latency percentile.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import dns_client
+import dns_wire
+import logic
+from stats import LatencyWindow
+
+DEFAULT_K = 3
+DEFAULT_HEDGE_PERCENTILE = 0.9
+DEFAULT_HEDGE_DELAY_MS = 50.0  # used until an upstream has enough samples
+MIN_SAMPLES = 10
+
+
+@dataclass
+class RaceStats:
+    name: str
+    address: str
+    port: int
+    sni: Optional[str] = None
+    tls: bool = False  # the provider's config sets DNSOverTLS
+    launched: int = 0
+    wins: int = 0
+    censored: int = 0  # cancelled after losing: slower than the winner, exact time unknown
+    latency: LatencyWindow = field(default_factory=LatencyWindow)
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.launched if self.launched else 0.0
+
+
+def pick_upstreams(configs: Optional[dict] = None, k: int = DEFAULT_K,
+                   latencies: Optional[dict[str, Optional[float]]] = None) -> list[tuple]:
+    """
+    Return (provider, address, port, sni, tls) for the K best providers in DNS_CONFIGS.
+    Ordered by `latencies` (ms per provider name, None if unreachable) when
+    given, config order otherwise; unmeasured providers go last.
+    """
+    configs = logic.DNS_CONFIGS if configs is None else configs
+    picks = []
+    for name, d in configs.items():
+        if d.get("local"):
+            continue
+        cfg = d.get("config", "")
+        servers = logic.parse_dns_servers(cfg)
+        if servers:
+            s, tls = servers[0], logic.uses_dns_over_tls(cfg)
+            port = s.port or (dns_client.DOT_PORT if tls else dns_client.DNS_PORT)
+            picks.append((name, s.address, port, s.sni, tls))
+    if latencies:
+        order = {p[0]: i for i, p in enumerate(picks)}
+        def rank(p):
+            ms = latencies.get(p[0])
+            return (ms is None, ms or 0.0, order[p[0]])
+
+        picks.sort(key=rank)
+    return picks[:k]
+
+
+def _valid(reply: bytes) -> bool:
+    return dns_wire.rcode(reply) in (dns_wire.RCODE_NOERROR, dns_wire.RCODE_NXDOMAIN)
+
+
+class RacingUpstream:
+    def __init__(self, upstreams: list[tuple], hedge: bool = False,
+                 hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+                 timeout: float = dns_client.DEFAULT_TIMEOUT):
+        if not upstreams:
+            raise ValueError("At least one upstream is required.")
+        self.stats = [RaceStats(*u) for u in upstreams]  # (name, address, port[, sni, tls])
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.timeout = timeout
+
+    def _order(self) -> list[RaceStats]:
+        """
+        Fastest median first. Upstreams with no data yet keep their pick order
+        behind the measured ones, so an unknown (maybe slow) one is never asked first.
+        """
+        def key(s: RaceStats):
+            p50 = s.latency.percentile(0.5)
+            return (p50 is None, p50 or 0.0)
+
+        return sorted(self.stats, key=key)
+
+    def _hedge_delay(self, s: RaceStats) -> float:
+        if len(s.latency) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY_MS / 1000.0
+        p = s.latency.percentile(self.hedge_percentile)
+        return (p if p is not None else self.timeout * 1000.0) / 1000.0
+
+    async def _ask(self, s: RaceStats, query: bytes) -> tuple[RaceStats, bytes, float]:
+        s.launched += 1
+        t0 = time.perf_counter()
+        try:
+            if s.tls:
+                reply = await dns_client.tls_query(s.address, query, s.port, s.sni, self.timeout)
+            else:
+                reply = await dns_client.query(s.address, query, s.port, self.timeout)
+        except asyncio.CancelledError:
+            # lost the race: the elapsed time is only a lower bound and would
+            # drag the percentiles down, so count it apart instead of sampling it
+            s.censored += 1
+            raise
+        except (OSError, asyncio.TimeoutError, dns_wire.DNSWireError, asyncio.IncompleteReadError):
+            s.latency.add(None)
+            raise
+        ms = (time.perf_counter() - t0) * 1000.0
+        s.latency.add(ms)
+        return s, reply, ms
+
+    async def resolve(self, query: bytes) -> bytes:
+        queue = self._order()
+        pending: set[asyncio.Task] = set()
+        fallback: Optional[bytes] = None
+        if not self.hedge:
+            pending = {asyncio.ensure_future(self._ask(s, query)) for s in queue}
+            queue = []
+        launch, delay = True, None
+        try:
+            while True:
+                if queue and launch:
+                    s = queue.pop(0)
+                    pending.add(asyncio.ensure_future(self._ask(s, query)))
+                    delay = self._hedge_delay(s)
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=delay if queue else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                launch = not done  # hedge timer ran out
+                for task in done:
+                    if task.exception() is not None:
+                        launch = True
+                        continue
+                    s, reply, _ = task.result()
+                    if _valid(reply):
+                        s.wins += 1
+                        return reply
+                    fallback, launch = reply, True
+        finally:
+            for task in pending:
+                task.cancel()
+        if fallback is not None:
+            return fallback
+        raise TimeoutError("No upstream answered.")
+
+    def summary(self) -> list[dict]:
+        return [
+            {
+                "name": s.name,
+                "address": s.address,
+                "launched": s.launched,
+                "wins": s.wins,
+                "censored": s.censored,
+                "win_rate": s.win_rate,
+                "p50_ms": s.latency.percentile(0.5),
+                "p99_ms": s.latency.percentile(0.99),
+            }
+            for s in self.stats
+        ]
+
+    def __repr__(self) -> str:
+        mode = "hedged" if self.hedge else "racing"
+        return f"RacingUpstream({mode}, {[s.name for s in self.stats]!r})"
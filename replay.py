@@ -0,0 +1,248 @@
+"""
+Workload-realistic provider benchmark: stream a query log, keep the most
+frequent (name, type) pairs in bounded memory and replay them against every
+provider, weighting each latency by how often we actually ask for that name.
+
+Logs are memory-mapped and scanned with one regex, so multi-gigabyte files
+never get loaded. Understood formats:
+
+    resolved   journalctl -u systemd-resolved with debug logging
+               ("Looking up RR for example.com IN A.")
+    dnsmasq    log-queries output ("query[A] example.com from 10.0.0.2")
+    plain      one name per line, optionally followed by a type
+
+    python replay.py queries.log --top 500 --concurrency 32 --rate 200
+"""
+
+import asyncio
+import heapq
+import mmap
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional
+
+import dns_client
+import dns_wire
+import forwarder
+import logic
+from stats import weighted_percentile
+
+QTYPES = {
+    "A": dns_wire.TYPE_A, "NS": dns_wire.TYPE_NS, "CNAME": dns_wire.TYPE_CNAME,
+    "SOA": dns_wire.TYPE_SOA, "PTR": 12, "MX": 15, "TXT": 16,
+    "AAAA": dns_wire.TYPE_AAAA, "SRV": 33, "SVCB": 64, "HTTPS": 65,
+}
+
+PATTERNS = {
+    "resolved": re.compile(rb"Looking up RR for (\S+?)\.? IN ([A-Z0-9]+)"),
+    "dnsmasq": re.compile(rb"query\[([A-Z0-9]+)\] (\S+) from"),
+    "plain": re.compile(rb"^[ \t]*([A-Za-z0-9_][A-Za-z0-9_.-]*\.[A-Za-z0-9_-]+)\.?(?:[ \t]+([A-Za-z0-9]+))?[ \t]*\r?$",
+                        re.MULTILINE),
+}
+SNIFF_BYTES = 64 * 1024
+
+DEFAULT_CAPACITY = 20_000   # distinct (name, type) pairs tracked while scanning
+DEFAULT_TOP = 500           # pairs actually replayed
+DEFAULT_CONCURRENCY = 32
+DEFAULT_RATE = 200.0        # queries per second per provider (0 = unlimited)
+
+
+# ------------------------------------------------------------------#
+#  Log scanning                                                      #
+# ------------------------------------------------------------------#
+def detect_format(head: bytes) -> str:
+    if PATTERNS["resolved"].search(head):
+        return "resolved"
+    if PATTERNS["dnsmasq"].search(head):
+        return "dnsmasq"
+    return "plain"
+
+
+def _keep(name: str) -> bool:
+    """Drop names a public resolver can't answer: single labels and mDNS."""
+    return "." in name and not name.endswith((".local", ".lan", ".home.arpa"))
+
+
+def scan(path: str, fmt: str = "auto") -> Iterator[tuple[str, int]]:
+    """Yield (name, qtype) for every query in the log, streaming."""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with mm:
+            if fmt == "auto":
+                fmt = detect_format(mm[:SNIFF_BYTES])
+            name_first = fmt != "dnsmasq"
+            for m in PATTERNS[fmt].finditer(mm):
+                a, b = m.group(1), m.group(2)
+                name, qtype = (a, b) if name_first else (b, a)
+                qtype = QTYPES.get((qtype or b"A").decode("ascii", "replace").upper())
+                if qtype is None:
+                    continue
+                name = name.decode("ascii", "replace").lower().rstrip(".")
+                if _keep(name):
+                    yield name, qtype
+
+
+class HeavyHitters:
+    """
+    Space-Saving top-k counter: at most `capacity` keys in memory, and every
+    key whose true frequency exceeds total/capacity is guaranteed to be kept.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts: dict = {}
+        self._heap: list = []  # (count, key), lazily refreshed
+        self.total = 0
+
+    def add(self, key) -> None:
+        self.total += 1
+        if key in self.counts:
+            self.counts[key] += 1
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            heapq.heappush(self._heap, (1, key))
+            return
+        while True:  # evict the true minimum, skipping stale heap entries
+            count, victim = heapq.heappop(self._heap)
+            if self.counts[victim] == count:
+                break
+            heapq.heappush(self._heap, (self.counts[victim], victim))
+        del self.counts[victim]
+        self.counts[key] = count + 1
+        heapq.heappush(self._heap, (count + 1, key))
+
+    def top(self, n: int) -> list[tuple[tuple, int]]:
+        return heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1])
+
+
+def sample(path: str, fmt: str = "auto", top: int = DEFAULT_TOP,
+           capacity: int = DEFAULT_CAPACITY) -> tuple[list[tuple[tuple[str, int], int]], int]:
+    """The `top` most frequent (name, qtype) pairs with their counts, and the total."""
+    hh = HeavyHitters(max(capacity, top))
+    for key in scan(path, fmt):
+        hh.add(key)
+    return hh.top(top), hh.total
+
+
+# ------------------------------------------------------------------#
+#  Replay                                                            #
+# ------------------------------------------------------------------#
+@dataclass
+class ReplayResult:
+    provider: str
+    queries: int
+    failures: int
+    weighted_mean_ms: Optional[float]
+    weighted_p50_ms: Optional[float]
+    weighted_p95_ms: Optional[float]
+    weighted_failure_rate: float
+    seconds: float
+
+
+async def _replay_one(name: str, servers: list[tuple[str, int]], workload: list,
+                      concurrency: int, rate: float, timeout: float) -> ReplayResult:
+    sem = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+
+    async def one(i: int, qname: str, qtype: int) -> Optional[float]:
+        if rate > 0:
+            await asyncio.sleep(max(0.0, t0 + i / rate - loop.time()))
+        async with sem:
+            for addr, port in servers[:2]:  # primary, then one fallback like a stub would
+                ms, rc = await dns_client.timed_query(addr, qname, qtype, port, timeout)
+                if ms is not None and rc in (dns_wire.RCODE_NOERROR, dns_wire.RCODE_NXDOMAIN):
+                    return ms
+            return None
+
+    results = await asyncio.gather(*(one(i, n, t) for i, ((n, t), _) in enumerate(workload)))
+    weights = [w for _, w in workload]
+    ok = [(ms, w) for ms, w in zip(results, weights) if ms is not None]
+    total_w = sum(weights) or 1
+    ok_w = sum(w for _, w in ok)
+    return ReplayResult(
+        provider=name,
+        queries=len(workload),
+        failures=sum(ms is None for ms in results),
+        weighted_mean_ms=sum(ms * w for ms, w in ok) / ok_w if ok_w else None,
+        weighted_p50_ms=weighted_percentile(ok, 0.5),
+        weighted_p95_ms=weighted_percentile(ok, 0.95),
+        weighted_failure_rate=1 - ok_w / total_w,
+        seconds=loop.time() - t0,
+    )
+
+
+async def replay(workload: list, configs: Optional[dict] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, rate: float = DEFAULT_RATE,
+                 timeout: float = dns_client.DEFAULT_TIMEOUT) -> list[ReplayResult]:
+    """
+    Replay `workload` ([((name, qtype), weight), …]) against each provider in
+    turn, so providers never compete for bandwidth. DoT providers are asked
+    over plain DNS on the same addresses. Results come back fastest first.
+    """
+    configs = logic.DNS_CONFIGS if configs is None else configs
+    results = []
+    for name, d in configs.items():
+        servers = forwarder.servers_for(d.get("config", ""))
+        if d.get("local") or not servers:
+            continue
+        results.append(await _replay_one(name, servers, workload, concurrency, rate, timeout))
+    results.sort(key=lambda r: (r.weighted_mean_ms is None, r.weighted_mean_ms or 0.0))
+    return results
+
+
+def benchmark_log(path: str, fmt: str = "auto", top: int = DEFAULT_TOP, **kwargs) -> list[ReplayResult]:
+    """Blocking: sample `path`, then replay it against every provider."""
+    workload, _ = sample(path, fmt, top)
+    return asyncio.run(replay(workload, **kwargs)) if workload else []
+
+
+def _fmt_ms(ms: Optional[float]) -> str:
+    return "–" if ms is None else f"{ms:.1f}"
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Rank providers by replaying a DNS query log.")
+    parser.add_argument("log")
+    parser.add_argument("--format", choices=["auto", *PATTERNS], default="auto")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="distinct names to replay")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="names tracked while scanning")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="queries/s per provider, 0 = unlimited")
+    parser.add_argument("--timeout", type=float, default=dns_client.DEFAULT_TIMEOUT)
+    parser.add_argument("--providers", help="comma-separated subset of providers")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    logic.load_dns_configs()
+    configs = logic.DNS_CONFIGS
+    if args.providers:
+        wanted = {p.strip() for p in args.providers.split(",")}
+        configs = {n: d for n, d in configs.items() if n in wanted}
+
+    started = time.monotonic()
+    workload, total = sample(args.log, args.format, args.top, args.capacity)
+    covered = sum(w for _, w in workload)
+    scanned = time.monotonic() - started
+    results = asyncio.run(replay(workload, configs, args.concurrency, args.rate, args.timeout)) if workload else []
+
+    if args.json:
+        print(json.dumps({"queries_in_log": total, "replayed_names": len(workload),
+                          "covered_share": covered / total if total else 0.0,
+                          "scan_seconds": scanned,
+                          "results": [asdict(r) for r in results]}, indent=4))
+    else:
+        share = f"{covered / total:.0%}" if total else "0%"
+        print(f"{total} queries scanned in {scanned:.1f} s; replaying {len(workload)} names ({share} of traffic)")
+        print(f"{'provider':<16}{'mean':>8}{'p50':>8}{'p95':>8}{'fail':>7}")
+        for r in results:
+            print(f"{r.provider:<16}{_fmt_ms(r.weighted_mean_ms):>8}{_fmt_ms(r.weighted_p50_ms):>8}"
+                  f"{_fmt_ms(r.weighted_p95_ms):>8}{r.weighted_failure_rate:>7.1%}")
@@ -0,0 +1,168 @@
+"""
+Effective-resolver detection over D-Bus (org.freedesktop.resolve1).
+Keeps one connection open, reads the DNS servers resolved actually uses –
+global and per-link, e.g. pushed by NetworkManager – and refreshes only when
+a PropertiesChanged signal arrives. Needs the optional `jeepney` package;
+without it (or without a bus) callers stay on the resolved.conf parser.
+
+A stand-in service on the session bus exposing the same object path and
+properties can be used by passing bus="SESSION".
+"""
+
+import socket
+from typing import Optional
+
+try:
+    from jeepney import DBusAddress, MatchRule, Properties, message_bus
+    from jeepney.io.blocking import open_dbus_connection
+except ImportError:  # optional dependency
+    DBusAddress = None
+
+import logic
+
+BUS_NAME = "org.freedesktop.resolve1"
+OBJECT_PATH = "/org/freedesktop/resolve1"
+MANAGER_IFACE = "org.freedesktop.resolve1.Manager"
+WATCHED = {"DNS", "DNSEx", "CurrentDNSServer", "CurrentDNSServerEx", "FallbackDNS"}
+
+
+def available() -> bool:
+    return DBusAddress is not None
+
+
+def _addr(family: int, raw) -> Optional[str]:
+    try:
+        return socket.inet_ntop(family, bytes(raw))
+    except (ValueError, OSError):
+        return None
+
+
+class ResolvedDBus:
+    """
+    Raises RuntimeError if jeepney is missing and OSError / DBusErrorResponse
+    if the bus or the service cannot be reached.
+    """
+
+    def __init__(self, bus: str = "SYSTEM", bus_name: str = BUS_NAME, path: str = OBJECT_PATH):
+        if not available():
+            raise RuntimeError("jeepney is not installed.")
+        self.address = DBusAddress(path, bus_name=bus_name, interface=MANAGER_IFACE)
+        self.conn = open_dbus_connection(bus=bus)
+        changed = dict(type="signal", interface="org.freedesktop.DBus.Properties",
+                       member="PropertiesChanged", path=path)
+        rule = MatchRule(sender=bus_name, **changed)
+        # resolved restarts on every switch: follow the name to its new owner
+        owner_rule = MatchRule(
+            type="signal",
+            sender="org.freedesktop.DBus",
+            interface="org.freedesktop.DBus",
+            member="NameOwnerChanged",
+            path="/org/freedesktop/DBus",
+        )
+        owner_rule.add_arg_condition(0, bus_name)
+        for r in (rule, owner_rule):
+            self.conn.send_and_get_reply(message_bus.AddMatch(r))
+        # the bus resolves sender=<well-known name>, but signals arrive from the
+        # owner's unique name (:1.N), so the local filter must not compare it
+        self._signals = self.conn.filter(MatchRule(**changed), bufsize=64)
+        self._owners = self.conn.filter(owner_rule, bufsize=8)
+        self.global_servers: list[str] = []
+        self.link_servers: dict[int, list[str]] = {}
+        self.current_server: Optional[str] = None
+        self._memo: Optional[tuple] = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        reply = self.conn.send_and_get_reply(Properties(self.address).get_all())
+        props = {k: v for k, (_, v) in reply.body[0].items()}
+        glob: list[str] = []
+        links: dict[int, list[str]] = {}
+        for ifindex, family, raw in props.get("DNS", []):
+            addr = _addr(family, raw)
+            if addr is None:
+                continue
+            (glob if ifindex == 0 else links.setdefault(ifindex, [])).append(addr)
+        self.global_servers, self.link_servers = glob, links
+        cur = props.get("CurrentDNSServer")
+        self.current_server = _addr(cur[1], cur[2]) if cur and len(cur[2]) else None
+        self._memo = None
+
+    def poll(self) -> bool:
+        """Drain pending signals without blocking; True if the DNS state changed."""
+        while True:
+            try:
+                self.conn.recv_messages(timeout=0)
+            except TimeoutError:
+                break
+        changed = False
+        while self._signals.queue:
+            msg = self._signals.queue.popleft()
+            iface, props, invalidated = msg.body
+            if iface == MANAGER_IFACE and WATCHED & (set(props) | set(invalidated)):
+                changed = True
+        while self._owners.queue:
+            self._owners.queue.popleft()
+            changed = True
+        if changed:
+            try:
+                self.refresh()
+            except Exception:
+                self._clear()  # service gone for now: report nothing, callers fall back
+        return changed
+
+    def _clear(self) -> None:
+        self.global_servers, self.link_servers = [], {}
+        self.current_server = None
+        self._memo = None
+
+    def effective_servers(self) -> list[str]:
+        """Current server first, then per-link servers, then the global list."""
+        out = [self.current_server] if self.current_server else []
+        for servers in self.link_servers.values():
+            out += servers
+        out += self.global_servers
+        return list(dict.fromkeys(out))
+
+    def current_provider(self) -> Optional[str]:
+        """
+        Provider owning the server resolved is using. "Unknown" when resolved
+        reports servers that match no provider; None when it reports none.
+        """
+        key = tuple(logic.DNS_CONFIGS)
+        if self._memo is not None and self._memo[0] == key:
+            return self._memo[1]
+        self._memo = (key, self._match())
+        return self._memo[1]
+
+    def _match(self) -> Optional[str]:
+        servers = self.effective_servers()
+        if not servers:
+            return None
+        owners = {}
+        block = logic.promo_nextdns_block()
+        for a in logic.provider_addresses(block) if block else []:
+            owners.setdefault(a, "NextDNS")
+        for name, d in logic.DNS_CONFIGS.items():
+            for a in logic.provider_addresses(d.get("config", "")):
+                owners.setdefault(a, name)
+        for s in servers:
+            if s in owners:
+                return owners[s]
+        return "Unknown"
+
+    def statistics(self) -> dict[str, int]:
+        """resolved's cache / transaction / DNSSEC counters (see resolved_stats)."""
+        props = {}
+        for name in ("TransactionStatistics", "CacheStatistics", "DNSSECStatistics"):
+            reply = self.conn.send_and_get_reply(Properties(self.address).get(name))
+            props[name] = reply.body[0][1]
+        (current, total), (size, hits, misses), dnssec = (
+            props["TransactionStatistics"], props["CacheStatistics"], props["DNSSECStatistics"])
+        return {
+            "current_transactions": current, "total_transactions": total,
+            "cache_size": size, "cache_hits": hits, "cache_misses": misses,
+            **{f"dnssec_{k}": v for k, v in zip(("secure", "insecure", "bogus", "indeterminate"), dnssec)},
+        }
+
+    def close(self) -> None:
+        self.conn.close()
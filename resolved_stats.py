@@ -0,0 +1,223 @@
+"""
+systemd-resolved's own counters – transactions, cache hits and misses, DNSSEC
+verdicts – sampled periodically and turned into per-interval deltas charged to
+the provider that was active, so a switch that hurts the hit rate shows up.
+
+A source is any callable returning the counter dict: `resolvectl_source`
+parses `resolvectl statistics`, ResolvedDBus.statistics reads the same
+properties over D-Bus, and tests can pass a stand-in.
+
+The counters are system-wide, so only one process may add them to the totals
+file: the tracker holding the sampler claim stored next to the totals. The
+daemon's tracker is preferred and takes the claim over from a GUI.
+"""
+
+import fcntl
+import json
+import os
+import re
+import subprocess
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+import logic
+
+STATS_PATH = os.path.join(logic.CONFIG_DIR, "resolved_stats.json")
+
+COUNTERS = ("total_transactions", "cache_hits", "cache_misses",
+            "dnssec_secure", "dnssec_insecure", "dnssec_bogus", "dnssec_indeterminate")
+
+_LABELS = {
+    "current transactions": "current_transactions",
+    "total transactions": "total_transactions",
+    "current cache size": "cache_size",
+    "cache hits": "cache_hits",
+    "cache misses": "cache_misses",
+    "secure": "dnssec_secure",
+    "insecure": "dnssec_insecure",
+    "bogus": "dnssec_bogus",
+    "indeterminate": "dnssec_indeterminate",
+}
+_LINE = re.compile(r"^\s*([A-Za-z][A-Za-z ]*?)\s*:?\s+(\d+)\s*$")
+
+Source = Callable[[], dict]
+CLAIM_SECONDS = 300.0  # a sampler silent for this long loses its claim on the totals
+
+
+def parse_statistics(text: str) -> dict[str, int]:
+    """Counters from `resolvectl statistics` (both the old and the table layout)."""
+    out = {}
+    for line in text.splitlines():
+        m = _LINE.match(line)
+        if m and m.group(1).lower() in _LABELS:
+            out[_LABELS[m.group(1).lower()]] = int(m.group(2))
+    return out
+
+
+def resolvectl_source() -> dict[str, int]:
+    try:
+        result = subprocess.run(["resolvectl", "statistics"], capture_output=True, text=True, timeout=3)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"resolvectl statistics failed: {e}")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "resolvectl statistics failed.")
+    stats = parse_statistics(result.stdout)
+    if "total_transactions" not in stats:
+        raise RuntimeError("Unrecognised resolvectl statistics output.")
+    return stats
+
+
+def default_source(bus=None) -> Source:
+    """D-Bus when a ResolvedDBus is at hand, else resolvectl."""
+    return bus.statistics if bus is not None else resolvectl_source
+
+
+@dataclass
+class Interval:
+    ts: float
+    seconds: float
+    provider: str
+    transactions: int
+    cache_hits: int
+    cache_misses: int
+    dnssec_secure: int
+    dnssec_insecure: int
+    dnssec_bogus: int
+    dnssec_indeterminate: int
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+
+def _hit_rate(totals: dict) -> Optional[float]:
+    lookups = totals.get("cache_hits", 0) + totals.get("cache_misses", 0)
+    return totals.get("cache_hits", 0) / lookups if lookups else None
+
+
+class StatsTracker:
+    """
+    Call `sample()` periodically. resolved restarts (and zeroes its counters)
+    on every switch, so a counter that went down means "since restart" and the
+    interval belongs to the provider active now; otherwise to the one active
+    at the previous sample.
+    """
+
+    def __init__(self, source: Source, provider: Callable[[], str] = logic.get_current_dns,
+                 path: Optional[str] = STATS_PATH, keep: int = 120, preferred: bool = False):
+        self.source = source
+        self.provider = provider
+        self.path = path
+        self.preferred = preferred
+        self.intervals: deque[Interval] = deque(maxlen=keep)
+        self._id = uuid.uuid4().hex
+        self._claim: dict = {}
+        self.totals: dict[str, dict[str, int]] = self._load()
+        self._last: Optional[tuple[float, dict, str]] = None
+
+    def _load(self) -> dict:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        if "totals" not in data:
+            return data  # written before the sampler claim existed
+        self._claim = data.get("sampler") or {}
+        return data["totals"]
+
+    def forget(self) -> None:
+        """Drop the baseline, e.g. while another process samples: the next sample starts afresh."""
+        self._last = None
+
+    def _add_totals(self, owner: str, delta: dict[str, int], now: float) -> bool:
+        """
+        Add `delta` to the totals file under an flock if this tracker holds
+        the sampler claim. Taking the claim over from another tracker (expired,
+        or not preferred) only takes it: that delta overlaps what the other
+        one already counted. False when nothing was added.
+        """
+        if not self.path:
+            totals = self.totals.setdefault(owner, {})
+            for k, v in delta.items():
+                totals[k] = totals.get(k, 0) + v
+            return True
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.totals = self._load()
+            held = self._claim.get("id")
+            if held is not None and held != self._id:
+                if not (self._claim.get("until", 0.0) < now
+                        or (self.preferred and not self._claim.get("preferred"))):
+                    return False
+                delta = {}
+            totals = self.totals.setdefault(owner, {})
+            for k, v in delta.items():
+                totals[k] = totals.get(k, 0) + v
+            self._claim = {"id": self._id, "pid": os.getpid(), "preferred": self.preferred,
+                           "until": now + CLAIM_SECONDS}
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"sampler": self._claim, "totals": self.totals}, f, indent=4)
+            os.replace(tmp, self.path)
+            return bool(delta)
+
+    def sample(self, now: Optional[float] = None) -> Optional[Interval]:
+        """Read the source; returns the interval since the last sample (None the first time)."""
+        now = time.time() if now is None else now
+        counters, provider = self.source(), self.provider()
+        prev, self._last = self._last, (now, counters, provider)
+        if prev is None:
+            return None
+        reset = any(counters.get(k, 0) < prev[1].get(k, 0) for k in COUNTERS)
+        delta = {k: counters.get(k, 0) - (0 if reset else prev[1].get(k, 0)) for k in COUNTERS}
+        owner = provider if reset else prev[2]
+        interval = Interval(
+            ts=now, seconds=now - prev[0], provider=owner,
+            transactions=delta["total_transactions"],
+            cache_hits=delta["cache_hits"], cache_misses=delta["cache_misses"],
+            dnssec_secure=delta["dnssec_secure"], dnssec_insecure=delta["dnssec_insecure"],
+            dnssec_bogus=delta["dnssec_bogus"], dnssec_indeterminate=delta["dnssec_indeterminate"],
+        )
+        self.intervals.append(interval)
+        if interval.transactions or interval.cache_hits or interval.cache_misses:
+            self._add_totals(owner, {k: v for k, v in asdict(interval).items()
+                                     if k not in ("ts", "seconds", "provider")}, now)
+        return interval
+
+    def hit_rate(self, provider: str) -> Optional[float]:
+        return _hit_rate(self.totals.get(provider, {}))
+
+    def summary(self) -> dict:
+        """JSON-friendly view for the daemon status / metrics output."""
+        last = self.intervals[-1] if self.intervals else None
+        return {
+            "last": {**asdict(last), "hit_rate": last.hit_rate} if last else None,
+            "providers": {n: {**t, "hit_rate": _hit_rate(t)} for n, t in self.totals.items()},
+        }
+
+
+def describe(summary: dict, provider: str) -> str:
+    """One line for the DNS tab card."""
+    last = summary.get("last")
+    parts = []
+    if last and last["provider"] == provider and last["seconds"] > 0:
+        parts.append(f"{last['transactions'] / last['seconds'] * 60:.0f} q/min")
+        if last["hit_rate"] is not None:
+            parts.append(f"hit {last['hit_rate']:.0%} now")
+    overall = summary.get("providers", {}).get(provider, {}).get("hit_rate")
+    if overall is not None:
+        parts.append(f"{overall:.0%} overall")
+    return " · ".join(parts) or "–"
+
+
+if __name__ == "__main__":
+    print(json.dumps(resolvectl_source(), indent=4))
@@ -0,0 +1,177 @@
+"""
+One Tk-driven scheduler for every periodic job (ping, connectivity, file checks,
+benchmarks). Jobs are keyed, so registering the same key twice replaces the
+job instead of starting a second loop. A single root.after chain drives them all.
+`run_in_background` covers blocking work (probes, switches, bulk apply) with one
+shared worker pool and a callback on the Tk thread; periodic jobs registered
+with `apply=` go through it too, so Tk never waits on the network.
+"""
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+TICK_MS = 250
+MINIMIZED_FACTOR = 4.0   # minimized window: poll this much slower
+BOOST_SECONDS = 15.0     # after a switch: run at the base interval
+POLL_MS = 100            # how often a background result is checked for
+BACKGROUND_WORKERS = 4
+
+_background = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+
+# on_done(result, error): exactly one of them is set
+DoneCallback = Callable[[Any, Optional[BaseException]], None]
+
+
+@dataclass
+class Job:
+    key: str
+    fn: Callable[[], Optional[bool]]
+    interval: float
+    max_interval: float
+    backoff: float
+    current: float
+    due: float
+    runs: int = 0
+    apply: Optional[Callable[[Any], Optional[bool]]] = None  # set for background jobs
+    running: bool = False
+
+
+class Scheduler:
+    """
+    Each job callback may return True when the state it watches changed; that
+    resets it to its base interval. Anything else counts as "stable" and
+    stretches the interval by `backoff`, up to `max_interval`.
+    With `apply`, `fn` is the blocking half: it runs on the background pool
+    (never twice at once) and `apply(result)` on the Tk thread reports the change.
+    """
+
+    def __init__(self, root, tick_ms: int = TICK_MS):
+        self.root = root
+        self.tick_ms = tick_ms
+        self.jobs: dict[str, Job] = {}
+        self._boost_until = 0.0
+        self._after_id = None
+
+    # ---------------------------------------------------------- registry
+    def every(self, key: str, fn: Callable[[], Optional[bool]], interval: float,
+              max_interval: Optional[float] = None, backoff: float = 1.5,
+              run_now: bool = False, apply: Optional[Callable[[Any], Optional[bool]]] = None) -> None:
+        now = time.monotonic()
+        self.jobs[key] = Job(
+            key=key,
+            fn=fn,
+            interval=interval,
+            max_interval=max_interval or interval,
+            backoff=backoff,
+            current=interval,
+            due=now if run_now else now + interval,
+            apply=apply,
+        )
+        self.start()
+
+    def cancel(self, key: str) -> None:
+        self.jobs.pop(key, None)
+
+    def run_soon(self, key: str) -> None:
+        if key in self.jobs:
+            self.jobs[key].due = time.monotonic()
+
+    def reset(self, key: str) -> None:
+        """Back to the base interval, for jobs that learn of a change later (in the background)."""
+        job = self.jobs.get(key)
+        if job is not None:
+            job.current = job.interval
+            job.due = min(job.due, time.monotonic() + job.interval)
+
+    # ---------------------------------------------------------- one-off work
+    def run_in_background(self, fn: Callable[[], Any], on_done: Optional[DoneCallback] = None,
+                          widget=None) -> Future:
+        """
+        Run `fn` on the shared pool, then call `on_done(result, error)` on the
+        Tk thread. With `widget` (e.g. a popup), the callback is dropped once
+        that widget is destroyed.
+        """
+        fut = _background.submit(fn)
+        owner = widget or self.root
+
+        def poll():
+            try:
+                if not owner.winfo_exists():
+                    return
+            except Exception:
+                return  # Tk is gone
+            if not fut.done():
+                owner.after(POLL_MS, poll)
+                return
+            if on_done is not None:
+                error = fut.exception()
+                on_done(None if error else fut.result(), error)
+
+        owner.after(POLL_MS, poll)
+        return fut
+
+    # ---------------------------------------------------------- control
+    def boost(self, seconds: float = BOOST_SECONDS) -> None:
+        """Poll at base rate for a while, e.g. right after a switch."""
+        self._boost_until = time.monotonic() + seconds
+        now = time.monotonic()
+        for job in self.jobs.values():
+            job.current = job.interval
+            job.due = min(job.due, now + job.interval)
+
+    def start(self) -> None:
+        if self._after_id is None:
+            self._after_id = self.root.after(self.tick_ms, self._tick)
+
+    def stop(self) -> None:
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    # ---------------------------------------------------------- loop
+    def _minimized(self) -> bool:
+        try:
+            return self.root.state() in ("iconic", "withdrawn")
+        except Exception:
+            return False
+
+    def _reschedule(self, job: Job, changed: Optional[bool]) -> None:
+        now = time.monotonic()
+        boosted = now < self._boost_until
+        factor = MINIMIZED_FACTOR if self._minimized() and not boosted else 1.0
+        job.runs += 1
+        if changed or boosted:
+            job.current = job.interval
+        else:
+            job.current = min(job.current * job.backoff, job.max_interval)
+        job.due = now + job.current * factor
+
+    def _finish(self, job: Job, result: Any, error: Optional[BaseException]) -> None:
+        """Tk-thread half of a background job."""
+        job.running = False
+        if self.jobs.get(job.key) is not job:
+            return  # cancelled or replaced meanwhile
+        try:
+            changed = False if error else job.apply(result)
+        except Exception:
+            changed = False
+        self._reschedule(job, changed)
+
+    def _tick(self) -> None:
+        self._after_id = None
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            if now < job.due or job.running or self.jobs.get(job.key) is not job:
+                continue
+            if job.apply is not None:
+                job.running = True
+                self.run_in_background(job.fn, lambda result, error, job=job: self._finish(job, result, error))
+                continue
+            try:
+                changed = job.fn()
+            except Exception:
+                changed = False
+            self._reschedule(job, changed)
+        self.start()
@@ -0,0 +1,119 @@
+"""
+Post-switch latency SLO guard. After a new config is live, probe resolution
+through resolved's stub for a short window; if p95 latency or the failure
+rate break the SLO, the caller rolls back to the backup taken before the switch.
+"""
+
+import asyncio
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import dns_client
+import logic
+from stats import percentile
+
+STUB_ADDR = "127.0.0.53"
+# random labels under these zones miss every cache, so each probe reaches upstream
+PROBE_ZONES = ("google.com", "cloudflare.com", "wikipedia.org", "github.com")
+SETTLE_SECONDS = 0.3  # resolved restart before the first probe
+
+
+@dataclass
+class Slo:
+    p95_ms: float = 300.0
+    max_failure_rate: float = 0.1
+    window: float = 3.0
+    probes: int = 12
+    timeout: float = 1.5
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "Slo":
+        return cls(
+            p95_ms=float(settings.get("slo_p95_ms", cls.p95_ms)),
+            max_failure_rate=float(settings.get("slo_max_failure_rate", cls.max_failure_rate)),
+            window=float(settings.get("slo_window", cls.window)),
+        )
+
+
+@dataclass
+class GuardReport:
+    provider: str
+    samples: int
+    failures: int
+    p95_ms: Optional[float]
+    slo: Slo
+    backup: Optional[str] = None
+    rolled_back: bool = False
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failures / self.samples if self.samples else 1.0
+
+    @property
+    def ok(self) -> bool:
+        return (
+            self.p95_ms is not None
+            and self.p95_ms <= self.slo.p95_ms
+            and self.failure_rate <= self.slo.max_failure_rate
+        )
+
+    def __str__(self) -> str:
+        p95 = f"{self.p95_ms:.0f} ms" if self.p95_ms is not None else "n/a"
+        return (
+            f"p95 {p95} (SLO {self.slo.p95_ms:.0f} ms), "
+            f"failures {self.failure_rate:.0%} (SLO {self.slo.max_failure_rate:.0%})"
+        )
+
+
+async def _probe(slo: Slo, server: str, port: int) -> list[Optional[float]]:
+    gap = slo.window / max(1, slo.probes)
+
+    async def one(i: int) -> Optional[float]:
+        await asyncio.sleep(i * gap)
+        name = f"{secrets.token_hex(6)}.{PROBE_ZONES[i % len(PROBE_ZONES)]}"
+        ms, code = await dns_client.timed_query(server, name, port=port, timeout=slo.timeout)
+        # NXDOMAIN is the expected answer for a random label; SERVFAIL is not
+        return ms if code in (0, 3) else None
+
+    return list(await asyncio.gather(*(one(i) for i in range(slo.probes))))
+
+
+def probe(slo: Slo, server: str = STUB_ADDR, port: int = dns_client.DNS_PORT) -> list[Optional[float]]:
+    """Spread `slo.probes` uncached lookups over `slo.window` seconds; None = failed."""
+    return asyncio.run(_probe(slo, server, port))
+
+
+def evaluate(provider: str, samples: list[Optional[float]], slo: Slo,
+             backup: Optional[str] = None) -> GuardReport:
+    ok = [s for s in samples if s is not None]
+    return GuardReport(
+        provider=provider,
+        samples=len(samples),
+        failures=len(samples) - len(ok),
+        p95_ms=percentile(ok, 0.95),
+        slo=slo,
+        backup=backup,
+    )
+
+
+def probe_after_switch(slo: Slo, **kwargs) -> list[Optional[float]]:
+    """`probe` after a short settle delay that lets the restarted resolved come up."""
+    time.sleep(SETTLE_SECONDS)
+    return probe(slo, **kwargs)
+
+
+def guarded_switch(provider: str, cfg: str, slo: Optional[Slo] = None) -> GuardReport:
+    """
+    Blocking variant for non-GUI callers: back up, switch, probe, and roll
+    back through the existing backup machinery if the SLO is broken.
+    """
+    slo = slo or Slo.from_settings(logic.load_settings())
+    backup = logic.backup_resolved()
+    logic.write_config(cfg)
+    report = evaluate(provider, probe_after_switch(slo), slo, backup)
+    if not report.ok:
+        logic.restore_backup(backup)
+        report.rolled_back = True
+    return report
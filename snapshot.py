@@ -0,0 +1,57 @@
+"""
+Warm-start snapshot: the last known DNS-tab state, written periodically and on
+exit, so the next launch can paint it at once (marked stale) instead of
+"Unknown / N/A / DISCONNECTED" until the first probes finish.
+The snapshot is ignored if resolved.conf changed after it was written.
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+import logic
+
+SNAPSHOT_PATH = os.path.join(logic.CONFIG_DIR, "snapshot.json")
+VERSION = 1
+MAX_AGE = 7 * 86400  # seconds; older snapshots are not worth showing
+
+
+def conf_key(path: Optional[str] = None) -> list:
+    """(mtime_ns, size, inode) of resolved.conf, [] if it cannot be read."""
+    try:
+        st = os.stat(path or logic.RESOLVED_CONF_PATH)
+        return [st.st_mtime_ns, st.st_size, st.st_ino]
+    except OSError:
+        return []
+
+
+def save(state: dict) -> None:
+    """Write `state` plus the conf key atomically."""
+    data = {"version": VERSION, "ts": time.time(), "conf_key": conf_key(), **state}
+    tmp = SNAPSHOT_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, SNAPSHOT_PATH)
+
+
+def load() -> Optional[dict]:
+    """The saved state, or None if missing, too old or resolved.conf has changed since."""
+    try:
+        with open(SNAPSHOT_PATH, "r") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != VERSION:
+        return None
+    if time.time() - data.get("ts", 0) > MAX_AGE or data.get("conf_key") != conf_key():
+        discard()
+        return None
+    return data
+
+
+def discard() -> None:
+    try:
+        os.remove(SNAPSHOT_PATH)
+    except OSError:
+        pass
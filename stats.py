@@ -0,0 +1,55 @@
+"""
+Small latency-statistics helpers shared by the probes, the forwarder and the guard.
+"""
+
+import math
+from collections import deque
+from typing import Iterable, Optional
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile, `q` in [0, 1]; None for no data."""
+    data = sorted(values)
+    if not data:
+        return None
+    pos = (len(data) - 1) * min(max(q, 0.0), 1.0)
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return data[lo] + (data[hi] - data[lo]) * (pos - lo)
+
+
+def weighted_percentile(pairs: Iterable[tuple[float, float]], q: float) -> Optional[float]:
+    """Percentile of (value, weight) pairs: the value at cumulative weight `q`."""
+    data = sorted(p for p in pairs if p[1] > 0)
+    total = sum(w for _, w in data)
+    if not data:
+        return None
+    target, seen = total * min(max(q, 0.0), 1.0), 0.0
+    for value, weight in data:
+        seen += weight
+        if seen >= target:
+            return value
+    return data[-1][0]
+
+
+class LatencyWindow:
+    """Rolling window of the last `size` samples; None marks a lost probe."""
+
+    def __init__(self, size: int = 200):
+        self.samples: deque[Optional[float]] = deque(maxlen=size)
+
+    def add(self, ms: Optional[float]) -> None:
+        self.samples.append(ms)
+
+    def ok(self) -> list[float]:
+        return [s for s in self.samples if s is not None]
+
+    def percentile(self, q: float) -> Optional[float]:
+        return percentile(self.ok(), q)
+
+    @property
+    def loss(self) -> float:
+        n = len(self.samples)
+        return (n - len(self.ok())) / n if n else 0.0
+
+    def __len__(self) -> int:
+        return len(self.samples)
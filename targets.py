@@ -0,0 +1,208 @@
+"""
+Apply one provider's resolver config to many places at once: chroots,
+container root filesystems or any alternate resolved.conf path. Paths below
+a `root` are opened without following symlinks.
+Targets live in ~/.config/dns-changer/targets.json, e.g.
+
+    [
+        {"name": "build-chroot", "root": "/srv/chroots/build"},
+        {"name": "web", "root": "/var/lib/machines/web",
+         "reload_cmd": ["systemctl", "-M", "web", "restart", "systemd-resolved"]},
+        {"name": "alt", "conf_path": "/etc/systemd/resolved.conf.d/dns.conf"}
+    ]
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+
+import logic
+
+TARGETS_PATH = os.path.join(logic.CONFIG_DIR, "targets.json")
+TARGET_BACKUPS_DIR = os.path.join(logic.CONFIG_DIR, "target-backups")  # kept out of BACKUPS_DIR: its listing is restorable
+DEFAULT_PARALLELISM = 8
+
+
+@dataclass
+class Target:
+    name: str
+    root: Optional[str] = None              # chroot / container rootfs
+    conf_path: str = logic.RESOLVED_CONF_PATH  # inside `root` when set
+    reload_cmd: Optional[list[str]] = None
+
+    @property
+    def path(self) -> str:
+        if self.root:
+            return os.path.join(self.root, self.conf_path.lstrip("/"))
+        return self.conf_path
+
+
+# Run as root with `python -c`: walks `conf_path` below `root` one component
+# at a time with O_NOFOLLOW, so a symlink planted inside a container or chroot
+# cannot redirect the backup read or the write to a host file.
+_ROOTED_IO = r"""
+import errno, os, sys
+mode, root, rel = sys.argv[1:4]
+parts = [p for p in rel.split("/") if p]
+if not parts or ".." in parts:
+    sys.exit(f"Bad path {rel!r}.")
+try:
+    fd = os.open(root, os.O_RDONLY | os.O_DIRECTORY)
+    for p in parts[:-1]:
+        nxt = os.open(p, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=fd)
+        os.close(fd)
+        fd = nxt
+    if mode == "read":
+        try:
+            f = os.open(parts[-1], os.O_RDONLY | os.O_NOFOLLOW, dir_fd=fd)
+        except FileNotFoundError:
+            sys.exit(3)
+        with os.fdopen(f) as src:
+            sys.stdout.write(src.read())
+    else:
+        with open(sys.argv[4]) as src:
+            data = src.read()
+        f = os.open(parts[-1], os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o644, dir_fd=fd)
+        with os.fdopen(f, "w") as dst:
+            dst.write(data)
+except OSError as e:
+    why = "symlinks are not followed inside a target root" if e.errno in (errno.ELOOP, errno.ENOTDIR) else e.strerror
+    sys.exit(f"{os.path.join(root, rel.lstrip('/'))}: {why}.")
+"""
+_MISSING = 3
+
+
+@dataclass
+class TargetResult:
+    target: str
+    path: str
+    ok: bool
+    seconds: float
+    backup: Optional[str] = None
+    error: Optional[str] = None
+
+
+def load_targets() -> list[Target]:
+    try:
+        with open(TARGETS_PATH, "r") as f:
+            raw = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    targets = []
+    for entry in raw if isinstance(raw, list) else []:
+        try:
+            targets.append(Target(**entry))
+        except TypeError:
+            continue
+    return targets
+
+
+def save_targets(targets: list[Target]) -> None:
+    with open(TARGETS_PATH, "w") as f:
+        json.dump([asdict(t) for t in targets], f, indent=4)
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", name).strip("_") or "target"
+
+
+def _test(flag: str, path: str, password: Optional[str]) -> bool:
+    """`test -d/-e` as root: container roots are often 0700."""
+    return logic.run_privileged(["test", flag, path], password, check=False).returncode == 0
+
+
+def _rooted_io(target: Target, password: Optional[str], mode: str, *args: str):
+    return logic.run_privileged([sys.executable, "-c", _ROOTED_IO, mode, target.root, target.conf_path, *args],
+                                password, check=False)
+
+
+def _read_conf(target: Target, password: Optional[str]) -> Optional[str]:
+    """Current conf of the target as root; None if absent."""
+    if not target.root:
+        if not _test("-e", target.path, password):
+            return None
+        return logic.run_privileged(["cat", target.path], password).stdout
+    result = _rooted_io(target, password, "read")
+    if result.returncode == _MISSING:
+        return None
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"Could not read {target.path}.")
+    return result.stdout
+
+
+def _install(cfg: str, target: Target, password: Optional[str]) -> None:
+    if not target.root:
+        logic.install_config(cfg, target.path, target.reload_cmd, password=password)
+        return
+    fd, tmp_path = tempfile.mkstemp(prefix="resolved-", suffix=".conf")
+    try:
+        with os.fdopen(fd, "w") as tmp:
+            tmp.write(cfg)
+        os.chmod(tmp_path, 0o644)
+        result = _rooted_io(target, password, "write", tmp_path)
+    finally:
+        os.remove(tmp_path)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"Could not write {target.path}.")
+    if target.reload_cmd:
+        logic.run_privileged(target.reload_cmd, password)
+
+
+def backup_target(target: Target, password: Optional[str] = None) -> Optional[str]:
+    """Copy the target's current conf into target-backups/<name>/; None if absent."""
+    text = _read_conf(target, password)
+    if text is None:
+        return None
+    dest_dir = os.path.join(TARGET_BACKUPS_DIR, _slug(target.name))
+    os.makedirs(dest_dir, exist_ok=True)
+    ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    for n in range(1000):
+        dest = os.path.join(dest_dir, f"Backup_{ts}{f'_{n}' if n else ''}.conf")
+        try:
+            with open(dest, "x") as f:  # never overwrite a backup from the same second
+                f.write(text)
+            return dest
+        except FileExistsError:
+            continue
+    raise RuntimeError(f"Too many backups of {target.name} this second.")
+
+
+def _apply_one(cfg: str, target: Target, password: Optional[str]) -> TargetResult:
+    t0 = time.monotonic()
+    backup = None
+    try:
+        backup = backup_target(target, password)
+        _install(cfg, target, password)
+        return TargetResult(target.name, target.path, True, time.monotonic() - t0, backup)
+    except Exception as e:
+        return TargetResult(target.name, target.path, False, time.monotonic() - t0, backup, str(e))
+
+
+def apply_to_targets(cfg: str, targets: list[Target], parallelism: int = DEFAULT_PARALLELISM,
+                     password: Optional[str] = None) -> list[TargetResult]:
+    """
+    Back up and write `cfg` to every target with bounded parallelism.
+    From the GUI, pass the password from logic.ensure_sudo(): the workers
+    never prompt. Results come back in target order.
+    """
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(targets))),
+                            thread_name_prefix="apply") as pool:
+        return list(pool.map(lambda t: _apply_one(cfg, t, password), targets))
+
+
+def report(results: list[TargetResult]) -> str:
+    ok = sum(r.ok for r in results)
+    slowest = max((r.seconds for r in results), default=0.0)
+    lines = [f"{ok}/{len(results)} targets updated (slowest {slowest:.1f} s)"]
+    for r in results:
+        lines.append(f"{'✓' if r.ok else '✗'} {r.target} {r.seconds:.1f} s" + (f" – {r.error}" if r.error else ""))
+    return "\n".join(lines)
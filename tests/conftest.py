@@ -0,0 +1,81 @@
+import os
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+import pytest
+
+# logic.py fixes its paths at import time: point them at a throw-away config dir first
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp(prefix="dns-changer-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def reply(query: bytes, *, ttl: int = 300, rcode: int = 0, answers: int = 1,
+          soa_ttl: int = 0, soa_minimum: int = 60) -> bytes:
+    """A response to `query`: `answers` A records, plus an SOA in authority when soa_ttl is set."""
+    import dns_wire
+
+    end = dns_wire.skip_name(query, 12) + 4
+    body = b"".join(b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, ttl, 4) + bytes([10, 0, 0, i + 1])
+                    for i in range(answers))
+    authority = 0
+    if soa_ttl:
+        rdata = b"\x00\x00" + struct.pack("!IIIII", 1, 2, 3, 4, soa_minimum)
+        body += b"\xc0\x0c" + struct.pack("!HHIH", 6, 1, soa_ttl, len(rdata)) + rdata
+        authority = 1
+    flags = 0x8180 | rcode
+    return query[:2] + struct.pack("!HHHHH", flags, 1, answers, authority, 0) + query[12:end] + body
+
+
+# ------------------------------------------------------------------#
+#  DoT stand-in                                                      #
+# ------------------------------------------------------------------#
+@pytest.fixture(scope="session")
+def self_signed(tmp_path_factory):
+    """(certfile, keyfile) of a self-signed certificate for "localhost" / 127.0.0.1."""
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    d = tmp_path_factory.mktemp("tls")
+    cert, key = str(d / "cert.pem"), str(d / "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+                    "-keyout", key, "-out", cert], check=True, capture_output=True)
+    return cert, key
+
+
+@pytest.fixture
+def dot_server(self_signed):
+    """Port of a DoT server on 127.0.0.1 that answers every query with one A record."""
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(*self_signed)
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def handle(conn):
+        try:
+            with ctx.wrap_socket(conn, server_side=True) as tls:
+                while hdr := tls.recv(2):
+                    (n,) = struct.unpack("!H", hdr)
+                    query = b""
+                    while len(query) < n:
+                        query += tls.recv(n - len(query))
+                    answer = reply(query)
+                    tls.sendall(struct.pack("!H", len(answer)) + answer)
+        except (OSError, ssl.SSLError):
+            pass
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
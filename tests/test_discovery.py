@@ -0,0 +1,73 @@
+import asyncio
+import socket
+import ssl
+import struct
+
+import discovery
+import dns_wire
+
+
+class FakeResolver(asyncio.DatagramProtocol):
+    """Answers A queries from `zone`; everything else gets an empty NOERROR."""
+
+    def __init__(self, zone: dict[str, list[str]]):
+        self.zone = zone
+        self.asked: list[tuple[str, int]] = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, query, addr):
+        name, qtype, _ = dns_wire.question(query)
+        self.asked.append((name, qtype))
+        ips = self.zone.get(name, []) if qtype == dns_wire.TYPE_A else []
+        end = dns_wire.skip_name(query, 12) + 4
+        answers = b"".join(b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, 300, 4) + socket.inet_aton(ip)
+                           for ip in ips)
+        self.transport.sendto(query[:2] + struct.pack("!HHHHH", 0x8180, 1, len(ips), 0, 0)
+                              + query[12:end] + answers, addr)
+
+
+def discover(cfg: str, zone: dict, context: ssl.SSLContext):
+    async def main():
+        loop = asyncio.get_running_loop()
+        resolver = FakeResolver(zone)
+        transport, _ = await loop.create_datagram_endpoint(lambda: resolver, local_addr=("127.0.0.1", 0))
+        try:
+            port = transport.get_extra_info("sockname")[1]
+            return resolver, await discovery.discover_async("Test", cfg, ("127.0.0.1", port),
+                                                            timeout=1.0, dot_context=context)
+        finally:
+            transport.close()
+
+    return asyncio.run(main())
+
+
+def test_dot_endpoints_are_resolved_and_probed_over_tls(dot_server, self_signed):
+    cfg = f"[Resolve]\nDNS=127.0.0.1:{dot_server}#localhost\nDNSOverTLS=yes\n"
+    trusted = ssl.create_default_context(cafile=self_signed[0])
+    resolver, disc = discover(cfg, {"localhost": ["127.0.0.1", "127.0.0.5"]}, trusted)
+
+    assert disc.names == ["localhost"]
+    assert ("localhost", dns_wire.TYPE_A) in resolver.asked
+    assert ("localhost", dns_wire.TYPE_AAAA) in resolver.asked
+    assert disc.candidates["127.0.0.1"] is not None
+    assert disc.candidates["127.0.0.5"] is None  # nothing serves DoT there
+    assert disc.best() == ["127.0.0.1"]
+    assert discovery.rewrite_config(cfg, disc.best()) == cfg
+
+
+def test_endpoint_that_cannot_prove_the_name_is_never_picked(dot_server):
+    cfg = f"[Resolve]\nDNS=127.0.0.1:{dot_server}#localhost\nDNSOverTLS=yes\n"
+    _, disc = discover(cfg, {"localhost": ["127.0.0.1"]}, ssl.create_default_context())
+    assert disc.candidates == {"127.0.0.1": None}
+    assert disc.best() == []
+
+
+def test_rewrite_keeps_port_sni_and_line_layout():
+    per_line = "[Resolve]\nDNS=45.90.28.0#abc.dns.nextdns.io\nDNS=45.90.30.0#abc.dns.nextdns.io\nDNSOverTLS=yes\n"
+    assert discovery.rewrite_config(per_line, ["1.2.3.4", "2001:db8::1"]) == (
+        "[Resolve]\nDNS=1.2.3.4#abc.dns.nextdns.io\nDNS=2001:db8::1#abc.dns.nextdns.io\nDNSOverTLS=yes\n")
+    one_line = "[Resolve]\nDNS=1.1.1.1:853#one.one.one.one 1.0.0.1\nDNSOverTLS=yes\n"
+    assert discovery.rewrite_config(one_line, ["1.0.0.1", "2606:4700::1111"]) == (
+        "[Resolve]\nDNS=1.0.0.1:853#one.one.one.one [2606:4700::1111]:853#one.one.one.one\nDNSOverTLS=yes\n")
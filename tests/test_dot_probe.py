@@ -0,0 +1,39 @@
+import math
+import socket
+
+import dot_probe
+
+
+def closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_probe_server_measures_every_phase(dot_server, self_signed):
+    ctx = dot_probe.make_context(cafile=self_signed[0])
+    r = dot_probe.probe_server("127.0.0.1", "localhost", dot_server, context=ctx, queries=3)
+    assert r.ok and r.error is None
+    assert r.connect_ms >= 0 and r.handshake_ms > 0 and r.query_ms > 0
+    assert r.resumed_handshake_ms is not None
+    hs = r.resumed_handshake_ms if r.session_reused else r.handshake_ms
+    assert math.isclose(r.score, r.connect_ms + hs + r.query_ms)
+
+
+def test_probe_server_never_raises(dot_server):
+    r = dot_probe.probe_server("127.0.0.1", None, closed_port(), timeout=0.5)
+    assert not r.ok and r.error and r.score == float("inf")
+    r = dot_probe.probe_server("127.0.0.1", "localhost", dot_server)  # untrusted certificate
+    assert not r.ok and r.score == float("inf")
+
+
+def test_rank_providers_skips_plain_and_sorts_unreachable_last(dot_server, self_signed):
+    configs = {
+        "Down": {"config": f"[Resolve]\nDNS=127.0.0.1:{closed_port()}#localhost\nDNSOverTLS=yes\n"},
+        "Up": {"config": f"[Resolve]\nDNS=127.0.0.1:{dot_server}#localhost\nDNSOverTLS=yes\n"},
+        "Plain": {"config": "[Resolve]\nDNS=127.0.0.1\nDNSOverTLS=no\n"},
+    }
+    ctx = dot_probe.make_context(cafile=self_signed[0])
+    ranked = dot_probe.rank_providers(configs, context=ctx, timeout=0.5)
+    assert [name for name, _, _ in ranked] == ["Up", "Down"]
+    assert ranked[0][1] < float("inf") and ranked[1][1] == float("inf")
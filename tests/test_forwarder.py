@@ -0,0 +1,155 @@
+import asyncio
+import ssl
+
+import pytest
+
+import dns_client
+import dns_wire
+import forwarder
+from conftest import reply
+from forwarder import CachingForwarder, DnsCache
+
+KEY = ("example.com", dns_wire.TYPE_A, dns_wire.CLASS_IN)
+
+
+def test_positive_entry_expires_after_its_ttl():
+    cache = DnsCache()
+    assert cache.put(KEY, reply(dns_wire.build_query("example.com"), ttl=30), now=100.0)
+    assert cache.get(KEY, now=129.0) is not None
+    assert cache.get(KEY, now=130.0) is None
+    assert len(cache) == 0
+
+
+def test_hits_come_back_with_aged_ttls():
+    cache = DnsCache()
+    cache.put(KEY, reply(dns_wire.build_query("example.com"), ttl=300), now=0.0)
+    assert dns_wire.cache_ttl(cache.get(KEY, now=120.0)) == 180
+
+
+def test_max_ttl_caps_long_answers():
+    cache = DnsCache(max_ttl=60)
+    cache.put(KEY, reply(dns_wire.build_query("example.com"), ttl=86_400), now=0.0)
+    assert cache.get(KEY, now=61.0) is None
+
+
+def test_nxdomain_is_cached_from_the_soa():
+    cache = DnsCache()
+    nx = reply(dns_wire.build_query("nx.example.com"), rcode=dns_wire.RCODE_NXDOMAIN,
+               answers=0, soa_ttl=600, soa_minimum=45)
+    key = ("nx.example.com", dns_wire.TYPE_A, dns_wire.CLASS_IN)
+    assert cache.put(key, nx, now=0.0)
+    assert dns_wire.rcode(cache.get(key, now=44.0)) == dns_wire.RCODE_NXDOMAIN
+    assert cache.get(key, now=45.0) is None  # min(SOA TTL, SOA minimum)
+
+
+def test_negative_ttl_is_capped():
+    cache = DnsCache(max_negative_ttl=10)
+    nodata = reply(dns_wire.build_query("example.com"), answers=0, soa_ttl=3600, soa_minimum=3600)
+    assert cache.put(KEY, nodata, now=0.0)
+    assert cache.get(KEY, now=9.0) is not None
+    assert cache.get(KEY, now=10.0) is None
+
+
+def test_negative_answer_without_soa_is_not_cached():
+    cache = DnsCache()
+    nx = reply(dns_wire.build_query("example.com"), rcode=dns_wire.RCODE_NXDOMAIN, answers=0)
+    assert not cache.put(KEY, nx, now=0.0)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DnsCache(max_entries=2)
+    keys = [(f"n{i}.example", dns_wire.TYPE_A, dns_wire.CLASS_IN) for i in range(3)]
+    for k in keys[:2]:
+        cache.put(k, reply(dns_wire.build_query(k[0])), now=0.0)
+    cache.get(keys[0], now=1.0)  # n1 is now the oldest
+    cache.put(keys[2], reply(dns_wire.build_query(keys[2][0])), now=2.0)
+    assert cache.names() == ["n0.example", "n2.example"]
+    assert cache.stats()["hits"] == 1
+
+
+# ------------------------------------------------------------------#
+#  End to end, over real sockets                                     #
+# ------------------------------------------------------------------#
+class FakeUpstream:
+    def __init__(self, answer=None):
+        self.answer = answer or (lambda query: reply(query))
+        self.asked: list[str] = []
+
+    async def resolve(self, query: bytes) -> bytes:
+        self.asked.append(dns_wire.question(query)[0])
+        return self.answer(query)
+
+
+def serve(upstream, fn):
+    """Run `fn(port)` against a CachingForwarder on a free loopback port."""
+    async def main():
+        fwd = CachingForwarder(upstream, port=0)
+        await fwd.start()
+        try:
+            return fwd, await fn(fwd.port)
+        finally:
+            await fwd.stop()
+
+    return asyncio.run(main())
+
+
+def test_miss_goes_upstream_then_hits_the_cache():
+    up = FakeUpstream()
+
+    async def ask(port):
+        first = await dns_client.udp_query("127.0.0.1", dns_wire.build_query("example.com", qid=1), port)
+        second = await dns_client.tcp_query("127.0.0.1", dns_wire.build_query("example.com", qid=2), port)
+        return first, second
+
+    fwd, (first, second) = serve(up, ask)
+    assert up.asked == ["example.com"]
+    assert dns_wire.query_id(first) == 1 and dns_wire.query_id(second) == 2
+    assert dns_wire.addresses(second) == dns_wire.addresses(first)
+    assert fwd.stats()["hits"] == 1
+
+
+def test_nxdomain_is_served_from_cache_for_the_soa_minimum(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(forwarder.time, "monotonic", lambda: clock[0])
+    up = FakeUpstream(lambda q: reply(q, rcode=dns_wire.RCODE_NXDOMAIN, answers=0,
+                                      soa_ttl=600, soa_minimum=45))
+
+    async def ask(port):
+        rcodes = []
+        for t in (1000.0, 1044.0, 1045.0):
+            clock[0] = t
+            r = await dns_client.udp_query("127.0.0.1", dns_wire.build_query("nx.example.com"), port)
+            rcodes.append(dns_wire.rcode(r))
+        return rcodes
+
+    _, rcodes = serve(up, ask)
+    assert rcodes == [dns_wire.RCODE_NXDOMAIN] * 3
+    assert up.asked == ["nx.example.com", "nx.example.com"]  # asked again once 45 s are up
+
+
+def test_failing_upstream_answers_servfail_and_caches_nothing():
+    def fail(query):
+        raise TimeoutError("upstream down")
+
+    async def ask(port):
+        return [await dns_client.udp_query("127.0.0.1", dns_wire.build_query("example.com"), port)
+                for _ in range(2)]
+
+    fwd, replies = serve(FakeUpstream(fail), ask)
+    assert [dns_wire.rcode(r) for r in replies] == [dns_wire.RCODE_SERVFAIL] * 2
+    assert fwd.upstream_errors == 2 and len(fwd.cache) == 0
+
+
+def test_dot_provider_is_forwarded_over_verified_tls(dot_server, self_signed):
+    cfg = f"[Resolve]\nDNS=127.0.0.1:{dot_server}#localhost\nDNSOverTLS=yes\n"
+    assert isinstance(forwarder.upstream_of(cfg), forwarder.TlsUpstream)
+    query = dns_wire.build_query("example.com")
+
+    trusted = forwarder.TlsUpstream(forwarder.tls_servers_for(cfg),
+                                    context=ssl.create_default_context(cafile=self_signed[0]))
+    assert dns_wire.rcode(asyncio.run(trusted.resolve(query))) == dns_wire.RCODE_NOERROR
+
+    untrusted = forwarder.TlsUpstream(forwarder.tls_servers_for(cfg))
+    with pytest.raises(ssl.SSLError):
+        asyncio.run(untrusted.resolve(query))
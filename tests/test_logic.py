@@ -0,0 +1,45 @@
+import logic
+
+NEXTDNS = (
+    "[Resolve]\n"
+    "DNS=45.90.28.0#abc123.dns.nextdns.io\n"
+    "DNS=2a07:a8c0::#abc123.dns.nextdns.io\n"
+    "DNS=45.90.30.0#abc123.dns.nextdns.io\n"
+    "DNSOverTLS=yes\n"
+)
+
+
+def test_reorder_puts_fastest_first_and_unreachable_last():
+    cfg = "[Resolve]\nDNS=1.1.1.1 1.0.0.1 2606:4700::1111\nDNSOverTLS=no\n"
+    out = logic.reorder_dns_line(cfg, {"1.1.1.1": 20.0, "1.0.0.1": 5.0, "2606:4700::1111": None})
+    assert out == "[Resolve]\nDNS=1.0.0.1 1.1.1.1 2606:4700::1111\nDNSOverTLS=no\n"
+
+
+def test_reorder_merges_lines_and_keeps_port_and_sni():
+    out = logic.reorder_dns_line(NEXTDNS, {"45.90.30.0": 3.0, "45.90.28.0": 9.0})
+    assert out.splitlines() == [
+        "[Resolve]",
+        "DNS=45.90.30.0#abc123.dns.nextdns.io 45.90.28.0#abc123.dns.nextdns.io "
+        "2a07:a8c0::#abc123.dns.nextdns.io",
+        "DNSOverTLS=yes",
+    ]
+
+
+def test_reorder_keeps_config_order_on_ties_and_single_servers():
+    cfg = "[Resolve]\nDNS=9.9.9.9 149.112.112.112\n"
+    assert logic.reorder_dns_line(cfg, {}) == cfg
+    assert logic.reorder_dns_line("[Resolve]\nDNS=8.8.8.8\n", {"8.8.8.8": 1.0}) == "[Resolve]\nDNS=8.8.8.8\n"
+
+
+def test_nextdns_is_detected_after_reordering(tmp_path, monkeypatch):
+    logic.save_promo_nextdns_config({"resolve": NEXTDNS})
+    conf = tmp_path / "resolved.conf"
+    monkeypatch.setattr(logic, "RESOLVED_CONF_PATH", str(conf))
+    monkeypatch.setattr(logic, "_current_dns_source", None)
+
+    conf.write_text(NEXTDNS)
+    assert logic.get_current_dns() == "NextDNS"
+    conf.write_text(logic.reorder_dns_line(NEXTDNS, {"45.90.30.0": 3.0, "45.90.28.0": 9.0}))
+    assert logic.get_current_dns() == "NextDNS"
+    conf.write_text("[Resolve]\nDNS=45.90.28.0#other.dns.nextdns.io\nDNSOverTLS=yes\n")
+    assert logic.get_current_dns() != "NextDNS"
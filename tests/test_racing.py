@@ -0,0 +1,56 @@
+import asyncio
+
+import dns_wire
+import racing
+from conftest import reply
+
+QUERY = dns_wire.build_query("example.com")
+
+
+def fake_upstreams(monkeypatch, delays: dict[str, float], asked: list[str]):
+    """Patch dns_client.query: each address answers after its delay (seconds)."""
+    async def query(address, wire, port=53, timeout=2.0):
+        asked.append(address)
+        await asyncio.sleep(delays[address])
+        return reply(wire)
+
+    monkeypatch.setattr(racing.dns_client, "query", query)
+
+
+def test_hedged_first_upstream_answers_alone(monkeypatch):
+    asked = []
+    fake_upstreams(monkeypatch, {"a": 0.0, "b": 0.0}, asked)
+    up = racing.RacingUpstream([("a", "a", 53), ("b", "b", 53)], hedge=True)
+    assert asyncio.run(up.resolve(QUERY)) is not None
+    assert asked == ["a"]  # answered inside the hedge delay
+
+
+def test_hedged_slow_upstream_gets_a_backup_request(monkeypatch):
+    asked = []
+    fake_upstreams(monkeypatch, {"slow": 1.0, "fast": 0.0}, asked)
+    up = racing.RacingUpstream([("slow", "slow", 53), ("fast", "fast", 53)], hedge=True)
+    asyncio.run(up.resolve(QUERY))
+    assert asked == ["slow", "fast"]
+    summary = {s["name"]: s for s in up.summary()}
+    assert summary["fast"]["wins"] == 1
+    # the cancelled loser is counted as censored, not sampled at its cut-off time
+    assert summary["slow"]["censored"] == 1
+    assert summary["slow"]["p50_ms"] is None
+
+
+def test_measured_upstreams_are_asked_before_unmeasured_ones(monkeypatch):
+    asked = []
+    fake_upstreams(monkeypatch, {"new": 0.0, "known": 0.0}, asked)
+    up = racing.RacingUpstream([("new", "new", 53), ("known", "known", 53)], hedge=True)
+    up.stats[1].latency.add(40.0)
+    asyncio.run(up.resolve(QUERY))
+    assert asked == ["known"]
+
+
+def test_pick_upstreams_ranks_by_latency_unmeasured_last():
+    configs = {n: {"config": f"[Resolve]\nDNS={ip}\n"}
+               for n, ip in (("A", "1.1.1.1"), ("B", "8.8.8.8"), ("C", "9.9.9.9"))}
+    configs["Cache"] = {"config": "[Resolve]\nDNS=127.0.0.1:5399\n", "local": True}
+    picks = racing.pick_upstreams(configs, k=3, latencies={"A": None, "C": 5.0, "B": 9.0})
+    assert [p[0] for p in picks] == ["C", "B", "A"]
+    assert [p[0] for p in racing.pick_upstreams(configs, k=2)] == ["A", "B"]
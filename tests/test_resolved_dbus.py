@@ -0,0 +1,109 @@
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+import resolved_dbus
+
+jeepney = pytest.importorskip("jeepney")
+blocking = pytest.importorskip("jeepney.io.blocking")
+
+
+def dns(ifindex: int, addr: str) -> tuple:
+    return ifindex, socket.AF_INET, socket.inet_aton(addr)
+
+
+class FakeResolved:
+    """org.freedesktop.resolve1 stand-in on a private bus: answers Get / GetAll from `props`."""
+
+    STATS = {
+        "TransactionStatistics": ("(tt)", (1, 120)),
+        "CacheStatistics": ("(ttt)", (40, 90, 30)),
+        "DNSSECStatistics": ("(tttt)", (0, 5, 0, 1)),
+    }
+
+    def __init__(self, address: str):
+        self.conn = blocking.open_dbus_connection(bus=address)
+        self.conn.send_and_get_reply(jeepney.message_bus.RequestName(resolved_dbus.BUS_NAME))
+        self.props = {
+            "DNS": ("a(iiay)", [dns(0, "1.1.1.1"), dns(2, "9.9.9.9")]),
+            "CurrentDNSServer": ("(iiay)", dns(2, "9.9.9.9")),
+            **self.STATS,
+        }
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                msg = self.conn.receive(timeout=0.05)
+            except TimeoutError:
+                continue
+            if msg.header.message_type != jeepney.MessageType.method_call:
+                continue
+            member = msg.header.fields[jeepney.HeaderFields.member]
+            if member == "GetAll":
+                self.conn.send(jeepney.new_method_return(msg, "a{sv}", (dict(self.props),)))
+            elif member == "Get":
+                self.conn.send(jeepney.new_method_return(msg, "v", (self.props[msg.body[1]],)))
+
+    def change_dns(self, servers: list[tuple]) -> None:
+        self.props["DNS"] = ("a(iiay)", servers)
+        self.props["CurrentDNSServer"] = ("(iiay)", servers[0])
+        path = jeepney.DBusAddress(resolved_dbus.OBJECT_PATH, interface="org.freedesktop.DBus.Properties")
+        self.conn.send(jeepney.new_signal(path, "PropertiesChanged", "sa{sv}as",
+                                  (resolved_dbus.MANAGER_IFACE, {"DNS": self.props["DNS"]}, [])))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.conn.close()
+
+
+@pytest.fixture
+def fake_resolved(tmp_path, monkeypatch):
+    if shutil.which("dbus-daemon") is None:
+        pytest.skip("dbus-daemon is not installed")
+    monkeypatch.setattr(resolved_dbus.logic, "DNS_CONFIGS", dict(resolved_dbus.logic.DEFAULT_DNS_CONFIGS))
+    bus = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address",
+                            f"--address=unix:path={tmp_path}/bus"],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    address = bus.stdout.readline().strip()
+    service = FakeResolved(address)
+    client = resolved_dbus.ResolvedDBus(bus=address)
+    yield service, client
+    client.close()
+    service.close()
+    bus.terminate()
+    bus.wait()
+
+
+def test_servers_and_provider_come_from_the_bus(fake_resolved):
+    _, client = fake_resolved
+    assert client.global_servers == ["1.1.1.1"]
+    assert client.link_servers == {2: ["9.9.9.9"]}
+    assert client.effective_servers() == ["9.9.9.9", "1.1.1.1"]
+    assert client.current_provider() == "Quad9"
+
+
+def test_properties_changed_signal_triggers_a_refresh(fake_resolved):
+    service, client = fake_resolved
+    assert not client.poll()
+    service.change_dns([dns(0, "8.8.8.8")])
+    deadline = time.monotonic() + 2
+    while not client.poll():
+        assert time.monotonic() < deadline, "no PropertiesChanged seen"
+        time.sleep(0.01)
+    assert client.effective_servers() == ["8.8.8.8"]
+    assert client.current_provider() == "Google"
+
+
+def test_statistics_are_read_from_the_bus(fake_resolved):
+    _, client = fake_resolved
+    stats = client.statistics()
+    assert (stats["total_transactions"], stats["cache_hits"], stats["cache_misses"]) == (120, 90, 30)
+    assert stats["dnssec_insecure"] == 5
@@ -0,0 +1,109 @@
+import resolved_stats
+
+OLD_LAYOUT = """\
+DNSSEC supported by current servers: no
+
+Transactions
+Current Transactions: 0
+  Total Transactions: 1234
+
+Cache
+  Current Cache Size: 56
+          Cache Hits: 400
+        Cache Misses: 834
+
+DNSSEC Verdicts
+              Secure: 1
+            Insecure: 2
+               Bogus: 3
+       Indeterminate: 4
+"""
+
+TABLE_LAYOUT = """\
+Transactions
+Current Transactions    0
+Total Transactions   1234
+
+Cache
+Current Cache Size     56
+Cache Hits            400
+Cache Misses          834
+"""
+
+
+def test_parse_statistics_old_layout():
+    assert resolved_stats.parse_statistics(OLD_LAYOUT) == {
+        "current_transactions": 0, "total_transactions": 1234, "cache_size": 56,
+        "cache_hits": 400, "cache_misses": 834, "dnssec_secure": 1,
+        "dnssec_insecure": 2, "dnssec_bogus": 3, "dnssec_indeterminate": 4,
+    }
+
+
+def test_parse_statistics_table_layout():
+    stats = resolved_stats.parse_statistics(TABLE_LAYOUT)
+    assert stats["total_transactions"] == 1234
+    assert stats["cache_hits"] == 400 and stats["cache_misses"] == 834
+    assert "dnssec_secure" not in stats
+
+
+def test_parse_statistics_ignores_unrelated_lines():
+    assert resolved_stats.parse_statistics("DNSSEC supported by current servers: no\nfoo: 3\n") == {}
+
+
+def test_counter_reset_charges_the_interval_to_the_new_provider(tmp_path):
+    counters = {"total_transactions": 100, "cache_hits": 40, "cache_misses": 60}
+    provider = ["A"]
+    tracker = resolved_stats.StatsTracker(lambda: dict(counters), lambda: provider[0],
+                                          path=str(tmp_path / "stats.json"))
+    assert tracker.sample(now=0.0) is None
+
+    counters.update(total_transactions=110, cache_hits=48, cache_misses=62)
+    provider[0] = "B"  # switched, but resolved has not restarted yet
+    first = tracker.sample(now=10.0)
+    assert (first.provider, first.transactions, first.cache_hits) == ("A", 10, 8)
+
+    counters.update(total_transactions=5, cache_hits=1, cache_misses=4)  # restart zeroed them
+    second = tracker.sample(now=20.0)
+    assert (second.provider, second.transactions) == ("B", 5)
+    assert tracker.hit_rate("A") == 0.8
+
+
+def test_only_one_tracker_adds_to_the_totals(tmp_path):
+    path = str(tmp_path / "stats.json")
+    counters = {"total_transactions": 0, "cache_hits": 0, "cache_misses": 0}
+    a = resolved_stats.StatsTracker(lambda: dict(counters), lambda: "A", path=path)
+    b = resolved_stats.StatsTracker(lambda: dict(counters), lambda: "A", path=path)
+    a.sample(now=0.0)
+    b.sample(now=0.0)
+    counters.update(total_transactions=10, cache_hits=3, cache_misses=7)
+    a.sample(now=1.0)
+    b.sample(now=1.0)  # same system-wide counters: must not be counted twice
+    reread = resolved_stats.StatsTracker(lambda: {}, lambda: "A", path=path)
+    assert reread.totals["A"]["cache_hits"] == 3
+
+
+def test_preferred_tracker_takes_over_and_a_silent_one_expires(tmp_path):
+    path = str(tmp_path / "stats.json")
+    counters = {"total_transactions": 0, "cache_hits": 0, "cache_misses": 0}
+    gui = resolved_stats.StatsTracker(lambda: dict(counters), lambda: "A", path=path)
+    daemon = resolved_stats.StatsTracker(lambda: dict(counters), lambda: "A", path=path, preferred=True)
+
+    def hits():
+        return resolved_stats.StatsTracker(lambda: {}, lambda: "A", path=path).totals["A"]["cache_hits"]
+
+    gui.sample(now=0.0)
+    daemon.sample(now=0.0)
+    counters["cache_hits"] = 1
+    gui.sample(now=1.0)
+    counters["cache_hits"] = 3
+    daemon.sample(now=2.0)  # takes the claim; 0 -> 3 overlaps the GUI's count
+    counters["cache_hits"] = 4
+    gui.sample(now=3.0)  # no longer the sampler
+    daemon.sample(now=4.0)
+    assert hits() == 2  # 0 -> 1 by the GUI, 3 -> 4 by the daemon
+
+    counters["cache_hits"] = 6
+    gui.sample(now=5.0 + resolved_stats.CLAIM_SECONDS)  # daemon gone quiet: the GUI takes over
+    counters["cache_hits"] = 7
+    gui.sample(now=6.0 + resolved_stats.CLAIM_SECONDS)
+    assert hits() == 3
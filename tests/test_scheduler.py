@@ -0,0 +1,55 @@
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+class FakeRoot:
+    """Just enough of Tk: after() callbacks are run by pump() on the test thread."""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, fn):
+        self.pending.append(fn)
+        return len(self.pending)
+
+    def after_cancel(self, after_id):
+        pass
+
+    def winfo_exists(self):
+        return True
+
+    def state(self):
+        return "normal"
+
+    def pump(self, until, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            if self.pending:
+                self.pending.pop(0)()
+            time.sleep(0.001)
+        return until()
+
+
+def test_background_job_probes_off_the_tk_thread_and_applies_on_it():
+    root = FakeRoot()
+    release = threading.Event()
+    probes, applied = [], []
+
+    def probe():
+        probes.append(threading.current_thread())
+        release.wait(2)
+        return 42
+
+    sched = Scheduler(root, tick_ms=1)
+    sched.every("probe", probe, interval=0, run_now=True,
+                apply=lambda v: applied.append((v, threading.current_thread())))
+    assert root.pump(lambda: probes)
+    root.pump(lambda: False, timeout=0.05)  # more ticks while the probe is stuck
+    assert len(probes) == 1  # never started twice at once
+    release.set()
+    assert root.pump(lambda: applied)
+    assert probes[0] is not threading.main_thread()
+    assert applied[0] == (42, threading.main_thread())
+    assert sched.jobs["probe"].runs == 1
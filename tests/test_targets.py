@@ -0,0 +1,71 @@
+import os
+import subprocess
+
+import pytest
+
+import targets
+
+CFG = "[Resolve]\nDNS=9.9.9.9\n"
+
+
+@pytest.fixture(autouse=True)
+def unprivileged(monkeypatch, tmp_path):
+    """Targets live in tmp_path, so "root" commands can simply run as the test user."""
+    def run(cmd, password=None, check=True):
+        result = subprocess.run(cmd, text=True, capture_output=True)
+        if check and result.returncode != 0:
+            raise RuntimeError(result.stderr.strip())
+        return result
+
+    monkeypatch.setattr(targets.logic, "run_privileged", run)
+    monkeypatch.setattr(targets, "TARGET_BACKUPS_DIR", str(tmp_path / "backups"))
+
+
+def make_root(tmp_path, text="[Resolve]\nDNS=1.1.1.1\n"):
+    conf = tmp_path / "rootfs" / "etc" / "systemd" / "resolved.conf"
+    conf.parent.mkdir(parents=True)
+    conf.write_text(text)
+    return targets.Target("box", root=str(tmp_path / "rootfs")), conf
+
+
+def test_rooted_target_is_backed_up_and_written(tmp_path):
+    target, conf = make_root(tmp_path)
+    (result,) = targets.apply_to_targets(CFG, [target])
+    assert result.ok, result.error
+    assert conf.read_text() == CFG
+    with open(result.backup) as f:
+        assert f.read() == "[Resolve]\nDNS=1.1.1.1\n"
+
+
+def test_symlink_inside_root_is_not_followed(tmp_path):
+    host = tmp_path / "host.conf"
+    host.write_text("host\n")
+    target, conf = make_root(tmp_path)
+    conf.unlink()
+    conf.symlink_to(host)
+    (result,) = targets.apply_to_targets(CFG, [target])
+    assert not result.ok and "symlink" in result.error
+    assert host.read_text() == "host\n"
+
+    conf.unlink()
+    etc = tmp_path / "rootfs" / "etc"
+    os.rename(etc, tmp_path / "real-etc")
+    etc.symlink_to(tmp_path / "real-etc")  # a symlinked parent directory is refused too
+    (result,) = targets.apply_to_targets(CFG, [target])
+    assert not result.ok and "symlink" in result.error
+
+
+def test_missing_conf_has_no_backup_and_missing_root_fails(tmp_path):
+    target, conf = make_root(tmp_path)
+    conf.unlink()
+    (result,) = targets.apply_to_targets(CFG, [target])
+    assert result.ok and result.backup is None and conf.read_text() == CFG
+    (result,) = targets.apply_to_targets(CFG, [targets.Target("gone", root=str(tmp_path / "nope"))])
+    assert not result.ok
+
+
+def test_backups_in_the_same_second_do_not_overwrite_each_other(tmp_path):
+    target, _ = make_root(tmp_path)
+    first = targets.backup_target(target)
+    second = targets.backup_target(target)
+    assert first != second and os.path.exists(first) and os.path.exists(second)
@@ -0,0 +1,93 @@
+import math
+import os
+
+import pytest
+
+import tsdb
+
+T0 = 1_700_000_000.0 - 1_700_000_000.0 % 3600  # on an hour boundary
+
+
+def test_minute_rollup_counts_samples_loss_and_percentiles(tmp_path):
+    hist = tsdb.ProviderHistory("Test", str(tmp_path))
+    for i in range(60):
+        hist.add(None if i % 10 == 0 else float(i), T0 + i)
+    hist.add(1.0, T0 + 60)  # first sample of the next minute closes the bucket
+
+    (minute,) = hist.query("1m")
+    assert minute.ts == T0
+    assert (minute.samples, minute.lost) == (60, 6)
+    assert minute.loss == 0.1
+    assert minute.min == 1.0
+    assert 25.0 <= minute.p50 <= 35.0
+    assert minute.p95 >= 55.0
+
+
+def test_hour_rollup_is_built_from_minutes(tmp_path):
+    hist = tsdb.ProviderHistory("Test", str(tmp_path))
+    for m in range(60):
+        for s in range(0, 60, 10):
+            hist.add(10.0 + m, T0 + m * 60 + s)
+    hist.add(1.0, T0 + 3600)
+
+    assert len(hist.query("1m")) == 60
+    (hour,) = hist.query("1h")
+    assert (hour.ts, hour.samples, hour.lost) == (T0, 360, 0)
+    assert hour.min == 10.0 and hour.p95 == 66.0  # weighted, not the worst minute
+    assert 39.0 <= hour.p50 <= 40.0
+
+
+def test_lost_only_minute_rolls_up_as_nan(tmp_path):
+    hist = tsdb.ProviderHistory("Test", str(tmp_path))
+    hist.add(None, T0)
+    hist.add(None, T0 + 61)
+    (minute,) = hist.query("1m")
+    assert minute.loss == 1.0 and math.isnan(minute.p50)
+
+
+def test_second_opener_sees_and_extends_the_same_rings(tmp_path):
+    a = tsdb.ProviderHistory("Shared", str(tmp_path))
+    b = tsdb.ProviderHistory("Shared", str(tmp_path))
+    for i in range(10):
+        (a if i % 2 else b).add(float(i), T0 + i)
+    assert [ms for _, ms in a.query("raw")] == [float(i) for i in range(10)]
+    assert a.query("raw") == b.query("raw")
+
+
+def test_raw_range_query(tmp_path):
+    hist = tsdb.ProviderHistory("Test", str(tmp_path))
+    for i in range(100):
+        hist.add(float(i), T0 + i)
+    assert [ts - T0 for ts, _ in hist.query("raw", T0 + 10, T0 + 13)] == [10, 11, 12]
+
+
+def test_names_with_the_same_slug_get_their_own_rings(tmp_path):
+    tsdb.ProviderHistory("A B", str(tmp_path)).add(1.0, T0)
+    tsdb.ProviderHistory("A_B", str(tmp_path)).add(2.0, T0)
+    assert tsdb.ProviderHistory("A B", str(tmp_path)).query() == [(T0, 1.0)]
+    assert tsdb.ProviderHistory("A_B", str(tmp_path)).query() == [(T0, 2.0)]
+
+
+def test_rings_under_the_bare_slug_are_adopted(tmp_path):
+    old = tsdb.ProviderHistory("Test", str(tmp_path))
+    old.add(5.0, T0)
+    old.close()
+    base = tsdb._base(str(tmp_path), "Test")
+    for ext in ("raw", "1m", "1h", "lock"):
+        os.rename(f"{base}.{ext}", tmp_path / f"Test.{ext}")  # as written by older versions
+    assert tsdb.ProviderHistory("Test", str(tmp_path)).query() == [(T0, 5.0)]
+    assert not (tmp_path / "Test.raw").exists()
+
+
+def test_readonly_history_sees_the_writers_samples(tmp_path):
+    writer = tsdb.ProviderHistory("Test", str(tmp_path))
+    writer.add(7.0, T0)
+    reader = tsdb.ProviderHistory("Test", str(tmp_path), readonly=True)
+    writer.add(8.0, T0 + 1)
+    assert reader.query() == [(T0, 7.0), (T0 + 1, 8.0)]
+
+
+def test_readonly_history_does_not_create_rings(tmp_path):
+    with pytest.raises(OSError):
+        tsdb.ProviderHistory("Missing", str(tmp_path), readonly=True)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,25 @@
+import dot_probe
+import logic
+
+
+def test_plain_config_without_servers_checks_nothing():
+    assert logic.verify_servers("[Resolve]\nDNSOverTLS=no\n") == []
+
+
+def test_untrusted_certificate_fails_without_sni(dot_server):
+    cfg = f"[Resolve]\nDNS=127.0.0.1:{dot_server}\nDNSOverTLS=yes\n"
+    (check,) = logic.verify_servers(cfg)
+    assert not check.ok and "certificate" in check.error.lower()
+
+
+def test_untrusted_certificate_fails_with_sni(dot_server):
+    cfg = f"[Resolve]\nDNS=127.0.0.1:{dot_server}#localhost\nDNSOverTLS=yes\n"
+    (check,) = logic.verify_servers(cfg)
+    assert not check.ok
+
+
+def test_trusted_certificate_is_checked_against_the_address(dot_server, self_signed):
+    trusted = dot_probe.make_context(cafile=self_signed[0])
+    assert dot_probe.probe_server("127.0.0.1", None, dot_server, context=trusted).ok
+    assert dot_probe.probe_server("127.0.0.1", "localhost", dot_server, context=trusted).ok
+    assert not dot_probe.probe_server("127.0.0.1", "example.com", dot_server, context=trusted).ok
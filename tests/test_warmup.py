@@ -0,0 +1,21 @@
+import warmup
+
+SHOW_CACHE = """\
+Scope protocol=dns interface=wlp3s0
+example.com IN A 93.184.215.14
+example.com IN AAAA 2606:2800:21f:cb07:6820:80da:af6b:8b2c
+www.github.com IN CNAME github.com
+github.com IN A 140.82.121.4
+
+Scope protocol=llmnr interface=wlp3s0 family=inet
+"""
+
+
+def test_show_cache_names_are_deduplicated_in_order():
+    assert warmup.parse_show_cache(SHOW_CACHE) == ["example.com", "www.github.com", "github.com"]
+
+
+def test_learned_names_follow_the_user_list():
+    warmup.learn(["b.example", "a.example."])
+    warmup.learn(["a.example"])
+    assert warmup.domains()[:2] == ["a.example", "b.example"]
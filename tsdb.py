@@ -0,0 +1,342 @@
+"""
+Fixed-size, memory-mapped latency history per provider.
+Each provider gets three ring files under ~/.config/dns-changer/history/:
+raw samples, 1-minute and 1-hour rollups (min, p50, p95, loss). Files are
+preallocated, so disk usage is known up front and never grows.
+The daemon and the GUI may write the same rings: every add and query holds
+an flock on the provider's .lock file and re-reads the ring headers.
+
+    python tsdb.py export Google --tier 1m --since 86400 > google.csv
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import logic
+from stats import percentile, weighted_percentile
+
+HISTORY_DIR = os.path.join(logic.CONFIG_DIR, "history")
+
+MAGIC = b"DNSCTS1\0"
+# magic, record size, capacity, head (next write slot), count
+_HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+
+RAW = struct.Struct("<df")            # ts, latency ms (NaN = lost)
+ROLLUP = struct.Struct("<dIIfff")     # bucket start, samples, lost, min, p50, p95
+
+TIERS = {
+    # name: (record format, capacity)
+    "raw": (RAW, 4 * 3600),           # ~4 h at 1 Hz
+    "1m": (ROLLUP, 30 * 24 * 60),     # 30 days
+    "1h": (ROLLUP, 2 * 365 * 24),     # 2 years
+}
+
+
+def disk_usage_per_provider() -> int:
+    return sum(HEADER_SIZE + fmt.size * cap for fmt, cap in TIERS.values())
+
+
+@dataclass
+class Rollup:
+    ts: float
+    samples: int
+    lost: int
+    min: float
+    p50: float
+    p95: float
+
+    @property
+    def loss(self) -> float:
+        return self.lost / self.samples if self.samples else 0.0
+
+
+class Ring:
+    """
+    One preallocated ring of fixed-size records, time-ordered by append.
+    head/count live in the mmap'd header and are re-read before every
+    operation, so appends by another process are seen (callers serialise
+    writers, see ProviderHistory).
+    """
+
+    def __init__(self, path: str, fmt: struct.Struct, capacity: int, readonly: bool = False):
+        self.fmt = fmt
+        self.capacity = capacity
+        size = HEADER_SIZE + fmt.size * capacity
+        if readonly:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                self.mm = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+            finally:
+                os.close(fd)
+            magic, rsize, cap, self.head, self.count = _HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC or rsize != fmt.size or cap != capacity:
+                self.mm.close()
+                raise ValueError(f"{path} is not a history ring.")
+            return
+        new = not os.path.exists(path) or os.path.getsize(path) != size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if new:
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        magic, rsize, cap, self.head, self.count = _HEADER.unpack_from(self.mm, 0)
+        if new or magic != MAGIC or rsize != fmt.size or cap != capacity:
+            self.head = self.count = 0
+            self._write_header()
+
+    def _read_header(self) -> None:
+        self.head, self.count = _HEADER.unpack_from(self.mm, 0)[3:]
+
+    def _write_header(self) -> None:
+        _HEADER.pack_into(self.mm, 0, MAGIC, self.fmt.size, self.capacity, self.head, self.count)
+
+    def _slot(self, i: int) -> int:
+        """Physical slot of logical record `i` (0 = oldest)."""
+        return (self.head - self.count + i) % self.capacity
+
+    def _get(self, i: int) -> tuple:
+        return self.fmt.unpack_from(self.mm, HEADER_SIZE + self._slot(i) * self.fmt.size)
+
+    def append(self, *values) -> None:
+        self._read_header()
+        self.fmt.pack_into(self.mm, HEADER_SIZE + self.head * self.fmt.size, *values)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self._write_header()
+
+    def last(self) -> Optional[tuple]:
+        self._read_header()
+        return self._get(self.count - 1) if self.count else None
+
+    def _bisect(self, ts: float) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._get(mid)[0] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start: float = 0.0, end: float = math.inf) -> Iterator[tuple]:
+        """Records with start <= ts < end, oldest first (binary search + scan)."""
+        self._read_header()
+        for i in range(self._bisect(start), self.count):
+            rec = self._get(i)
+            if rec[0] >= end:
+                break
+            yield rec
+
+    def flush(self) -> None:
+        self.mm.flush()
+
+    def close(self) -> None:
+        self.mm.close()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", name).strip("_") or "provider"
+
+
+def _base(directory: str, name: str, migrate: bool = True) -> str:
+    """
+    File prefix for `name`. The slug alone maps "A B" and "A_B" to the same
+    rings, so a short hash of the exact name is appended; rings written under
+    the bare slug by older versions are renamed on first open.
+    """
+    base = os.path.join(directory, f"{_slug(name)}-{hashlib.sha1(name.encode()).hexdigest()[:8]}")
+    legacy = os.path.join(directory, _slug(name))
+    if migrate and not os.path.exists(f"{base}.raw") and os.path.exists(f"{legacy}.raw"):
+        for ext in (*TIERS, "lock"):
+            try:
+                os.rename(f"{legacy}.{ext}", f"{base}.{ext}")
+            except FileNotFoundError:
+                pass  # another process got there first
+    return base
+
+
+def _aggregate(ts: float, latencies: list[float], lost: int) -> tuple:
+    nan = float("nan")
+    return (
+        ts,
+        len(latencies) + lost,
+        lost,
+        min(latencies) if latencies else nan,
+        percentile(latencies, 0.5) if latencies else nan,
+        percentile(latencies, 0.95) if latencies else nan,
+    )
+
+
+class ProviderHistory:
+    """
+    Raw ring plus 1m / 1h rollups for one provider. `readonly` opens another
+    process's existing rings (e.g. the system daemon's) for queries only.
+    """
+
+    def __init__(self, name: str, directory: str = HISTORY_DIR, readonly: bool = False):
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        base = _base(directory, name, migrate=not readonly)
+        flags = os.O_RDONLY if readonly else os.O_RDWR | os.O_CREAT
+        self._lock_fd = os.open(f"{base}.lock", flags, 0o644)
+        try:
+            with self._locked(exclusive=not readonly):
+                self.rings = {tier: Ring(f"{base}.{tier}", fmt, cap, readonly)
+                              for tier, (fmt, cap) in TIERS.items()}
+        except (OSError, ValueError):
+            os.close(self._lock_fd)
+            raise
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def add(self, latency_ms: Optional[float], ts: Optional[float] = None) -> None:
+        with self._locked():
+            self._add(latency_ms, time.time() if ts is None else ts)
+
+    def _add(self, latency_ms: Optional[float], ts: float) -> None:
+        raw = self.rings["raw"]
+        prev = raw.last()
+        if prev is not None:
+            ts = max(ts, prev[0])  # keep rings sorted if the clock steps back
+        raw.append(ts, float("nan") if latency_ms is None else latency_ms)
+        if prev is None:
+            return
+        if int(prev[0] // 60) != int(ts // 60):
+            self._roll_minute(prev[0] // 60 * 60)
+        if int(prev[0] // 3600) != int(ts // 3600):
+            self._roll_hour(prev[0] // 3600 * 3600)
+
+    def _roll_minute(self, bucket: float) -> None:
+        lat, lost = [], 0
+        for _, ms in self.rings["raw"].range(bucket, bucket + 60):
+            if math.isnan(ms):
+                lost += 1
+            else:
+                lat.append(ms)
+        if lat or lost:
+            self.rings["1m"].append(*_aggregate(bucket, lat, lost))
+
+    def _roll_hour(self, bucket: float) -> None:
+        """
+        Hour rollup from minute rollups: exact min and loss; p50 / p95 are the
+        sample-weighted p50 of minute p50s and p95 of minute p95s.
+        """
+        minutes = [Rollup(*r) for r in self.rings["1m"].range(bucket, bucket + 3600)]
+        if not minutes:
+            return
+        samples = sum(m.samples for m in minutes)
+        lost = sum(m.lost for m in minutes)
+        ok = [m for m in minutes if m.samples > m.lost]
+        nan = float("nan")
+        if ok:
+            row = (bucket, samples, lost, min(m.min for m in ok),
+                   weighted_percentile(((m.p50, m.samples - m.lost) for m in ok), 0.5),
+                   weighted_percentile(((m.p95, m.samples - m.lost) for m in ok), 0.95))
+        else:
+            row = (bucket, samples, lost, nan, nan, nan)
+        self.rings["1h"].append(*row)
+
+    def query(self, tier: str = "raw", start: float = 0.0, end: float = math.inf) -> list:
+        with self._locked(exclusive=False):
+            recs = list(self.rings[tier].range(start, end))
+        if tier == "raw":
+            return [(ts, None if math.isnan(ms) else ms) for ts, ms in recs]
+        return [Rollup(*r) for r in recs]
+
+    def flush(self) -> None:
+        for ring in self.rings.values():
+            ring.flush()
+
+    def close(self) -> None:
+        for ring in self.rings.values():
+            ring.close()
+        os.close(self._lock_fd)
+
+
+_open: dict[str, ProviderHistory] = {}
+
+
+def history(name: str) -> ProviderHistory:
+    """Shared, lazily opened history for a provider."""
+    if name not in _open:
+        _open[name] = ProviderHistory(name)
+    return _open[name]
+
+
+def record(name: str, latency_ms: Optional[float], ts: Optional[float] = None) -> None:
+    history(name).add(latency_ms, ts)
+
+
+_read_dir: Optional[str] = None
+_readers: dict[str, ProviderHistory] = {}
+
+
+def read_from(directory: Optional[str]) -> None:
+    """Show history from `directory` (read-only, e.g. the system daemon's); None: our own."""
+    global _read_dir
+    if directory == _read_dir:
+        return
+    for h in _readers.values():
+        h.close()
+    _readers.clear()
+    _read_dir = directory
+
+
+def reader(name: str) -> Optional[ProviderHistory]:
+    """History to display for `name`; None while the read_from directory has none yet."""
+    if _read_dir is None:
+        return history(name)
+    if name not in _readers:
+        try:
+            _readers[name] = ProviderHistory(name, _read_dir, readonly=True)
+        except (OSError, ValueError):
+            return None
+    return _readers[name]
+
+
+def export_csv(name: str, tier: str, since: float, out=sys.stdout) -> None:
+    rows = history(name).query(tier, time.time() - since if since else 0.0)
+    if tier == "raw":
+        out.write("ts,latency_ms\n")
+        for ts, ms in rows:
+            out.write(f"{ts:.3f},{'' if ms is None else f'{ms:.3f}'}\n")
+    else:
+        out.write("ts,samples,lost,min_ms,p50_ms,p95_ms\n")
+        for r in rows:
+            out.write(f"{r.ts:.0f},{r.samples},{r.lost},{r.min:.3f},{r.p50:.3f},{r.p95:.3f}\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export DNS Changer latency history.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export", help="write one provider's history as CSV")
+    exp.add_argument("provider")
+    exp.add_argument("--tier", choices=list(TIERS), default="1m")
+    exp.add_argument("--since", type=float, default=0, help="seconds back from now (0 = all)")
+    sub.add_parser("usage", help="print fixed disk usage per provider")
+    args = parser.parse_args()
+    if args.cmd == "export":
+        export_csv(args.provider, args.tier, args.since)
+    else:
+        print(f"{disk_usage_per_provider()} bytes per provider")
@@ -0,0 +1,60 @@
+"""
+Observable state for the DNS tab. Setters are dirty-checked, and subscribers
+run once per Tk idle cycle with the latest value, so a burst of updates costs
+one widget reconfigure and an unchanged value costs none.
+"""
+
+from collections import defaultdict
+from typing import Any, Callable
+
+Subscriber = Callable[[Any, Any], None]  # (new, old)
+
+_MISSING = object()
+
+
+class ViewModel:
+    def __init__(self, root):
+        self.root = root
+        self._values: dict[str, Any] = {}
+        self._subs: dict[str, list[Subscriber]] = defaultdict(list)
+        self._dirty: dict[str, Any] = {}  # field -> value before the burst
+        self._flush_id = None
+        self.notifications = 0
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return self._values.get(field, default)
+
+    def set(self, field: str, value: Any) -> bool:
+        """Store `value`; returns True (and schedules a flush) if it changed."""
+        old = self._values.get(field, _MISSING)
+        if old == value:
+            return False
+        self._values[field] = value
+        self._dirty.setdefault(field, old)
+        if self._flush_id is None:
+            self._flush_id = self.root.after_idle(self.flush)
+        return True
+
+    def fields(self, prefix: str = "") -> dict[str, Any]:
+        """Current values of every field starting with `prefix`."""
+        return {k: v for k, v in self._values.items() if k.startswith(prefix)}
+
+    def update(self, **fields: Any) -> None:
+        for field, value in fields.items():
+            self.set(field, value)
+
+    def subscribe(self, field: str, fn: Subscriber, now: bool = True) -> None:
+        self._subs[field].append(fn)
+        if now and field in self._values:
+            fn(self._values[field], None)
+
+    def flush(self) -> None:
+        self._flush_id = None
+        dirty, self._dirty = self._dirty, {}
+        for field, old in dirty.items():
+            new = self._values[field]
+            if old == new:
+                continue  # changed and changed back within one burst
+            for fn in self._subs.get(field, ()):
+                self.notifications += 1
+                fn(new, None if old is _MISSING else old)
@@ -0,0 +1,123 @@
+"""
+Post-switch cache warm-up: every switch restarts systemd-resolved, so prime its
+cache with the domains we actually use before the user gets to them.
+Domains come from ~/.config/dns-changer/warmup_domains.txt (one per line) plus
+a learned list of names seen by the local cache or, for the root daemon, in
+resolved's own cache (`resolvectl show-cache`).
+"""
+
+import json
+import os
+import socket
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+import logic
+
+DOMAINS_PATH = os.path.join(logic.CONFIG_DIR, "warmup_domains.txt")
+LEARNED_PATH = os.path.join(logic.CONFIG_DIR, "warmup_learned.json")
+
+DEFAULT_DOMAINS = [
+    "google.com", "youtube.com", "github.com", "wikipedia.org",
+    "cloudflare.com", "mozilla.org", "amazon.com", "microsoft.com",
+]
+MAX_LEARNED = 500
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BUDGET = 3.0  # seconds
+
+
+@dataclass
+class WarmupReport:
+    total: int
+    primed: int
+    duration: float
+
+    @property
+    def fraction(self) -> float:
+        return self.primed / self.total if self.total else 1.0
+
+    def __str__(self) -> str:
+        return f"{self.primed}/{self.total} primed in {self.duration:.1f} s"
+
+
+def _system_resolve(name: str) -> None:
+    socket.getaddrinfo(name, None, proto=socket.IPPROTO_TCP)
+
+
+def load_learned(path: str = LEARNED_PATH) -> dict[str, int]:
+    try:
+        with open(path, "r") as f:
+            return {str(k): int(v) for k, v in json.load(f).items()}
+    except (FileNotFoundError, json.JSONDecodeError, ValueError, AttributeError):
+        return {}
+
+
+def learn(names: Iterable[str]) -> None:
+    """Bump the use count of `names`, keeping only the MAX_LEARNED most used."""
+    counts = load_learned()
+    for n in names:
+        n = n.strip().rstrip(".").lower()
+        if n:
+            counts[n] = counts.get(n, 0) + 1
+    top = dict(sorted(counts.items(), key=lambda kv: -kv[1])[:MAX_LEARNED])
+    with open(LEARNED_PATH, "w") as f:
+        json.dump(top, f, indent=4)
+
+
+def parse_show_cache(text: str) -> list[str]:
+    """Owner names of the records in `resolvectl show-cache` output."""
+    names = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and parts[1] == "IN":
+            names.append(parts[0])
+    return list(dict.fromkeys(names))
+
+
+def resolved_cache_names() -> list[str]:
+    """Names in resolved's cache; [] when show-cache is missing or not permitted (needs root)."""
+    try:
+        result = subprocess.run(["resolvectl", "show-cache"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    return parse_show_cache(result.stdout) if result.returncode == 0 else []
+
+
+def domains(limit: int = 100, shared_dir: Optional[str] = None) -> list[str]:
+    """
+    User list first, then learned names by frequency – including those a
+    system daemon learned in `shared_dir` – and defaults if all are empty.
+    """
+    names: list[str] = []
+    if os.path.exists(DOMAINS_PATH):
+        with open(DOMAINS_PATH, "r") as f:
+            names = [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+    counts = load_learned()
+    if shared_dir:
+        for n, c in load_learned(os.path.join(shared_dir, os.path.basename(LEARNED_PATH))).items():
+            counts[n] = counts.get(n, 0) + c
+    names += [n for n, _ in sorted(counts.items(), key=lambda kv: -kv[1])]
+    if not names:
+        names = list(DEFAULT_DOMAINS)
+    return list(dict.fromkeys(names))[:limit]
+
+
+def warm_up(names: Optional[list[str]] = None, concurrency: int = DEFAULT_CONCURRENCY,
+            budget: float = DEFAULT_BUDGET,
+            resolve: Callable[[str], None] = _system_resolve) -> WarmupReport:
+    """
+    Resolve `names` through the system resolver, at most `concurrency` at a
+    time, giving up on whatever is left after `budget` seconds.
+    """
+    names = domains() if names is None else names
+    t0 = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="warmup")
+    futures = [pool.submit(resolve, n) for n in names]
+    done, _ = wait(futures, timeout=budget)
+    pool.shutdown(wait=False, cancel_futures=True)
+    primed = sum(1 for f in done if f.exception() is None)
+    return WarmupReport(len(names), primed, time.monotonic() - t0)
+
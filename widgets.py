@@ -4,7 +4,8 @@ from ui import create_circle_image, fa_icon
 
 def create_provider_row(parent, name: str, connect_callback, remove_callback=None, is_custom=False):
     """
-    Build a row with status dot, name label, connect button, and optional remove button.
+    Build a row with status dot, name label, latency label, connect button,
+    and optional remove button.
     Returns widget references.
     """
     frame = ttk.Frame(parent)
@@ -18,6 +19,8 @@ def create_provider_row(parent, name: str, connect_callback, remove_callback=Non
 
     ttk.Frame(frame).pack(side="left", expand=True, fill="x")
 
+    latency = ttk.Label(frame, font=("Satoshi", 9), foreground="#a0a0a0")
+
     btn_connect = ttk.Button(
         frame,
         text="Connect",
@@ -26,12 +29,14 @@ def create_provider_row(parent, name: str, connect_callback, remove_callback=Non
         command=lambda n=name: connect_callback(n),
     )
     btn_connect.pack(side="right", padx=5)
+    latency.pack(side="right", padx=5)
 
     widgets = {
         "frame": frame,
         "circle": circle,
         "button": btn_connect,
         "label": label,
+        "latency": latency,
     }
 
     if is_custom and remove_callback: